@@ -9,30 +9,58 @@ file.  The individual passes are implemented in separate modules.
 The function build() is the main interface to this module.
 """
 
+import heapq
+import multiprocessing
+import multiprocessing.pool
 import os
 import os.path
+import pickle
 import shlex
+import shutil
 import subprocess
 import sys
+import tempfile
 from os.path import dirname, basename
 
-from typing import Undefined, Dict, List, Tuple, cast, Set
+from typing import Undefined, Dict, List, Tuple, cast, Set, Any
 
-from mypy.types import Type
+from mypy.types import Type, reset_interned_types
 from mypy.nodes import MypyFile, Node, Import, ImportFrom, ImportAll
-from mypy.nodes import SymbolTableNode, MODULE_REF
+from mypy.nodes import SymbolTableNode, MODULE_REF, Var, Decorator
+from mypy.nodes import LazySymbolTable
 from mypy.semanal import SemanticAnalyzer, FirstPass, ThirdPass
 from mypy.checker import TypeChecker
-from mypy.errors import Errors, CompileError
+from mypy.errors import Errors, CompileError, ErrorInfo, remove_path_prefix
 from mypy.icode import FuncIcode
+from mypy.cache import (
+    BuildCache, Snapshot, symbol_index, with_recursion_limit, named_nodes,
+    lookup_named_node, write_snapshot
+)
+from mypy import cache
+from mypy.parsecache import ParseCache
+from mypy.stats import BuildStats, PROGRAM
+from mypy.depends import InterfaceHasher, FunctionFilter, function_records
+from mypy.lean import release_tree
+from mypy.lazy import DefinitionLoader, defer_definitions
 from mypy import cgen
 from mypy import icode
 from mypy import parse
+from mypy import subtypes
 from mypy import transform
 
 
 debug = False
 
+# The build manager that forked the current worker process for type checking
+# (see BuildManager.type_check_in_parallel).
+checking_manager = None # type: BuildManager
+# Directory of the files that hold the results of the waves checked by the
+# worker processes (see BuildManager.type_check_in_parallel)
+wave_results_dir = None # type: str
+# Number of waves whose results the current worker process has merged (see
+# type_check_component)
+num_merged_waves = 0
+
 
 # Build targets (for selecting compiler passes)
 SEMANTIC_ANALYSIS = 0   # Semantic analysis only
@@ -47,6 +75,10 @@ COMPILE_ONLY = 'compile-only'   # Compile only to C, do not generate binary
 VERBOSE = 'verbose'             # More verbose messages (for troubleshooting)
 MODULE = 'module'               # Build/run module as a script
 TEST_BUILTINS = 'test-builtins' # Use stub builtins to speed up tests
+ALL_ERRORS = 'all-errors'       # Report errors in all modules, not only in
+                                # the first module that has errors
+MEMORY_LEAN = 'memory-lean'     # Release trees after type checking
+                                # (TYPE_CHECK target only)
 
 
 # State ids. These describe the states a source file / module can be in a
@@ -77,8 +109,10 @@ class BuildResult:
     """The result of a successful build.
 
     Attributes:
-      files:  Dictionary from module name to related AST node.
-      types:  Dictionary from parse tree node to its inferred type.
+      files:  Dictionary from module name to related AST node. With the
+              MEMORY_LEAN flag, the trees only contain definitions.
+      types:  Dictionary from parse tree node to its inferred type (empty
+              with the MEMORY_LEAN flag).
       icode:  Dictionary from function name to related Icode.
       binary_path: Path of generated binary file (for the C back end,
                    None otherwise)
@@ -94,6 +128,36 @@ class BuildResult:
         self.binary_path = binary_path
 
 
+class ProgramResult:
+    """The result of a single program in a batch build.
+
+    Attributes:
+      path:     Path of the main file of the program
+      module:   Module id of the main file
+      messages: Error messages of the program, including errors in the
+                modules that it imports (empty if there were no errors)
+    """
+
+    def __init__(self, path: str, module: str, messages: List[str]) -> None:
+        self.path = path
+        self.module = module
+        self.messages = messages
+
+
+class BatchResult(BuildResult):
+    """The result of a batch build.
+
+    Attributes (in addition to those of BuildResult):
+      programs: Results of the programs, in the order they were given
+    """
+
+    def __init__(self, files: Dict[str, MypyFile],
+                 types: Dict[Node, Type],
+                 programs: List[ProgramResult]) -> None:
+        super().__init__(files, types, {}, None)
+        self.programs = programs
+
+
 def build(program_path: str,
           target: int,
           module: str = None,
@@ -102,7 +166,12 @@ def build(program_path: str,
           bin_dir: str = None,
           output_dir: str = None,
           pyversion: int = 3,
-          flags: List[str] = None) -> BuildResult:
+          flags: List[str] = None,
+          cache_dir: str = None,
+          jobs: int = 1,
+          cache: BuildCache = None,
+          stats: BuildStats = None,
+          use_snapshot: bool = False) -> BuildResult:
     """Build a mypy program.
 
     A single call to build performs parsing, semantic analysis and optionally
@@ -124,7 +193,31 @@ def build(program_path: str,
         directories; if omitted, use '.' as the data directory
       output_dir: directory where the output (Python) is stored
       pyversion: Python version (2 for 2.x or 3 for 3.x)
-      flags: list of build options (e.g. COMPILE_ONLY)
+      flags: list of build options (e.g. COMPILE_ONLY). With ALL_ERRORS,
+        the build continues after errors and reports the errors of all
+        modules. A module is analyzed only if the modules it depends on
+        have no parse or semantic analysis errors. With MEMORY_LEAN and the
+        TYPE_CHECK target, function bodies, representations and inferred
+        types of modules are released once the modules and all modules
+        that depend on them have been type checked (see mypy.lean).
+      cache_dir: directory for storing analyzed modules between builds (see
+        mypy.cache) and parse trees (see mypy.parsecache); only used with
+        the SEMANTIC_ANALYSIS and TYPE_CHECK targets, since the cache does
+        not include the types of expressions
+      jobs: number of worker processes used for parsing and type checking
+        files; if 1, do everything in the current process. With the
+        TYPE_CHECK target, modules are type checked in worker processes and
+        the types of expressions are not included in the result; targets
+        that process the types further only parse in parallel.
+      cache: cache object to use instead of a cache directory (e.g. a
+        MemoryCache that is shared by several builds); only used with the
+        SEMANTIC_ANALYSIS and TYPE_CHECK targets, as cache_dir
+      stats: if given, record the time spent in each pass over each module
+        and other statistics in this object (see mypy.stats), also if the
+        build fails
+      use_snapshot: load fresh library modules from the snapshot in the data
+        directory, if there is one (see build_snapshot); only used with the
+        SEMANTIC_ANALYSIS and TYPE_CHECK targets, and not with a cache object
     """
     flags = flags or []
     module = module or '__main__'
@@ -157,7 +250,12 @@ def build(program_path: str,
     # Ignore current directory prefix in error messages.
     manager = BuildManager(data_dir, lib_path, target, output_dir,
                            pyversion=pyversion, flags=flags,
-                           ignore_prefix=os.getcwd())
+                           ignore_prefix=os.getcwd(),
+                           cache_dir=cache_dir,
+                           jobs=jobs,
+                           cache=cache,
+                           stats=stats,
+                           use_snapshot=use_snapshot)
 
     program_path = program_path or lookup_program(module, lib_path)
     if program_text is None:
@@ -169,7 +267,96 @@ def build(program_path: str,
     # Perform the build by sending the file as new file (UnprocessedFile is the
     # initial state of all files) to the manager. The manager will process the
     # file and all dependant modules recursively.
-    return manager.process(UnprocessedFile(info, program_text))
+    try:
+        return manager.process(UnprocessedFile(info, program_text))
+    finally:
+        manager.close()
+        if stats:
+            stats.finish()
+
+
+def build_batch(program_paths: List[str],
+                target: int,
+                modules: List[str] = None,
+                alt_lib_path: str = None,
+                bin_dir: str = None,
+                pyversion: int = 3,
+                flags: List[str] = None,
+                cache_dir: str = None,
+                jobs: int = 1,
+                cache: BuildCache = None,
+                stats: BuildStats = None,
+                use_snapshot: bool = False) -> BatchResult:
+    """Build several mypy programs together.
+
+    Modules imported by several programs are processed only once. The
+    build continues after errors as with the ALL_ERRORS flag, and the
+    errors are reported separately for each program in the result (the
+    errors in a shared module are included in the messages of every
+    program that imports it). Only the SEMANTIC_ANALYSIS and TYPE_CHECK
+    targets are supported.
+
+    Arguments:
+      program_paths: paths to the main source files of programs; each one
+        gets a distinct module id ('__main__#1', '__main__#2' etc.), and
+        the directories of the files are included in the module search path
+      target: select passes to perform (a build target constant)
+    Optional arguments:
+      modules: names of modules to build as programs (in addition to the
+        program files), looked up in the module search path
+      The other arguments are as for the build function.
+    """
+    if target > TYPE_CHECK:
+        raise RuntimeError('Unsupported target %d' % target)
+    flags = (flags or []) + [ALL_ERRORS]
+    modules = modules or []
+
+    data_dir = default_data_dir(bin_dir)
+    lib_path = default_lib_path(data_dir, target, pyversion)
+    if TEST_BUILTINS in flags:
+        lib_path.insert(0, os.path.join('mypy', 'test', 'data', 'lib-stub'))
+    else:
+        program_dirs = List[str]()
+        for path in program_paths:
+            dir = remove_cwd_prefix_from_path(dirname(path))
+            if dir not in program_dirs:
+                program_dirs.append(dir)
+        if modules and os.getcwd() not in program_dirs:
+            program_dirs.append(os.getcwd())
+        lib_path[0:0] = program_dirs
+    if alt_lib_path:
+        lib_path.insert(0, alt_lib_path)
+
+    manager = BuildManager(data_dir, lib_path, target, None,
+                           pyversion=pyversion, flags=flags,
+                           ignore_prefix=os.getcwd(),
+                           cache_dir=cache_dir,
+                           jobs=jobs,
+                           cache=cache,
+                           stats=stats,
+                           use_snapshot=use_snapshot)
+    try:
+        ids = List[str]()
+        for i, path in enumerate(program_paths):
+            id = '__main__#{}'.format(i + 1)
+            info = StateInfo(path, id, [], manager)
+            manager.add_program(UnprocessedFile(info, read_program(path)))
+            ids.append(id)
+        for module in modules:
+            # The module may have been added already as a package of
+            # another module.
+            if not manager.has_module(module):
+                path = lookup_program(module, lib_path)
+                info = StateInfo(path, module, [], manager)
+                manager.add_program(UnprocessedFile(info,
+                                                    read_program(path)))
+            if module not in ids:
+                ids.append(module)
+        return manager.process_batch(ids)
+    finally:
+        manager.close()
+        if stats:
+            stats.finish()
 
 
 def default_data_dir(bin_dir: str) -> str:
@@ -210,13 +397,7 @@ def default_lib_path(data_dir: str, target: int, pyversion: int) -> List[str]:
         # Add C back end library directory.
         path.append(os.path.join(data_dir, 'lib'))
     else:
-        # Add library stubs directory. By convention, they are stored in the
-        # stubs/x.y directory of the mypy installation.
-        version_dir = '3.2'
-        if pyversion < 3:
-            version_dir = '2.7'
-        path.append(os.path.join(data_dir, 'stubs', version_dir))
-        path.append(os.path.join(data_dir, 'stubs-auto', version_dir))
+        path.extend(stub_dirs(data_dir, pyversion))
     
     # Add fallback path that can be used if we have a broken installation.
     if sys.platform != 'win32':
@@ -225,6 +406,64 @@ def default_lib_path(data_dir: str, target: int, pyversion: int) -> List[str]:
     return path
 
 
+def stub_dirs(data_dir: str, pyversion: int) -> List[str]:
+    """Return the library stub directories."""
+    # By convention, library stubs are stored in the stubs/x.y directory of
+    # the mypy installation.
+    version_dir = '3.2'
+    if pyversion < 3:
+        version_dir = '2.7'
+    return [os.path.join(data_dir, 'stubs', version_dir),
+            os.path.join(data_dir, 'stubs-auto', version_dir)]
+
+
+def snapshot_path(data_dir: str, pyversion: int, target: int) -> str:
+    """Return the path of the snapshot of analyzed library modules."""
+    return os.path.join(data_dir, 'snapshot',
+                        '{}-{}.snapshot'.format(pyversion, target))
+
+
+def build_snapshot(bin_dir: str = None, pyversion: int = 3,
+                   target: int = TYPE_CHECK) -> str:
+    """Analyze all library stubs and store them as a snapshot.
+
+    The snapshot is written to the data directory and used by builds with
+    the use_snapshot option (see mypy.cache.Snapshot). Return the path of
+    the snapshot. Raise CompileError if the stubs have errors.
+    """
+    data_dir = default_data_dir(bin_dir)
+    dirs = stub_dirs(data_dir, pyversion)
+    ids = List[str]()
+    for dir in dirs:
+        for root, subdirs, files in os.walk(dir):
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.relpath(os.path.join(root, name), dir)
+                    id = path[:-3].replace(os.sep, '.')
+                    if id.endswith('.__init__'):
+                        id = id[:-len('.__init__')]
+                    ids.append(id)
+    program = ''.join('import {}\n'.format(id) for id in ids)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        result = build('<snapshot>', target, program_text=program,
+                       bin_dir=bin_dir, pyversion=pyversion,
+                       cache_dir=cache_dir)
+        # Leave out the program and any modules that were not found in the
+        # stub directories.
+        stubs = List[str]()
+        for id, tree in result.files.items():
+            for dir in dirs:
+                if tree.path.startswith(os.path.join(dir, '')):
+                    stubs.append(id)
+        path = snapshot_path(data_dir, pyversion, target)
+        write_snapshot(path, BuildCache(cache_dir, pyversion, target, None),
+                       stubs, data_dir)
+        return path
+    finally:
+        shutil.rmtree(cache_dir)
+
+
 def lookup_program(module: str, lib_path: List[str]) -> str:
     path = find_module(module, lib_path)
     if path:
@@ -256,6 +495,7 @@ class BuildManager:
       data_dir:        Mypy data directory (contains stubs)
       target:          Build target; selects which passes to perform
       lib_path:        Library path for looking up modules
+      module_index:    Index of module source files in the library path
       semantic_analyzer:
                        Semantic analyzer, pass 2
       semantic_analyzer_pass3:
@@ -265,18 +505,58 @@ class BuildManager:
       output_dir:      Store output files here (Python)
       pyversion:       Python version (2 or 3)
       flags:           Build options
-      states:          States of all individual files that are being
-                       processed. Each file in a build is always represented
-                       by a single state object (after it has been encountered
-                       for the first time). This is the only place where
-                       states are stored.
+      states:          Map from module id to the state of the file. Each
+                       file in a build is always represented by a single state
+                       object (after it has been encountered for the first
+                       time). This is the only place where states are stored.
+      module_ids:      Ids of all modules in the build, in the order they
+                       were encountered
+      module_order:    Map from module id to its index in module_ids
+      path_modules:    Map from source file path to module id
       module_files:    Map from module name to source file path. There is a
                        1:1 mapping between modules and source files.
+      blockers:        Map from id of an unprocessed module to the number of
+                       its surrounding packages that are not parsed yet
+      dependents:      Map from id of a module that is not parsed yet to the
+                       ids of unprocessed modules that wait for it
+      ready:           Heap of (-index, module id) tuples for unprocessed
+                       files that can be parsed; a later discovered module is
+                       preferred
       icode:           Generated icode (when compiling via C)
       binary_path:     Path of the generated binary (or None)
-      module_deps:     Cache for module dependencies (direct or indirect).
-                       Item (m, n) indicates whether m depends on n (directly
-                       or indirectly).
+      cache:           Persistent cache of analyzed modules, or a snapshot of
+                       library modules (or None)
+      cached_modules:  Ids of modules that were loaded from the cache
+      jobs:            Number of worker processes for parsing and type
+                       checking
+      parser_pool:     Worker processes for parsing files (or None)
+      parse_jobs:      Map from module id to the pending result of parsing
+                       the file in a worker process
+      checking_index:  Index of named definitions used for passing type
+                       checking results from worker processes (see
+                       mypy.cache.symbol_index)
+      interface_hasher:
+                       Interface hashes of definitions, used for skipping
+                       unchanged function bodies (see mypy.depends)
+      all_errors:      Continue the build after errors (ALL_ERRORS flag)
+      stats:           Timing and counters of the build (or None)
+      failed:          Ids of modules that had errors before type checking,
+                       or that depend on such modules and were not analyzed
+                       (only with all_errors)
+      lean:            Release trees after type checking (MEMORY_LEAN flag)
+      keep_repr:       Store the representations of nodes in parse trees
+                       (only needed for producing formatted output)
+      parse_cache:     Persistent cache of parse trees (or None)
+      unchecked_dependents:
+                       Map from module id to the number of modules that
+                       depend on it and have not been type checked (only
+                       with lean, during type checking)
+      released:        Ids of modules whose trees have been released
+      type_maps:       Types of expressions by module id, until the module
+                       is released (only with lean)
+      definition_records:
+                       Function records of released modules, for the cache
+                       (see mypy.depends.function_records)
 
     TODO Refactor code related to transformation, icode generation etc. to
          external objects.  This module should not directly depend on them.
@@ -288,11 +568,19 @@ class BuildManager:
                  output_dir: str,
                  pyversion: int,
                  flags: List[str],
-                 ignore_prefix: str) -> None:
+                 ignore_prefix: str,
+                 cache_dir: str = None,
+                 jobs: int = 1,
+                 cache: BuildCache = None,
+                 stats: BuildStats = None,
+                 use_snapshot: bool = False) -> None:
+        # Types interned by an earlier build refer to its type infos.
+        reset_interned_types()
         self.data_dir = data_dir
         self.errors = Errors()
         self.errors.set_ignore_prefix(ignore_prefix)
         self.lib_path = lib_path
+        self.module_index = ModuleIndex(lib_path)
         self.target = target
         self.output_dir = output_dir
         self.pyversion = pyversion
@@ -302,11 +590,57 @@ class BuildManager:
         self.type_checker = TypeChecker(self.errors,
                                         self.semantic_analyzer.modules,
                                         self.pyversion)
-        self.states = List[State]()
+        self.states = Dict[str, State]()
+        self.module_ids = List[str]()
+        self.module_order = Dict[str, int]()
+        self.path_modules = Dict[str, str]()
         self.module_files = Dict[str, str]()
+        self.blockers = Dict[str, int]()
+        self.dependents = Dict[str, List[str]]()
+        self.ready = List[Tuple[int, str]]()
         self.icode = Dict[str, FuncIcode]()
         self.binary_path = None # type: str
-        self.module_deps = Dict[Tuple[str, str], bool]()
+        self.cache = None # type: BuildCache
+        snapshot = None # type: Snapshot
+        if use_snapshot and target <= TYPE_CHECK:
+            snapshot = Snapshot(snapshot_path(data_dir, pyversion, target),
+                                data_dir, self.read_source)
+        if cache and target <= TYPE_CHECK:
+            self.cache = cache
+            cache.start_build(self.read_source)
+        elif cache_dir and target <= TYPE_CHECK:
+            self.cache = BuildCache(cache_dir, pyversion, target,
+                                    self.read_source, snapshot)
+        elif snapshot:
+            self.cache = snapshot
+        self.cached_modules = Set[str]()
+        self.checking_index = None # type: Dict[int, Tuple[str, List[str]]]
+        self.jobs = jobs
+        self.parser_pool = None # type: multiprocessing.pool.Pool
+        if jobs > 1:
+            self.parser_pool = multiprocessing.Pool(jobs)
+        self.parse_jobs = Dict[str, multiprocessing.pool.AsyncResult]()
+        self.interface_hasher = InterfaceHasher(
+            self.semantic_analyzer.modules,
+            lambda id: self.module_state(id) == TYPE_CHECKED_STATE)
+        self.all_errors = ALL_ERRORS in flags
+        self.failed = Set[str]()
+        self.stats = stats
+        self.lean = MEMORY_LEAN in flags and target == TYPE_CHECK
+        # Representations are used by the transformation to Python code,
+        # which all targets after TYPE_CHECK are based on.
+        self.keep_repr = target > TYPE_CHECK
+        self.parse_cache = None # type: ParseCache
+        if cache_dir and not self.keep_repr:
+            self.parse_cache = ParseCache(cache_dir, pyversion)
+        self.unchecked_dependents = None # type: Dict[str, int]
+        self.released = Set[str]()
+        self.type_maps = Dict[str, Dict[Node, Type]]()
+        self.definition_records = Dict[str, Dict[str, Any]]()
+        # Analyze the definitions of stubs on demand (see mypy.lazy). All
+        # definitions are needed for code generation and for reporting all
+        # errors.
+        self.lazy_stubs = target <= TYPE_CHECK and not self.all_errors
     
     def process(self, initial_state: 'UnprocessedFile') -> BuildResult:
         """Perform a build.
@@ -316,63 +650,437 @@ class BuildManager:
         manager object.  The return values are identical to the return
         values of the build function.
         """
-        self.states.append(initial_state)
-        
-        # Process states in a loop until all files (states) have been
-        # semantically analyzed or type checked (depending on target).
-        #
-        # We type check all files before the rest of the passes so that we can
-        # report errors and fail as quickly as possible.
-        while True:
-            # Find the next state that has all its dependencies met.
-            next = self.next_available_state()
-            if not next:
-                trace('done')
-                break
-            
-            # Potentially output some debug information.
-            trace('next {} ({})'.format(next.path, next.state()))
-            
-            # Set the import context for reporting error messages correctly.
-            self.errors.set_import_context(next.import_context)
-            # Process the state. The process method is reponsible for adding a
-            # new state object representing the new state of the file.
-            next.process()
-        
-            # Raise exception if the build failed. The build can fail for
-            # various reasons, such as parse error, semantic analysis error,
-            # etc.
-            if self.errors.is_errors():
-                self.errors.raise_error()
+        self.add_program(initial_state)
+        self.analyze()
+
+        # Only possible with all_errors; otherwise the build has failed
+        # already.
+        if self.errors.is_errors():
+            self.errors.raise_error()
         
         # If there were no errors, all files should have been fully processed.
-        for s in self.states:
+        for s in self.all_states():
             assert s.state() == final_state, (
                 '{} still unprocessed'.format(s.path))
         
         # Collect a list of all files.
         trees = List[MypyFile]()
-        for state in self.states:
+        for state in self.all_states():
             trees.append((cast('ParsedFile', state)).tree)
 
+        if self.cache and self.cache.writable:
+            self.write_cache()
+
         # Perform any additional passes after type checking for all the files.
         self.final_passes(trees, self.type_checker.type_map)
         
-        return BuildResult(self.semantic_analyzer.modules,
-                           self.type_checker.type_map,
+        return BuildResult(self.semantic_analyzer.modules, self.result_types(),
                            self.icode, self.binary_path)
+
+    def process_batch(self, ids: List[str]) -> 'BatchResult':
+        """Perform a batch build of several programs.
+
+        The arguments are the module ids of the main files of the programs,
+        which have been added using add_program. The build continues after
+        errors (all_errors must be set). The return value is identical to
+        the return value of the build_batch function.
+        """
+        self.analyze()
+        programs = List[ProgramResult]()
+        for id in ids:
+            errors = self.program_errors(id)
+            programs.append(ProgramResult(self.states[id].path, id,
+                                          self.errors.messages(errors)))
+        # The function records of the cache would let later builds skip
+        # the functions with errors, so only error-free builds are cached
+        # (as in process).
+        if (self.cache and self.cache.writable and
+                not self.errors.is_errors()):
+            complete = True
+            for state in self.all_states():
+                if state.state() != final_state:
+                    complete = False
+            if complete:
+                self.write_cache()
+        return BatchResult(self.semantic_analyzer.modules, self.result_types(),
+                           programs)
+
+    def add_program(self, state: 'UnprocessedFile') -> None:
+        """Add the main file of a program to the build."""
+        if self.cache and self.cache.is_fresh(state.id, state.path,
+                                              state.program_text):
+            self.load_cached(state.id, [])
+        else:
+            self.add_state(state)
+
+    def analyze(self) -> None:
+        """Process the main files of the programs and the modules they import.
+
+        Parse, semantically analyze and type check (depending on the
+        target) all the files. Raise CompileError after the first file
+        with errors, unless all_errors is set.
+        """
+        # Parse all files in a loop. Parsing a file adds the modules it
+        # imports to be parsed, so after this we have the complete import
+        # graph of the program.
+        while True:
+            # Find the next file whose surrounding packages have been parsed.
+            next = self.next_unprocessed_state()
+            if not next:
+                break
+            self.process_state(next)
+        # Report any missing modules now; otherwise some files would remain
+        # unprocessed.
+        if self.errors.is_errors() and not self.all_errors:
+            self.errors.raise_error()
+        self.close()
+
+        # Semantically analyze and type check the strongly connected
+        # components (import cycles) of the import graph, dependencies first.
+        # All files in a component go through each pass before any of them
+        # continues to the next pass.
+        #
+        # We type check all files before the rest of the passes so that we can
+        # report errors and fail as quickly as possible.
+        components = self.sorted_components()
+        if self.lean:
+            self.count_unchecked_dependents()
+        if (self.jobs > 1 and self.target == TYPE_CHECK and
+                'fork' in multiprocessing.get_all_start_methods()):
+            for component in components:
+                self.process_component(component, SEMANTICALLY_ANALYSED_STATE)
+            self.type_check_in_parallel(components)
+        else:
+            for component in components:
+                self.process_component(component)
+        trace('done')
+
+    def result_types(self) -> Dict[Node, Type]:
+        """Return the inferred types to include in the result of a build."""
+        if self.lean:
+            return {}
+        return self.type_checker.type_map
+
+    def program_errors(self, id: str) -> List[ErrorInfo]:
+        """Return the errors reported in a module and in the modules that
+        it imports (directly or indirectly)."""
+        files = Set[str]()
+        seen = set([id])
+        todo = [id]
+        while todo:
+            state = self.states[todo.pop()]
+            files.add(remove_path_prefix(os.path.normpath(state.path),
+                                         self.errors.ignore_prefix))
+            for dep in state.dependencies:
+                if dep not in seen and dep in self.states:
+                    seen.add(dep)
+                    todo.append(dep)
+        return [e for e in self.errors.error_info if e.file in files]
+
+    def process_state(self, state: 'State') -> None:
+        """Advance a file to the next state."""
+        # Potentially output some debug information.
+        trace('next {} ({})'.format(state.path, state.state()))
+        
+        # Set the import context for reporting error messages correctly.
+        self.errors.set_import_context(state.import_context)
+        # Process the state. The process method is reponsible for adding a
+        # new state object representing the new state of the file.
+        old_state = state.state()
+        num_errors = self.errors.num_messages()
+        state.process()
+        
+        # Raise exception if the build failed. The build can fail for
+        # various reasons, such as parse error, semantic analysis error,
+        # etc.
+        if self.errors.num_messages() != num_errors:
+            if not self.all_errors:
+                self.errors.raise_error()
+            if earlier_state(old_state, SEMANTICALLY_ANALYSED_STATE):
+                # The file cannot be type checked, and neither can the
+                # modules that depend on it.
+                self.failed.add(state.id)
+
+    def process_component(self, component: List[str],
+                          last_state: int = final_state) -> None:
+        """Advance all files in a strongly connected component to a state,
+        one pass at a time.
+
+        With all_errors, stop processing the component if a file in it or a
+        module it depends on has failed.
+        """
+        if self.all_errors and self.is_blocked(component):
+            self.failed |= set(component)
+            return
+        for s in (PARSED_STATE, PARTIAL_SEMANTIC_ANALYSIS_STATE,
+                  SEMANTICALLY_ANALYSED_STATE):
+            if s < last_state:
+                for state in self.component_states(component):
+                    # Files loaded from the cache are already processed.
+                    if state.state() == s:
+                        self.process_state(state)
+                if self.all_errors and self.is_blocked(component):
+                    self.failed |= set(component)
+                    return
+
+    def is_blocked(self, component: List[str]) -> bool:
+        """Has a file in a component or a module it depends on failed?
+
+        A missing module counts as failed.
+        """
+        for id in component:
+            if id in self.failed:
+                return True
+            for dep in self.states[id].dependencies:
+                if dep in self.failed or dep not in self.states:
+                    return True
+        return False
+
+    def component_states(self, component: List[str]) -> List['ParsedFile']:
+        """Return the states of the files in a component in processing order.
+
+        Files are processed in the reverse order of discovery (a module
+        imported later is more likely to be needed by the others).
+        """
+        ids = sorted(component, key=lambda id: -self.module_order[id])
+        return [cast('ParsedFile', self.states[id]) for id in ids]
+
+    def type_check_in_parallel(self, components: List[List[str]]) -> None:
+        """Type check semantically analyzed components in worker processes.
+
+        Components are checked in waves: a wave consists of the components
+        whose dependencies have all been checked in earlier waves. The worker
+        processes are forked once, when the first wave with several
+        components is reached; waves with a single component before that are
+        checked directly. Each worker sends back the errors and the inferred
+        types of the definitions that other modules can refer to, and these
+        are merged in the order of the components. The results of each wave
+        are also written to a file, and workers read and merge the waves
+        they have not seen before checking a component, so that a task only
+        carries the component and the number of waves checked so far.
+        
+        This requires the fork start method, since the workers use the
+        state of the build manager.
+        """
+        global checking_manager, wave_results_dir
+        waves = List[List[List[str]]]()
+        wave_of = Dict[str, int]()
+        for component in components:
+            if self.states[component[0]].state() == final_state:
+                # Loaded from the cache.
+                wave = -1
+            elif component[0] in self.failed:
+                # Cannot be type checked (only with all_errors). The
+                # modules that depend on the component have failed too.
+                continue
+            else:
+                wave = 0
+                for id in component:
+                    for dep in self.states[id].dependencies:
+                        if dep in wave_of:
+                            wave = max(wave, wave_of[dep] + 1)
+                if wave == len(waves):
+                    waves.append([])
+                waves[wave].append(component)
+            for id in component:
+                wave_of[id] = wave
+
+        self.checking_index = symbol_index(self.semantic_analyzer.modules)
+        checking_manager = self
+        pool = None # type: multiprocessing.pool.Pool
+        # Number of waves checked by the workers
+        num_waves = 0
+        try:
+            for wave_components in waves:
+                if pool is None and len(wave_components) == 1:
+                    self.process_component(wave_components[0])
+                    continue
+                if pool is None:
+                    wave_results_dir = tempfile.mkdtemp(prefix='mypy-waves')
+                    pool = multiprocessing.get_context('fork').Pool(self.jobs)
+                tasks = [(component, num_waves)
+                         for component in wave_components]
+                wave_results = pool.map(type_check_component, tasks)
+                for component, result in zip(wave_components, wave_results):
+                    self.merge_checked_component(component, result)
+                f = open(wave_results_path(num_waves), 'wb')
+                pickle.dump(wave_results, f)
+                f.close()
+                num_waves += 1
+                if self.errors.is_errors() and not self.all_errors:
+                    self.errors.raise_error()
+        finally:
+            checking_manager = None
+            if pool:
+                pool.terminate()
+                pool.join()
+                shutil.rmtree(wave_results_dir, ignore_errors=True)
+                wave_results_dir = None
+
+    def merge_checked_component(self, component: List[str],
+                                result: bytes) -> None:
+        """Merge the result of type checking a component in a worker."""
+        errors, inferred = cache.loads(result, self.semantic_analyzer.modules)
+        self.errors.error_info.extend(errors)
+        self.merge_inferred_types(inferred)
+        for state in self.component_states(component):
+            self.replace_state(TypeCheckedFile(state.info(), state.tree))
+
+    def merge_inferred_types(self, inferred: List[Tuple[str, List[str], Type,
+                                                        bool]]) -> None:
+        """Set the types inferred for variables in a worker process."""
+        modules = self.semantic_analyzer.modules
+        for mod, path, type, is_ready in inferred:
+            node = lookup_named_node(modules, mod, path)
+            if isinstance(node, Decorator):
+                var = (cast(Decorator, node)).var
+            else:
+                var = cast(Var, node)
+            var.type = type
+            var.is_ready = is_ready
+
+    def sorted_components(self) -> List[List[str]]:
+        """Return the strongly connected components of the import graph.
+
+        Each component is a single module or a set of modules that import
+        each other (directly or indirectly). A component comes after all
+        the components it depends on. The order only depends on the import
+        graph.
+        """
+        graph = Dict[str, List[str]]()
+        for state in self.all_states():
+            graph[state.id] = state.dependencies
+        return strongly_connected_components(graph)
     
-    def next_available_state(self) -> 'State':
-        """Find a ready state (one that has all its dependencies met)."""
-        i = len(self.states) - 1
-        while i >= 0:
-            if self.states[i].is_ready():
-                num_incomplete = self.states[i].num_incomplete_deps()
-                if num_incomplete == 0:
-                    # This is perfect; no need to look for the best match.
-                    return self.states[i]
-            i -= 1
+    def next_unprocessed_state(self) -> 'State':
+        """Find an unprocessed state whose surrounding packages are parsed.
+
+        If there are several, prefer the most recently encountered module.
+        """
+        while self.ready:
+            id = heapq.heappop(self.ready)[1]
+            state = self.states[id]
+            if state.state() == UNPROCESSED_STATE:
+                return state
         return None
+
+    def all_states(self) -> List['State']:
+        """Return the states of all files, in the order of discovery."""
+        return [self.states[id] for id in self.module_ids]
+
+    def add_state(self, state: 'State') -> None:
+        """Add the initial state of a file that was not seen before."""
+        self.module_order[state.id] = len(self.module_ids)
+        self.module_ids.append(state.id)
+        self.module_files[state.id] = state.path
+        self.path_modules[state.path] = state.id
+        if self.parser_pool and state.state() == UNPROCESSED_STATE:
+            self.start_parsing(cast('UnprocessedFile', state))
+        self.update_state(state, UNSEEN_STATE)
+
+    def start_parsing(self, state: 'UnprocessedFile') -> None:
+        """Start parsing a file in a worker process.
+
+        The result is picked up when the file is processed. Files are
+        parsed in the order they are discovered, which is usually not far
+        from the order they are processed in. Cached trees are loaded when
+        the file is processed instead.
+        """
+        if self.parse_cache and self.parse_cache.contains(state.program_text):
+            return
+        args = (state.program_text, state.path, self.pyversion,
+                state.import_context, self.errors.ignore_prefix,
+                self.keep_repr, self.parse_cache)
+        self.parse_jobs[state.id] = self.parser_pool.apply_async(parse_file,
+                                                                 args)
+
+    def close(self) -> None:
+        """Release the resources used by the build (worker processes)."""
+        if self.parser_pool:
+            self.parser_pool.terminate()
+            self.parser_pool.join()
+            self.parser_pool = None
+
+    def replace_state(self, state: 'State') -> None:
+        """Replace the state of a file with a new state."""
+        self.update_state(state, self.states[state.id].state())
+        if self.lean and state.state() == TYPE_CHECKED_STATE:
+            self.release_checked(state.id)
+
+    def update_state(self, state: 'State', old_state: int) -> None:
+        """Store a new state of a module and update the parse queue.
+
+        An unprocessed file can be parsed once all its surrounding packages
+        have been parsed. Keep count of the packages that are not parsed
+        yet; the cost is linear in the number of dependencies and dependents
+        of the module.
+        """
+        id = state.id
+        self.states[id] = state
+        if state.state() == UNPROCESSED_STATE:
+            num_blockers = 0
+            for dep in set(state.dependencies):
+                if earlier_state(self.module_state(dep), PARSED_STATE):
+                    self.dependents.setdefault(dep, []).append(id)
+                    num_blockers += 1
+            self.blockers[id] = num_blockers
+            self.enqueue_if_ready(id)
+        elif earlier_state(old_state, PARSED_STATE):
+            # The file was parsed or loaded from the cache.
+            for dependent in self.dependents.pop(id, []):
+                self.blockers[dependent] -= 1
+                self.enqueue_if_ready(dependent)
+
+    def count_unchecked_dependents(self) -> None:
+        """Count the modules that depend on each module and have not been
+        type checked yet (see release_checked)."""
+        self.unchecked_dependents = {}
+        for state in self.all_states():
+            self.unchecked_dependents.setdefault(state.id, 0)
+            if state.state() != TYPE_CHECKED_STATE:
+                for dep in set(state.dependencies):
+                    if dep in self.states:
+                        self.unchecked_dependents[dep] = (
+                            self.unchecked_dependents.get(dep, 0) + 1)
+
+    def release_checked(self, id: str) -> None:
+        """Release the trees that are not needed after checking a module.
+
+        The tree of a module is released once the module and all modules
+        that depend on it have been type checked, so that trees stay
+        complete while any module that can refer to them is analyzed.
+        Modules loaded from the cache are shared with the cache and are left
+        alone.
+        """
+        candidates = [id]
+        for dep in set(self.states[id].dependencies):
+            if dep in self.unchecked_dependents:
+                self.unchecked_dependents[dep] -= 1
+                candidates.append(dep)
+        for mod in candidates:
+            if (self.unchecked_dependents[mod] == 0 and
+                    self.module_state(mod) == TYPE_CHECKED_STATE and
+                    mod not in self.released and
+                    mod not in self.cached_modules):
+                self.release_module(mod)
+
+    def release_module(self, id: str) -> None:
+        """Release the function bodies, representations and expression
+        types of a type checked module."""
+        tree = self.semantic_analyzer.modules[id]
+        if self.cache:
+            load_deferred(tree)
+            # The records depend on the function bodies.
+            self.interface_hasher.clear_provisional()
+            self.definition_records[id] = function_records(
+                tree, self.interface_hasher)
+        release_tree(tree)
+        self.type_maps.pop(id, None)
+        self.released.add(id)
+
+    def enqueue_if_ready(self, id: str) -> None:
+        if self.blockers[id] == 0:
+            heapq.heappush(self.ready, (-self.module_order[id], id))
     
     def has_module(self, name: str) -> bool:
         """Have we seen a module yet?"""
@@ -386,10 +1094,10 @@ class BuildManager:
 
         This function does not consider any dependencies.
         """
-        for s in self.states:
-            if s.path == path:
-                return s.state()
-        return UNSEEN_STATE
+        id = self.path_modules.get(path)
+        if id is None:
+            return UNSEEN_STATE
+        return self.states[id].state()
     
     def module_state(self, name: str) -> int:
         """Return the state of a module.
@@ -397,48 +1105,12 @@ class BuildManager:
         In particular, return UNSEEN_STATE if the file has no associated
         state.
 
-        This considers also module dependencies.
+        This does not consider module dependencies.
         """
-        if not self.has_module(name):
+        state = self.states.get(name)
+        if state is None:
             return UNSEEN_STATE
-        state = final_state
-        fs = self.file_state(self.module_files[name])
-        if earlier_state(fs, state):
-            state = fs
-        return state
-
-    def is_dep(self, m1: str, m2: str, done: Set[str] = None) -> bool:
-        """Does m1 import m2 directly or indirectly?"""
-        # Have we computed this previously?
-        dep = self.module_deps.get((m1, m2))
-        if dep is not None:
-            return dep
-        
-        if not done:
-            done = set([m1])
-            
-        # m1 depends on m2 iff one of the deps of m1 depends on m2.
-        st = self.lookup_state(m1)
-        for m in st.dependencies:
-            if m in done:
-                continue
-            done.add(m)
-            # Cache this dependency.
-            self.module_deps[m1, m] = True
-            # Search recursively.
-            if m == m2 or self.is_dep(m, m2, done):
-                # Yes! Mark it in the cache.
-                self.module_deps[m1, m2] = True
-                return True
-        # No dependency. Mark it in the cache.
-        self.module_deps[m1, m2] = False
-        return False
-
-    def lookup_state(self, module: str) -> 'State':
-        for state in self.states:
-            if state.id == module:
-                return state
-        raise RuntimeError('%s not found' % str)
+        return state.state()
     
     def all_imported_modules_in_file(self,
                                      file: MypyFile) -> List[Tuple[str, int]]:
@@ -466,7 +1138,111 @@ class BuildManager:
     
     def is_module(self, id: str) -> bool:
         """Is there a file in the file system corresponding to module id?"""
-        return find_module(id, self.lib_path) is not None
+        return self.module_index.find_module(id) is not None
+
+    def read_source(self, id: str) -> Tuple[str, str]:
+        """Find and read the source file of a module.
+
+        Return a pair (path, file contents), or (None, None) if the module
+        could not be found or read.
+        """
+        started = self.start_pass()
+        result = read_source_file(self.module_index.find_module(id))
+        self.end_pass(id, 'read', started)
+        return result
+
+    def start_pass(self) -> Tuple[float, float]:
+        """Start timing a pass over a module (if collecting statistics)."""
+        if self.stats:
+            return self.stats.start()
+        return None
+
+    def end_pass(self, id: str, name: str, started: Tuple[float, float]
+                 ) -> None:
+        """Record the cost of a pass over a module (see start_pass)."""
+        if self.stats:
+            self.stats.stop(id, name, started)
+
+    def add_submodule(self, id: str, tree: MypyFile) -> None:
+        """Include a module in the symbol table of the enclosing package."""
+        if '.' in id:
+            c = id.split('.')
+            p = '.'.join(c[:-1])
+            sem_anal = self.semantic_analyzer
+            sem_anal.modules[p].names[c[-1]] = SymbolTableNode(
+                MODULE_REF, tree, p)
+
+    def load_cached(self, id: str,
+                    import_context: List[Tuple[str, int]]) -> None:
+        """Load a fresh module and any modules stored with it from the cache.
+
+        Also load all the modules they depend on, if needed. The loaded
+        modules are fully processed and will not be analyzed again.
+        """
+        component = self.cache.component(id)
+        for mod in component:
+            for dep in self.cache.dependencies(mod):
+                if not self.has_module(dep) and dep not in component:
+                    self.load_cached(dep, import_context)
+        modules = self.semantic_analyzer.modules
+        for tree, errors in self.cache.load_component(id, modules):
+            trace('load cached {}'.format(tree.path))
+            mod = tree.fullname()
+            modules[mod] = tree
+            self.add_submodule(mod, tree)
+            self.module_files[mod] = tree.path
+            self.cached_modules.add(mod)
+            if self.stats:
+                self.stats.count(mod, 'cached')
+            self.errors.error_info.extend(errors)
+            info = StateInfo(tree.path, mod, import_context, self)
+            self.add_state(TypeCheckedFile(info, tree))
+
+    def function_filter(self, id: str, tree: MypyFile) -> FunctionFilter:
+        """Return the filter of unchanged functions of a module.
+
+        Return None if the cache has no records of the module.
+        """
+        if not self.cache:
+            return None
+        meta = self.cache.read_meta(id)
+        if not meta or not meta.definitions:
+            return None
+        return FunctionFilter(tree, meta.definitions, self.interface_hasher)
+
+    def write_cache(self) -> None:
+        """Store all processed modules in the cache.
+
+        Modules in import cycles are stored together.
+        """
+        modules = self.semantic_analyzer.modules
+        graph = Dict[str, List[str]]()
+        paths = Dict[str, str]()
+        for state in self.all_states():
+            graph[state.id] = state.dependencies
+            paths[state.id] = state.path
+        index = symbol_index(modules)
+        self.interface_hasher.clear_provisional()
+        for component in strongly_connected_components(graph):
+            if component[0] in self.cached_modules:
+                continue
+            errors = Dict[str, List[ErrorInfo]]()
+            definitions = Dict[str, Dict[str, Any]]()
+            for mod in component:
+                errors[mod] = self.module_errors(paths[mod])
+                if mod in self.definition_records:
+                    definitions[mod] = self.definition_records[mod]
+                elif self.target == TYPE_CHECK:
+                    definitions[mod] = function_records(
+                        modules[mod], self.interface_hasher)
+            self.cache.write_component(component, modules, paths, graph,
+                                       errors, index, definitions)
+
+    def module_errors(self, path: str) -> List[ErrorInfo]:
+        """Return the errors reported in a source file."""
+        file = remove_path_prefix(os.path.normpath(path),
+                                  self.errors.ignore_prefix)
+        return [e for e in self.errors.error_info if e.file == file]
 
     def final_passes(self, files: List[MypyFile],
                      types: Dict[Node, Type]) -> None:
@@ -507,7 +1283,9 @@ class BuildManager:
                 self.type_checker.type_map,
                 self.semantic_analyzer.modules,
                 is_pretty=True)
+            started = self.start_pass()
             f.accept(v)
+            self.end_pass(f.fullname(), 'transform', started)
 
     def generate_icode(self, files: List[MypyFile],
                        types: Dict[Node, Type]) -> None:
@@ -515,14 +1293,18 @@ class BuildManager:
         for f in files:
             # TODO remove ugly builtins hack
             if not f.path.endswith('/builtins.py'):
+                started = self.start_pass()
                 f.accept(builder)
+                self.end_pass(f.fullname(), 'icode', started)
         self.icode = builder.generated
 
     def generate_c_and_compile(self, files: List[MypyFile]) -> None:
         gen = cgen.CGenerator()
         
+        started = self.start_pass()
         for fn, icode in self.icode.items():
             gen.generate_function('M' + fn, icode)
+        self.end_pass(PROGRAM, 'cgen', started)
 
         program_name = os.path.splitext(basename(files[0].path))[0]
         c_file = '%s.c' % program_name
@@ -555,6 +1337,12 @@ class BuildManager:
             print('LOG: %s' % message)
 
 
+def load_deferred(tree: MypyFile) -> None:
+    """Analyze all deferred definitions of a module (see mypy.lazy)."""
+    if isinstance(tree.names, LazySymbolTable):
+        (cast(LazySymbolTable, tree.names)).load_all()
+
+
 def remove_cwd_prefix_from_path(p: str) -> str:
     """Remove current working directory prefix from p, if present.
 
@@ -638,21 +1426,6 @@ class State:
     def process(self) -> None:
         raise RuntimeError('Not implemented')
     
-    def is_ready(self) -> bool:
-        """Return True if all dependencies are at least in the same state
-        as this object (but not in the initial state).
-        """
-        for module in self.dependencies:
-            state = self.manager.module_state(module)
-            if earlier_state(state,
-                             self.state()) or state == UNPROCESSED_STATE:
-                return False
-        return True
-
-    def num_incomplete_deps(self) -> int:
-        """Return the number of dependencies that are ready but incomplete."""
-        return 0 # Does not matter in this state
-    
     def state(self) -> int:
         raise RuntimeError('Not implemented')
     
@@ -661,11 +1434,10 @@ class State:
 
         Also notify the manager.
         """
-        for i in range(len(self.manager.states)):
-            if self.manager.states[i].path == state_object.path:
-                self.manager.states[i] = state_object
-                return 
-        raise RuntimeError('State for {} not found'.format(state_object.path))
+        if state_object.id not in self.manager.states:
+            raise RuntimeError('State for {} not found'.format(
+                state_object.path))
+        self.manager.replace_state(state_object)
     
     def errors(self) -> Errors:
         return self.manager.errors
@@ -686,10 +1458,14 @@ class State:
 
 
 class UnprocessedFile(State):
+    program_text = ''
+    
     def __init__(self, info: StateInfo, program_text: str) -> None:
         super().__init__(info)
         self.program_text = program_text
         trace('waiting {}'.format(info.path))
+        if self.manager.cache:
+            self.manager.cache.record_source(self.id, program_text)
         
         # Add surrounding package(s) as dependencies.
         for p in super_packages(self.id):
@@ -705,14 +1481,8 @@ class UnprocessedFile(State):
 
         # Store the parsed module in the shared module symbol table.
         self.manager.semantic_analyzer.modules[self.id] = tree
-        
-        if '.' in self.id:
-            # Include module in the symbol table of the enclosing package.
-            c = self.id.split('.')
-            p = '.'.join(c[:-1])
-            sem_anal = self.manager.semantic_analyzer
-            sem_anal.modules[p].names[c[-1]] = SymbolTableNode(
-                MODULE_REF, tree, p)
+        # Include module in the symbol table of the enclosing package.
+        self.manager.add_submodule(self.id, tree)
         
         if self.id != 'builtins':
             # The builtins module is imported implicitly in every program (it
@@ -735,14 +1505,32 @@ class UnprocessedFile(State):
         # Do the first pass of semantic analysis: add top-level definitions in
         # the file to the symbol table.
         first = FirstPass(self.semantic_analyzer())
+        started = self.manager.start_pass()
         first.analyze(tree, self.path, self.id)
+        self.manager.end_pass(self.id, 'semanal-1', started)
         # Initialize module symbol table, which was populated by the semantic
         # analyzer.
         tree.names = self.semantic_analyzer().globals
+        if self.manager.lazy_stubs and is_stub(self.path):
+            self.defer_definitions(tree)
 
         # Replace this state object with a parsed state in BuildManager.
         self.switch_state(ParsedFile(self.info(), tree))
     
+    def defer_definitions(self, tree: MypyFile) -> None:
+        """Make the definitions of a stub module analyzed on demand."""
+        manager = self.manager
+        loader = DefinitionLoader(self.id, self.path, self.import_context,
+                                  manager.semantic_analyzer.modules,
+                                  manager.lib_path, self.errors(),
+                                  manager.pyversion,
+                                  manager.type_checker.type_map,
+                                  manager.stats)
+        num_deferred = defer_definitions(tree, loader)
+        if manager.stats:
+            manager.stats.count(self.id, 'deferred definitions',
+                                num_deferred)
+    
     def import_module(self, id: str) -> bool:
         """Schedule a module to be processed.
 
@@ -753,12 +1541,15 @@ class UnprocessedFile(State):
             # Do nothing:f already being compiled.
             return True
         
-        path, text = read_module_source_from_file(id, self.manager.lib_path)
+        path, text = self.manager.read_source(id)
         if text is not None:
+            cache = self.manager.cache
+            if cache and cache.is_fresh(id, path, text):
+                self.manager.load_cached(id, self.errors().import_context())
+                return True
             info = StateInfo(path, id, self.errors().import_context(),
                              self.manager)
-            self.manager.states.append(UnprocessedFile(info, text))
-            self.manager.module_files[id] = path
+            self.manager.add_state(UnprocessedFile(info, text))
             return True
         else:
             return False
@@ -766,13 +1557,44 @@ class UnprocessedFile(State):
     def parse(self, source_text: str, fnam: str) -> MypyFile:
         """Parse the source of a file with the given name.
 
-        Raise CompileError if there is a parse error.
+        Raise CompileError if there is a parse error, unless the build
+        reports all errors (the parser skips invalid statements).
         """
         num_errs = self.errors().num_messages()
-        tree = parse.parse(source_text, fnam, self.errors(),
-                           pyversion=self.manager.pyversion)
+        job = self.manager.parse_jobs.pop(self.id, None)
+        parse_cache = self.manager.parse_cache
+        stats = self.manager.stats
+        tree = None # type: MypyFile
+        if job:
+            tree, errors = pickle.loads(job.get())
+            self.errors().error_info.extend(errors)
+        elif parse_cache:
+            started = self.manager.start_pass()
+            tree = parse_cache.load(source_text)
+            if tree:
+                tree.path = fnam
+                self.manager.end_pass(self.id, 'parse', started)
+                if stats:
+                    stats.count(self.id, 'lines',
+                                len(source_text.splitlines()))
+                    stats.count(self.id, 'cached trees')
+        if not tree:
+            parser = parse.Parser(fnam, self.errors(),
+                                  self.manager.pyversion,
+                                  self.manager.keep_repr)
+            started = self.manager.start_pass()
+            tree = parser.parse(source_text)
+            if parse_cache and not tree.has_parse_errors:
+                parse_cache.store(source_text, tree)
+            tree.path = fnam
+            self.manager.end_pass(self.id, 'parse', started)
+            if stats:
+                stats.count(self.id, 'lines', len(source_text.splitlines()))
+                stats.count(self.id, 'tokens', len(parser.tok))
+                stats.count(self.id, 'nodes', parser.num_nodes)
         tree._fullname = self.id
-        if self.errors().num_messages() != num_errs:
+        if (self.errors().num_messages() != num_errs and
+                not self.manager.all_errors):
             self.errors().raise_error()
         return tree
     
@@ -797,31 +1619,18 @@ class ParsedFile(State):
         if imp != []:
             trace('{} dependencies: {}'.format(info.path, imp))
 
-        # Record the dependencies. Note that the dependencies list also
-        # contains any superpackages and we must preserve them (e.g. os for
-        # os.path).
+        # Record the dependencies. The surrounding packages of the module
+        # are dependencies as well (e.g. os for os.path).
+        self.dependencies.extend(super_packages(self.id))
         self.dependencies.extend(imp)
     
     def process(self) -> None:
         """Semantically analyze file and advance to the next state."""
+        started = self.manager.start_pass()
         self.semantic_analyzer().visit_file(self.tree, self.tree.path)
+        self.manager.end_pass(self.id, 'semanal-2', started)
         self.switch_state(PartiallySemanticallyAnalyzedFile(self.info(),
                                                             self.tree))
-        
-    def num_incomplete_deps(self) -> int:        
-        """Return the number of dependencies that are incomplete.
-
-        Here complete means that their state is *later* than this module.
-        Cyclic dependencies are omitted to break cycles forcibly (and somewhat
-        arbitrarily).
-        """
-        incomplete = 0
-        for module in self.dependencies:
-            state = self.manager.module_state(module)
-            if (not earlier_state(self.state(), state) and
-                    not self.manager.is_dep(module, self.id)):
-                incomplete += 1
-        return incomplete
     
     def state(self) -> int:
         return PARSED_STATE
@@ -830,7 +1639,9 @@ class ParsedFile(State):
 class PartiallySemanticallyAnalyzedFile(ParsedFile):
     def process(self) -> None:
         """Perform final pass of semantic analysis and advance state."""
+        started = self.manager.start_pass()
         self.semantic_analyzer_pass3().visit_file(self.tree, self.tree.path)
+        self.manager.end_pass(self.id, 'semanal-3', started)
         self.switch_state(SemanticallyAnalyzedFile(self.info(), self.tree))
 
     def state(self) -> int:
@@ -841,7 +1652,30 @@ class SemanticallyAnalyzedFile(ParsedFile):
     def process(self) -> None:
         """Type check file and advance to the next state."""
         if self.manager.target >= TYPE_CHECK:
-            self.type_checker().visit_file(self.tree, self.tree.path)
+            checker = self.type_checker()
+            filter = self.manager.function_filter(self.id, self.tree)
+            checker.can_skip_body = filter.is_unchanged if filter else None
+            if self.manager.lean:
+                # Keep the types of each module separately, so that they
+                # can be released with the module.
+                checker.type_map = {}
+                self.manager.type_maps[self.id] = checker.type_map
+            num_subtype_checks = subtypes.num_subtype_checks
+            num_subtype_cache_hits = subtypes.num_subtype_cache_hits
+            started = self.manager.start_pass()
+            checker.visit_file(self.tree, self.tree.path)
+            self.manager.end_pass(self.id, 'typecheck', started)
+            checker.can_skip_body = None
+            stats = self.manager.stats
+            if stats:
+                stats.count(self.id, 'is_subtype calls',
+                            subtypes.num_subtype_checks - num_subtype_checks)
+                stats.count(self.id, 'is_subtype cache hits',
+                            subtypes.num_subtype_cache_hits -
+                            num_subtype_cache_hits)
+                if filter:
+                    stats.count(self.id, 'skipped function bodies',
+                                filter.num_skipped)
         
         # FIX remove from active state list to speed up processing
         
@@ -856,10 +1690,6 @@ class TypeCheckedFile(SemanticallyAnalyzedFile):
         """Finished, so cannot process."""
         raise RuntimeError('Cannot process TypeCheckedFile')
     
-    def is_ready(self) -> bool:
-        """Finished, so cannot ever become ready."""
-        return False
-    
     def state(self) -> int:
         return TYPE_CHECKED_STATE
 
@@ -869,18 +1699,89 @@ def trace(s):
         print(s)
 
 
-def read_module_source_from_file(id: str,
-                                 lib_path: List[str]) -> Tuple[str, str]:
-    """Find and read the source file of a module.
+def type_check_component(task: Tuple[List[str], int]) -> bytes:
+    """Type check the files in a component in a worker process.
 
-    Return a pair (path, file contents). Return (None, None) if the module
-    could not be found or read.
-
-    Arguments:
-      id:       module name, a string of form 'foo' or 'foo.bar'
-      lib_path: library search path
+    The task is the component and the number of earlier waves checked by
+    the workers (see BuildManager.type_check_in_parallel). The process is a
+    fork of the build manager process, which has semantically analyzed the
+    files. Return the pickled error list and a list of (module id, name path,
+    type, is ready) tuples for the variables whose types were inferred (see
+    mypy.cache.named_nodes).
+    """
+    global num_merged_waves
+    component, num_waves = task
+    manager = checking_manager
+    modules = manager.semantic_analyzer.modules
+    for wave in range(num_merged_waves, num_waves):
+        f = open(wave_results_path(wave), 'rb')
+        wave_results = cast(List[bytes], pickle.load(f))
+        f.close()
+        for result in wave_results:
+            manager.merge_inferred_types(cache.loads(result, modules)[1])
+    num_merged_waves = num_waves
+    component_modules = Dict[str, MypyFile]()
+    for id in component:
+        component_modules[id] = modules[id]
+    # Find the variables that get their types during type checking.
+    variables = List[Tuple[str, List[str], Var]]()
+    for mod, path, node in named_nodes(component_modules):
+        if isinstance(node, Decorator):
+            variables.append((mod, path, (cast(Decorator, node)).var))
+        elif isinstance(node, Var) and (cast(Var, node)).type is None:
+            variables.append((mod, path, cast(Var, node)))
+
+    errors = Errors()
+    errors.ignore_prefix = manager.errors.ignore_prefix
+    checker = TypeChecker(errors, modules, manager.pyversion)
+    for state in manager.component_states(component):
+        errors.set_import_context(state.import_context)
+        filter = manager.function_filter(state.id, state.tree)
+        checker.can_skip_body = filter.is_unchanged if filter else None
+        checker.visit_file(state.tree, state.path)
+
+    inferred = List[Tuple[str, List[str], Type, bool]]()
+    for mod, path, var in variables:
+        if var.type is not None:
+            inferred.append((mod, path, var.type, var.is_ready))
+    return cache.dumps((errors.error_info, inferred), manager.checking_index)
+
+
+def wave_results_path(wave: int) -> str:
+    """Return the path of the file that holds the results of a wave checked
+    by the worker processes."""
+    return os.path.join(wave_results_dir, '%d.results' % wave)
+
+
+def parse_file(text: str, path: str, pyversion: int,
+               import_context: List[Tuple[str, int]],
+               ignore_prefix: str, keep_repr: bool,
+               parse_cache: ParseCache) -> bytes:
+    """Parse a source file in a worker process.
+
+    Return a pickled (tree, error list) tuple. The error messages are
+    reported in the given import context, like when the file is parsed by
+    the build manager. The tree is also stored in the parse cache, if
+    given.
+    """
+    errors = Errors()
+    errors.ignore_prefix = ignore_prefix
+    errors.set_import_context(import_context)
+    tree = parse.Parser(path, errors, pyversion, keep_repr).parse(text)
+    if parse_cache and not tree.has_parse_errors:
+        parse_cache.store(text, tree)
+    tree.path = path
+    # Pickling recurses once per nesting level of the tree.
+    return with_recursion_limit(lambda: pickle.dumps((tree, errors.error_info),
+                                                     pickle.HIGHEST_PROTOCOL))
+
+
+def read_source_file(path: str) -> Tuple[str, str]:
+    """Read a module source file (path may be None).
+
+    Return a pair (path, file contents), or (None, None) if the file could
+    not be read.
     """
-    path = find_module(id, lib_path)
     if path is not None:
         text = ''
         try:
@@ -909,6 +1810,70 @@ def find_module(id: str, lib_path: List[str]) -> str:
     return None
 
 
+class ModuleIndex:
+    """Find module source files using directory listings.
+
+    This is equivalent to find_module, but each directory is listed at most
+    once (when it is first needed), and after that looking up a file is a
+    set lookup. A directory is only listed if its parent directory listing
+    contains it, so the directories of packages that are never imported are
+    not touched. Results are also remembered per module id.
+
+    Create a new index for each build, since the contents of the directories
+    may change between builds.
+    """
+
+    def __init__(self, lib_path: List[str]) -> None:
+        self.lib_path = lib_path
+        # Map from directory path to its entries (None if not a directory).
+        self.listings = Dict[str, Set[str]]()
+        # Map from module id to module path (None if not found).
+        self.paths = Dict[str, str]()
+
+    def find_module(self, id: str) -> str:
+        """Return the path of the module source file, or None if not found."""
+        if id in self.paths:
+            return self.paths[id]
+        path = None # type: str
+        comp = id.split('.')
+        for pathitem in self.lib_path:
+            dir = os.path.join(pathitem, os.sep.join(comp[:-1]))
+            if self.has_entry(pathitem, comp[:-1], comp[-1] + '.py'):
+                path = os.path.join(dir, comp[-1] + '.py')
+            elif self.has_entry(pathitem, comp, '__init__.py'):
+                path = os.path.join(pathitem, os.sep.join(comp),
+                                    '__init__.py')
+            else:
+                continue
+            # Check that all packages containing the module have a __init__
+            # file.
+            for i in range(1, len(comp)):
+                if not self.has_entry(pathitem, comp[:i], '__init__.py'):
+                    path = None
+                    break
+            if path:
+                break
+        self.paths[id] = path
+        return path
+
+    def has_entry(self, pathitem: str, dirs: List[str], name: str) -> bool:
+        """Does directory pathitem/dirs[0]/.../dirs[-1] contain name?"""
+        entries = self.listing(pathitem, dirs)
+        return entries is not None and name in entries
+
+    def listing(self, pathitem: str, dirs: List[str]) -> Set[str]:
+        dir = os.path.join(pathitem, os.sep.join(dirs))
+        if dir not in self.listings:
+            entries = None # type: Set[str]
+            if not dirs or self.has_entry(pathitem, dirs[:-1], dirs[-1]):
+                try:
+                    entries = set(os.listdir(dir or os.curdir))
+                except OSError:
+                    pass
+            self.listings[dir] = entries
+        return self.listings[dir]
+
+
 def verify_module(id: str, path: str) -> bool:
     """Check that all packages containing id have a __init__ file."""
     if path.endswith('__init__.py'):
@@ -929,6 +1894,59 @@ def super_packages(id: str) -> List[str]:
     return res
 
 
+def strongly_connected_components(graph: Dict[str, List[str]]
+                                  ) -> List[List[str]]:
+    """Find the strongly connected components of a dependency graph.
+
+    The graph maps each vertex to the vertices it depends on; dependencies
+    that are not vertices of the graph are ignored. Return the components in
+    dependency order (a component comes after all the components it depends
+    on). The order does not depend on the order of the dependency lists.
+    This uses an iterative version of Tarjan's algorithm.
+    """
+    index = Dict[str, int]()
+    lowlink = Dict[str, int]()
+    stack = List[str]()
+    on_stack = Set[str]()
+    result = List[List[str]]()
+    for root in sorted(graph):
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        # Each work item is a vertex and an iterator over its dependencies.
+        work = [(root, iter(sorted(graph[root])))]
+        while work:
+            v, deps = work[-1]
+            for w in deps:
+                if w not in graph:
+                    continue
+                if w not in index:
+                    index[w] = lowlink[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(sorted(graph[w]))))
+                    break
+                elif w in on_stack:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+                if lowlink[v] == index[v]:
+                    component = List[str]()
+                    while True:
+                        w = stack.pop()
+                        on_stack.remove(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    result.append(sorted(component))
+    return result
+
+
 def make_parent_dirs(path: str) -> None:
     parent = os.path.dirname(path)
     try:
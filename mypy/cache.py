@@ -0,0 +1,630 @@
+"""Persistent cache of semantically analyzed and type checked modules.
+
+The cache lets a build skip parsing, semantic analysis and type checking of
+modules that have not changed since an earlier build that used the same
+cache directory.
+
+The cache directory contains two kinds of files for each build
+configuration (Python version and build target):
+
+ * <module id>.meta.json describes a single module: the path and the hash
+   of its source, its direct dependencies and the data file that holds it.
+   It also records the fine-grained dependencies of the functions in the
+   module (see mypy.depends).
+ * <hash>.data holds the pickled trees (including symbol tables and
+   TypeInfos) and error lists of one strongly connected component of the
+   import graph. Modules in an import cycle refer to each other directly, so
+   they are always stored and loaded together.
+
+References from a module to definitions in modules of other components are
+not pickled by value. They are stored by name and resolved against the
+already loaded dependencies when the component is loaded, so that the loaded
+trees share TypeInfos and other definitions with the rest of the build.
+
+A module is fresh if the cache has an entry for it, its source is unchanged
+and all the modules it depends on (directly or indirectly) are fresh. Only
+fresh modules are loaded from the cache; everything else is built normally.
+
+Only symbol tables and trees are cached, not the types of expressions
+(type_map). Thus the cache is only usable with build targets that do not
+need the type map after type checking.
+
+A snapshot packs the cached library modules (builtins, typing and other
+stubs) of a build into a single read-only file in the mypy data directory,
+so that short builds do not need to analyze them again (see Snapshot). A
+snapshot can be used on its own or behind a cache directory.
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import os.path
+import pickle
+import sys
+
+from typing import Undefined, Dict, List, Tuple, Set, Any, Function, cast
+
+from mypy.nodes import (
+    MypyFile, Node, SymbolNode, TypeInfo, LazySymbolTable, MODULE_REF, MDEF
+)
+from mypy.errors import ErrorInfo
+from mypy.lex import Token
+from mypy import noderepr
+
+
+# Increment this when the format of cached data changes (this includes
+# changes to node and type classes).
+CACHE_VERSION = 3
+
+# Pickling and unpickling trees recurses roughly once per nesting level of
+# the tree; use a generous limit.
+RECURSION_LIMIT = 20000
+
+
+class CacheMeta:
+    """Cached information about a single module."""
+
+    def __init__(self, id: str, path: str, hash: str, deps: List[str],
+                 component: List[str], data_file: str,
+                 definitions: Dict[str, Any] = None) -> None:
+        self.id = id
+        self.path = path
+        self.hash = hash
+        self.deps = deps
+        self.component = component
+        self.data_file = data_file
+        # Records of functions (see mypy.depends.function_records)
+        self.definitions = definitions or {}
+
+
+class BuildCache:
+    """Read and write the cache of analyzed modules in a directory.
+
+    Attributes:
+      dir:      Directory that holds the cache files for this configuration
+      read_source:
+                Function for finding and reading the source of a module;
+                takes a module id and returns (path, text), or (None, None)
+                if the module could not be found
+      metas:    Cache metadata that has been read (None if not available)
+      fresh:    Freshness of modules whose freshness has been determined
+      hashes:   Source hashes of modules seen in the current build
+      snapshot: Snapshot used for modules that are not in the cache
+                directory (or None)
+      snapshot_modules:
+                Ids of modules whose metadata was read from the snapshot
+    """
+
+    # Can the build store modules in the cache?
+    writable = True
+
+    def __init__(self, cache_dir: str, pyversion: int, target: int,
+                 read_source: Function[[str], Tuple[str, str]],
+                 snapshot: 'Snapshot' = None) -> None:
+        self.dir = os.path.join(cache_dir, '{}-{}'.format(pyversion, target))
+        self.read_source = read_source
+        self.metas = Dict[str, CacheMeta]()
+        self.fresh = Dict[str, bool]()
+        self.hashes = Dict[str, str]()
+        self.snapshot = snapshot
+        self.snapshot_modules = Set[str]()
+
+    def start_build(self, read_source: Function[[str], Tuple[str, str]]
+                    ) -> None:
+        """Prepare for using the cache in a new build.
+
+        Freshness is determined separately for each build.
+        """
+        self.read_source = read_source
+        self.fresh = Dict[str, bool]()
+        self.hashes = Dict[str, str]()
+
+    def record_source(self, id: str, text: str) -> None:
+        """Record the source of a module that is being built."""
+        self.hashes[id] = source_hash(text)
+
+    def is_fresh(self, id: str, path: str, text: str) -> bool:
+        """Can the module be loaded from the cache?
+
+        The freshness of every module reachable from the module (according
+        to the cached dependencies) is determined at the same time.
+        """
+        if id not in self.fresh:
+            self.compute_freshness(id, path, text)
+        return self.fresh[id]
+
+    def compute_freshness(self, id: str, path: str, text: str) -> None:
+        # Explore the cached import graph reachable from the module and find
+        # the modules that are stale by themselves.
+        graph = Dict[str, List[str]]()
+        stale = Set[str]()
+        todo = [(id, path, text)]
+        while todo:
+            mod, path, text = todo.pop()
+            if mod in graph or mod in self.fresh:
+                continue
+            graph[mod] = []
+            meta = self.read_meta(mod)
+            if (meta is None or meta.path != path or
+                    meta.hash != source_hash(text)):
+                stale.add(mod)
+                continue
+            graph[mod] = meta.deps
+            for dep in meta.deps:
+                if dep not in graph and dep not in self.fresh:
+                    dep_path, dep_text = self.read_source(dep)
+                    if dep_text is None:
+                        stale.add(mod)
+                    else:
+                        todo.append((dep, dep_path, dep_text))
+
+        # A module is also stale if it depends on a stale module, directly or
+        # indirectly.
+        importers = Dict[str, List[str]]()
+        for mod, deps in graph.items():
+            for dep in deps:
+                importers.setdefault(dep, []).append(mod)
+                if not self.fresh.get(dep, True):
+                    stale.add(mod)
+        todo2 = list(stale)
+        while todo2:
+            mod = todo2.pop()
+            for importer in importers.get(mod, []):
+                if importer not in stale:
+                    stale.add(importer)
+                    todo2.append(importer)
+
+        for mod in graph:
+            self.fresh[mod] = mod not in stale
+
+    def component(self, id: str) -> List[str]:
+        """Return the ids of the modules that are stored with a module."""
+        return self.metas[id].component
+
+    def dependencies(self, id: str) -> List[str]:
+        return self.metas[id].deps
+
+    def read_meta(self, id: str) -> CacheMeta:
+        """Read the cached metadata of a module (None if not available)."""
+        if id not in self.metas:
+            self.metas[id] = self.read_meta_file(id)
+            if self.metas[id] is None and self.snapshot:
+                self.metas[id] = self.snapshot.read_meta(id)
+                if self.metas[id] is not None:
+                    self.snapshot_modules.add(id)
+        return self.metas[id]
+
+    def read_meta_file(self, id: str) -> CacheMeta:
+        try:
+            f = open(self.meta_path(id))
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return None
+        if (data.get('version') == CACHE_VERSION and
+                os.path.isfile(os.path.join(self.dir, data['data']))):
+            return CacheMeta(data['id'], data['path'], data['hash'],
+                             data['deps'], data['component'], data['data'],
+                             data.get('definitions'))
+        return None
+
+    def load_component(self, id: str, modules: Dict[str, MypyFile]
+                       ) -> List[Tuple[MypyFile, List[ErrorInfo]]]:
+        """Load the cached modules stored together with a module.
+
+        All the modules that the component depends on must be available in
+        modules. Return (tree, errors) tuples for each loaded module.
+        """
+        if id in self.snapshot_modules:
+            return self.snapshot.load_component(id, modules)
+        meta = self.metas[id]
+        f = open(os.path.join(self.dir, meta.data_file), 'rb')
+        try:
+            unpickler = CacheUnpickler(f, modules)
+            data = with_recursion_limit(unpickler.load)
+        finally:
+            f.close()
+        return [(data['trees'][mod], data['errors'][mod])
+                for mod in meta.component]
+
+    def write_component(self, component: List[str],
+                        modules: Dict[str, MypyFile],
+                        paths: Dict[str, str],
+                        deps: Dict[str, List[str]],
+                        errors: Dict[str, List[ErrorInfo]],
+                        index: Dict[int, Tuple[str, List[str]]],
+                        definitions: Dict[str, Dict[str, Any]] = None
+                        ) -> None:
+        """Store a strongly connected component of modules.
+
+        The index maps ids of definitions that can be referred to by name
+        to (module id, name path) tuples (see symbol_index). Definitions
+        optionally gives the function records of each module.
+        """
+        if not os.path.isdir(self.dir):
+            os.makedirs(self.dir)
+        trees = Dict[str, MypyFile]()
+        for mod in component:
+            trees[mod] = modules[mod]
+        data_file = source_hash('\n'.join(sorted(component))) + '.data'
+
+        # Package symbol tables refer to submodules that depend on the
+        # package. These are added back when the submodules are built or
+        # loaded, so leave them out.
+        removed = List[Tuple[MypyFile, str, Any]]()
+        for mod, tree in trees.items():
+            for name, node in list(tree.names.items()):
+                if (node.kind == MODULE_REF and
+                        isinstance(node.node, MypyFile) and
+                        node.node.fullname() == mod + '.' + name and
+                        node.node.fullname() not in trees):
+                    removed.append((tree, name, node))
+                    del tree.names[name]
+        f = open(os.path.join(self.dir, data_file), 'wb')
+        try:
+            pickler = CachePickler(f, set(component), index)
+            with_recursion_limit(lambda: pickler.dump({'trees': trees,
+                                                       'errors': errors}))
+        finally:
+            f.close()
+            for tree, name, node in removed:
+                tree.names[name] = node
+        for mod in component:
+            meta = {'version': CACHE_VERSION,
+                    'id': mod,
+                    'path': paths[mod],
+                    'hash': self.hashes[mod],
+                    'deps': deps[mod],
+                    'component': component,
+                    'data': data_file,
+                    'definitions': (definitions or {}).get(mod, {})}
+            f = open(self.meta_path(mod), 'w')
+            try:
+                f.write(json.dumps(meta))
+            finally:
+                f.close()
+
+    def meta_path(self, id: str) -> str:
+        return os.path.join(self.dir, id + '.meta.json')
+
+
+class MemoryCache(BuildCache):
+    """Cache of analyzed modules that is kept in memory between builds.
+
+    The trees of the cached modules are shared by all builds that use them
+    instead of being stored in files. A cached tree is only used when all
+    its dependencies are fresh, so a tree never refers to definitions in
+    stale modules that later builds analyze again. The deferred definitions
+    of a tree are loaded when it is cached, since the loader of a lazy
+    symbol table uses the state of the build that created it.
+
+    Attributes:
+      trees:    Cached trees by module id
+      errors:   Errors reported in cached modules by module id
+    """
+
+    def __init__(self) -> None:
+        self.read_source = None
+        self.metas = Dict[str, CacheMeta]()
+        self.fresh = Dict[str, bool]()
+        self.hashes = Dict[str, str]()
+        self.trees = Dict[str, MypyFile]()
+        self.errors = Dict[str, List[ErrorInfo]]()
+
+    def read_meta(self, id: str) -> CacheMeta:
+        return self.metas.get(id)
+
+    def load_component(self, id: str, modules: Dict[str, MypyFile]
+                       ) -> List[Tuple[MypyFile, List[ErrorInfo]]]:
+        return [(self.trees[mod], self.errors[mod])
+                for mod in self.metas[id].component]
+
+    def write_component(self, component: List[str],
+                        modules: Dict[str, MypyFile],
+                        paths: Dict[str, str],
+                        deps: Dict[str, List[str]],
+                        errors: Dict[str, List[ErrorInfo]],
+                        index: Dict[int, Tuple[str, List[str]]],
+                        definitions: Dict[str, Dict[str, Any]] = None
+                        ) -> None:
+        for mod in component:
+            self.metas[mod] = CacheMeta(mod, paths[mod], self.hashes[mod],
+                                        deps[mod], component, None,
+                                        (definitions or {}).get(mod))
+            tree = modules[mod]
+            if isinstance(tree.names, LazySymbolTable):
+                (cast(LazySymbolTable, tree.names)).load_all()
+            self.trees[mod] = tree
+            self.errors[mod] = errors[mod]
+
+
+class Snapshot(BuildCache):
+    """Read-only cache of analyzed modules stored in a single file.
+
+    The file starts with a JSON index on a single line: the metadata of each
+    module (as in the cache directory) and the offset and size of each
+    pickled component in the rest of the file. The file is memory-mapped,
+    and only the components that are loaded are unpickled. Source paths
+    are stored relative to the mypy data directory, so that the snapshot can
+    be used regardless of how the data directory is found.
+
+    Attributes (in addition to those of BuildCache):
+      path:       Path of the snapshot file
+      data_dir:   Mypy data directory
+      index:      Metadata of each module in the snapshot, as stored (None
+                  until the file has been opened)
+      components: Map from the data file name of a component to its
+                  (offset, size) in the file
+      data:       The mapped file
+      start:      Position of the first component in the file
+    """
+
+    writable = False
+
+    def __init__(self, path: str, data_dir: str,
+                 read_source: Function[[str], Tuple[str, str]]) -> None:
+        self.path = path
+        self.data_dir = data_dir
+        self.read_source = read_source
+        self.metas = Dict[str, CacheMeta]()
+        self.fresh = Dict[str, bool]()
+        self.hashes = Dict[str, str]()
+        self.snapshot = None
+        self.snapshot_modules = Set[str]()
+        self.index = None # type: Dict[str, Dict[str, Any]]
+        self.components = Dict[str, List[int]]()
+        self.data = None # type: mmap.mmap
+        self.start = 0
+
+    def read_meta(self, id: str) -> CacheMeta:
+        if self.index is None:
+            self.map_file()
+        if id not in self.metas:
+            self.metas[id] = None
+            data = self.index.get(id)
+            if data is not None:
+                self.metas[id] = CacheMeta(id,
+                                           os.path.join(self.data_dir,
+                                                        data['path']),
+                                           data['hash'], data['deps'],
+                                           data['component'], data['data'],
+                                           data['definitions'])
+        return self.metas[id]
+
+    def map_file(self) -> None:
+        """Map the snapshot file and read its index.
+
+        A missing or incompatible snapshot is treated as empty.
+        """
+        self.index = {}
+        try:
+            f = open(self.path, 'rb')
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return
+        end = data.find(b'\n')
+        try:
+            header = json.loads(data[:end].decode('utf-8'))
+        except ValueError:
+            header = {}
+        if header.get('version') != CACHE_VERSION:
+            data.close()
+            return
+        self.index = header['modules']
+        self.components = header['components']
+        self.data = data
+        self.start = end + 1
+
+    def load_component(self, id: str, modules: Dict[str, MypyFile]
+                       ) -> List[Tuple[MypyFile, List[ErrorInfo]]]:
+        meta = self.metas[id]
+        offset, size = self.components[meta.data_file]
+        start = self.start + offset
+        unpickler = CacheUnpickler(io.BytesIO(self.data[start:start + size]),
+                                   modules)
+        data = with_recursion_limit(unpickler.load)
+        return [(data['trees'][mod], data['errors'][mod])
+                for mod in meta.component]
+
+    def write_component(self, component: List[str],
+                        modules: Dict[str, MypyFile],
+                        paths: Dict[str, str],
+                        deps: Dict[str, List[str]],
+                        errors: Dict[str, List[ErrorInfo]],
+                        index: Dict[int, Tuple[str, List[str]]],
+                        definitions: Dict[str, Dict[str, Any]] = None
+                        ) -> None:
+        raise RuntimeError('Cannot store modules in a snapshot')
+
+
+def write_snapshot(path: str, cache: BuildCache, ids: List[str],
+                   data_dir: str) -> None:
+    """Pack modules stored in a cache directory into a snapshot file.
+
+    The modules that the given modules depend on should be included as
+    well; modules that depend on modules missing from the snapshot are
+    never fresh.
+    """
+    modules = Dict[str, Dict[str, Any]]()
+    components = Dict[str, List[int]]()
+    chunks = List[bytes]()
+    offset = 0
+    for id in sorted(ids):
+        meta = cache.read_meta(id)
+        modules[id] = {'path': os.path.relpath(meta.path,
+                                               data_dir or os.curdir),
+                       'hash': meta.hash,
+                       'deps': meta.deps,
+                       'component': meta.component,
+                       'data': meta.data_file,
+                       'definitions': meta.definitions}
+        if meta.data_file not in components:
+            f = open(os.path.join(cache.dir, meta.data_file), 'rb')
+            try:
+                chunk = f.read()
+            finally:
+                f.close()
+            components[meta.data_file] = [offset, len(chunk)]
+            chunks.append(chunk)
+            offset += len(chunk)
+    header = json.dumps({'version': CACHE_VERSION,
+                         'modules': modules,
+                         'components': components})
+    dir = os.path.dirname(path)
+    if dir and not os.path.isdir(dir):
+        os.makedirs(dir)
+    # Write to a temporary file first so that builds never see a partially
+    # written snapshot.
+    f = open(path + '.tmp', 'wb')
+    try:
+        f.write(header.encode('utf-8') + b'\n')
+        for chunk in chunks:
+            f.write(chunk)
+    finally:
+        f.close()
+    os.rename(path + '.tmp', path)
+
+
+class CachePickler(pickle.Pickler):
+    """Pickler that stores references to other components by name.
+
+    Token and node representation objects are only needed for producing
+    formatted output and are left out.
+    """
+
+    def __init__(self, file: Any, component: Set[str],
+                 index: Dict[int, Tuple[str, List[str]]]) -> None:
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.component = component
+        self.index = index
+
+    def persistent_id(self, obj: Any) -> Any:
+        if isinstance(obj, SymbolNode):
+            if isinstance(obj, MypyFile):
+                if obj.fullname() not in self.component:
+                    return ('module', obj.fullname())
+            else:
+                ref = self.index.get(id(obj))
+                if ref is not None and ref[0] not in self.component:
+                    return ('node', ref[0], ref[1])
+        elif (isinstance(obj, Token) or
+                  type(obj).__module__ == noderepr.__name__):
+            return ('none',)
+        return None
+
+
+class CacheUnpickler(pickle.Unpickler):
+    """Unpickler that resolves references stored by CachePickler."""
+
+    def __init__(self, file: Any, modules: Dict[str, MypyFile]) -> None:
+        super().__init__(file)
+        self.modules = modules
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid[0] == 'module':
+            return self.modules[pid[1]]
+        elif pid[0] == 'node':
+            return lookup_named_node(self.modules, pid[1], pid[2])
+        else:
+            return None
+
+
+def symbol_index(modules: Dict[str, MypyFile]
+                 ) -> Dict[int, Tuple[str, List[str]]]:
+    """Find the definitions in modules that can be referred to by name.
+
+    Return a map from the id of each definition to a (module id, name path)
+    tuple (see named_nodes).
+    """
+    index = Dict[int, Tuple[str, List[str]]]()
+    for mod, path, node in named_nodes(modules):
+        index[id(node)] = (mod, path)
+    return index
+
+
+def named_nodes(modules: Dict[str, MypyFile]
+                ) -> List[Tuple[str, List[str], SymbolNode]]:
+    """Find the definitions in modules that can be referred to by name.
+
+    Return (module id, name path, definition) tuples. The name path is a
+    single name for module-level definitions, and it is prefixed by the
+    names of the enclosing classes for class members. Imported names are
+    not included, and neither are the deferred definitions of lazy symbol
+    tables that have not been loaded (finding them would load them).
+    """
+    result = List[Tuple[str, List[str], SymbolNode]]()
+    seen = Set[int]()
+    for mod, tree in modules.items():
+        pending = Dict[str, Node]()
+        if isinstance(tree.names, LazySymbolTable):
+            pending = (cast(LazySymbolTable, tree.names)).pending
+        for name, node in dict.items(tree.names):
+            if (name not in pending and node.kind != MODULE_REF and
+                    node.node is not None and
+                    node.node.fullname() == mod + '.' + name):
+                add_named_node(result, seen, mod, [name], node.node)
+    return result
+
+
+def add_named_node(result: List[Tuple[str, List[str], SymbolNode]],
+                   seen: Set[int], mod: str, path: List[str],
+                   node: SymbolNode) -> None:
+    if id(node) in seen:
+        return
+    seen.add(id(node))
+    result.append((mod, path, node))
+    if isinstance(node, TypeInfo):
+        for name, member in node.names.items():
+            if member.kind == MDEF and member.node is not None:
+                add_named_node(result, seen, mod, path + [name], member.node)
+
+
+def lookup_named_node(modules: Dict[str, MypyFile], mod: str,
+                      path: List[str]) -> SymbolNode:
+    """Find a definition by module id and name path (see named_nodes)."""
+    names = modules[mod].names
+    node = None # type: SymbolNode
+    for name in path:
+        node = names[name].node
+        if isinstance(node, TypeInfo):
+            names = node.names
+    return node
+
+
+def dumps(obj: Any, index: Dict[int, Tuple[str, List[str]]]) -> bytes:
+    """Pickle an object, storing all modules and named definitions by name.
+
+    This is used for passing analysis results between processes that have
+    the same modules.
+    """
+    f = io.BytesIO()
+    pickler = CachePickler(f, Set[str](), index)
+    with_recursion_limit(lambda: pickler.dump(obj))
+    return f.getvalue()
+
+
+def loads(data: bytes, modules: Dict[str, MypyFile]) -> Any:
+    """Unpickle an object pickled by dumps."""
+    unpickler = CacheUnpickler(io.BytesIO(data), modules)
+    return with_recursion_limit(unpickler.load)
+
+
+def source_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def with_recursion_limit(func: Function[[], Any]) -> Any:
+    """Call a function with an increased recursion limit."""
+    old_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old_limit, RECURSION_LIMIT))
+    try:
+        return func()
+    finally:
+        sys.setrecursionlimit(old_limit)
@@ -1,6 +1,6 @@
 """Mypy type checker."""
 
-from typing import Undefined, Dict, List, cast, overload, Tuple
+from typing import Undefined, Dict, List, cast, overload, Tuple, Function
 
 from mypy.errors import Errors
 from mypy.nodes import (
@@ -13,14 +13,15 @@ from mypy.nodes import (
     BytesExpr, UnicodeExpr, FloatExpr, OpExpr, UnaryExpr, CastExpr, SuperExpr,
     TypeApplication, DictExpr, SliceExpr, FuncExpr, TempNode, SymbolTableNode,
     Context, ListComprehension, ConditionalExpr, GeneratorExpr,
-    Decorator, SetExpr, PassStmt, TypeVarExpr, UndefinedExpr, PrintStmt
+    Decorator, SetExpr, PassStmt, TypeVarExpr, UndefinedExpr, PrintStmt,
+    CHECK_PASS
 )
 from mypy.nodes import function_type, method_type
 from mypy import nodes
 from mypy.types import (
     Type, AnyType, Callable, Void, FunctionLike, Overloaded, TupleType,
     Instance, NoneTyp, UnboundType, ErrorType, TypeTranslator, BasicTypes,
-    strip_type
+    strip_type, interned_instance, interned_none
 )
 from mypy.sametypes import is_same_type
 from mypy.messages import MessageBuilder
@@ -116,6 +117,9 @@ class TypeChecker(NodeVisitor[Type]):
         self.return_types = []
         self.type_context = []
         self.dynamic_funcs = []
+        # If set, the bodies of functions for which this returns True are
+        # not type checked (see mypy.depends)
+        self.can_skip_body = None # type: Function[[FuncDef], bool]
         self.function_stack = []
     
     def visit_file(self, file_node: MypyFile, path: str) -> None:  
@@ -124,8 +128,17 @@ class TypeChecker(NodeVisitor[Type]):
         self.globals = file_node.names
         self.locals = None
         
+        self.globals.start_pass(CHECK_PASS)
         for d in file_node.defs:
-            self.accept(d)
+            if not self.globals.is_deferred(d):
+                self.accept(d)
+
+    def visit_deferred(self, file_node: MypyFile, defn: Node) -> None:
+        """Type check a top-level definition of a module whose analysis was
+        deferred (see mypy.lazy)."""
+        self.globals = file_node.names
+        self.locals = None
+        self.accept(defn)
     
     def accept(self, node: Node, type_context: Type = None) -> Type:
         """Type check a node in the given type context."""
@@ -193,7 +206,8 @@ class TypeChecker(NodeVisitor[Type]):
     
     def visit_func_def(self, defn: FuncDef) -> Type:
         """Type check a function definition."""
-        self.check_func_item(defn)
+        if not self.can_skip_body or not self.can_skip_body(defn):
+            self.check_func_item(defn)
         if defn.info:
             self.check_method_override(defn)
         if defn.original_def:
@@ -559,7 +573,7 @@ class TypeChecker(NodeVisitor[Type]):
 
         Examples include the None type or a type with a None component.
         """
-        if is_same_type(typ, NoneTyp()):
+        if is_same_type(typ, interned_none()):
             return False
         elif isinstance(typ, Instance):
             for arg in typ.args:
@@ -1036,7 +1050,7 @@ class TypeChecker(NodeVisitor[Type]):
         """
         # Assume that the name refers to a type.
         sym = self.lookup_qualified(name)
-        return Instance(cast(TypeInfo, sym.node), [])
+        return interned_instance(cast(TypeInfo, sym.node), [])
     
     def named_type_if_exists(self, name: str) -> Type:
         """Return named instance type, or UnboundType if the type was
@@ -1049,7 +1063,7 @@ class TypeChecker(NodeVisitor[Type]):
         try:
             # Assume that the name refers to a type.
             sym = self.lookup_qualified(name)
-            return Instance(cast(TypeInfo, sym.node), [])
+            return interned_instance(cast(TypeInfo, sym.node), [])
         except KeyError:
             return UnboundType(name)
     
@@ -1059,7 +1073,7 @@ class TypeChecker(NodeVisitor[Type]):
         Assume that the number of arguments is correct.  Assume that
         the name refers to a compatible generic type.
         """
-        return Instance(self.lookup_typeinfo(name), args)
+        return interned_instance(self.lookup_typeinfo(name), args)
 
     def lookup_typeinfo(self, fullname: str) -> TypeInfo:
         # Assume that the name refers to a class.
@@ -0,0 +1,144 @@
+"""Mypy daemon that type checks programs on request.
+
+The daemon keeps the analyzed modules of earlier builds in memory (see
+mypy.cache.MemoryCache). A check only analyzes the modules that have changed
+since they were last checked, and the modules that depend on them; typically
+this excludes builtins, typing and other library stubs.
+
+Clients connect to the Unix domain socket of the daemon and send a single
+request as a JSON object followed by a newline. The daemon responds with a
+JSON object followed by a newline and closes the connection. Requests:
+
+  {"command": "check", "files": [path, ...]}
+      Type check programs. The response has a list of error "messages" and
+      the exit "status" (0 if there were no errors, 1 otherwise). Paths are
+      interpreted relative to the working directory of the daemon.
+  {"command": "stop"}
+      Stop the daemon after responding.
+
+Invalid requests and internal errors get a response with status 2 and the
+error in "messages". After an internal error the daemon discards the
+analyzed modules, since the failed build may have left them inconsistent.
+"""
+
+import json
+import os
+import socket
+
+from typing import Dict, List, Any, Tuple, cast
+
+from mypy import build
+from mypy.cache import MemoryCache
+from mypy.errors import CompileError
+
+
+class Daemon:
+    """Serve check requests using a shared cache of analyzed modules."""
+
+    def __init__(self, socket_path: str, bin_dir: str = None,
+                 pyversion: int = 3, flags: List[str] = None,
+                 alt_lib_path: str = None) -> None:
+        self.socket_path = socket_path
+        self.bin_dir = bin_dir
+        self.alt_lib_path = alt_lib_path
+        self.pyversion = pyversion
+        self.flags = flags or []
+        self.cache = MemoryCache()
+        self.running = False
+
+    def serve(self) -> None:
+        """Accept and handle requests until a stop request is received."""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.socket_path)
+            sock.listen(5)
+            self.running = True
+            while self.running:
+                conn, addr = sock.accept()
+                try:
+                    send(conn, json.dumps(self.respond(receive(conn))))
+                finally:
+                    conn.close()
+        finally:
+            sock.close()
+            os.remove(self.socket_path)
+
+    def respond(self, data: str) -> Dict[str, Any]:
+        """Handle an encoded request and return the response.
+
+        Invalid requests and internal errors are reported in the response
+        (with status 2) instead of stopping the daemon.
+        """
+        try:
+            request = json.loads(data)
+        except ValueError as err:
+            return {'status': 2, 'messages': ['invalid request: ' + str(err)]}
+        if not isinstance(request, dict):
+            return {'status': 2,
+                    'messages': ['invalid request: not a JSON object']}
+        try:
+            return self.handle(cast(Dict[str, Any], request))
+        except Exception as e:
+            # The failed build may have left the cache partly updated.
+            self.cache = MemoryCache()
+            return {'status': 2, 'messages': ['internal error: ' + str(e)]}
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        command = request.get('command')
+        if command == 'check':
+            status, messages = self.check(request.get('files', []))
+            return {'status': status, 'messages': messages}
+        elif command == 'stop':
+            self.running = False
+            return {'status': 0, 'messages': []}
+        else:
+            return {'status': 2,
+                    'messages': ['unknown command: {}'.format(command)]}
+
+    def check(self, files: List[str]) -> Tuple[int, List[str]]:
+        """Type check programs; return the exit status and error messages."""
+        messages = List[str]()
+        for path in files:
+            try:
+                build.build(path,
+                            target=build.TYPE_CHECK,
+                            bin_dir=self.bin_dir,
+                            pyversion=self.pyversion,
+                            flags=self.flags,
+                            alt_lib_path=self.alt_lib_path,
+                            cache=self.cache)
+            except CompileError as e:
+                messages.extend(e.messages)
+        if messages:
+            return 1, messages
+        return 0, messages
+
+
+def request(socket_path: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Send a request to a daemon and return the response."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        send(sock, json.dumps(request))
+        return json.loads(receive(sock))
+    finally:
+        sock.close()
+
+
+def send(sock: socket.socket, data: str) -> None:
+    sock.sendall((data + '\n').encode('utf-8'))
+
+
+def receive(sock: socket.socket) -> str:
+    """Read a newline-terminated message from a socket."""
+    chunks = List[bytes]()
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b'\n'):
+            break
+    return b''.join(chunks).decode('utf-8')
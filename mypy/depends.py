@@ -0,0 +1,455 @@
+"""Fine-grained dependencies of functions for incremental type checking.
+
+When a module is analyzed again (because it or one of its dependencies has
+changed), the body of a function does not need to be type checked again if
+the function itself is unchanged and the interfaces of all the definitions
+it refers to are unchanged. The persistent cache records the following for
+each function defined at module level or directly in a class body:
+
+ * a fingerprint of the function: the string form of its tree without line
+   numbers, so that it is insensitive to edits elsewhere in the file
+ * the interface hashes of the definitions that the function refers to
+   (by full name)
+
+The interface hash of a definition covers its type (for classes, the types
+of all members) and the interfaces of all classes mentioned in these types,
+recursively, so that any change that may affect the type checking of code
+that uses the definition also changes the hash (see InterfaceHasher). The
+builtins module is an implicit dependency of every function (for literals,
+operators etc.).
+
+Functions whose bodies are used for type inference are always checked;
+these include methods that define attributes and decorated functions.
+"""
+
+import hashlib
+import re
+
+from typing import Undefined, Dict, List, Tuple, Set, Any, Function, cast
+
+from mypy.nodes import (
+    Node, MypyFile, SymbolNode, FuncDef, TypeDef, Var, Decorator,
+    OverloadedFuncDef, TypeInfo, NameExpr, MemberExpr, CastExpr, VarDef,
+    TypeApplication, FuncItem, GDEF, MDEF, MODULE_REF
+)
+from mypy.strconv import StrConv
+from mypy.traverser import TraverserVisitor
+from mypy.types import Type, Instance, Callable, Overloaded, TupleType
+from mypy.util import dump_tagged, short_type
+
+
+def function_units(tree: MypyFile) -> List[Tuple[str, FuncDef]]:
+    """Return the functions of a module whose bodies may be skipped.
+
+    Return (name, function) tuples. The name of a method is prefixed with
+    the name of the class.
+    """
+    units = List[Tuple[str, FuncDef]]()
+    for defn in tree.defs:
+        if isinstance(defn, FuncDef):
+            func = cast(FuncDef, defn)
+            units.append((func.name(), func))
+        elif isinstance(defn, TypeDef):
+            typedef = cast(TypeDef, defn)
+            for member in typedef.defs.body:
+                if (isinstance(member, FuncDef) and
+                        not defines_attributes(cast(FuncDef, member))):
+                    func = cast(FuncDef, member)
+                    units.append((typedef.name + '.' + func.name(), func))
+    return units
+
+
+def defines_attributes(func: FuncDef) -> bool:
+    """Does a method define attributes (self.x = ...)?"""
+    finder = AttributeDefinitionFinder()
+    func.body.accept(finder)
+    return finder.found
+
+
+class AttributeDefinitionFinder(TraverserVisitor[None]):
+    found = False
+
+    def visit_member_expr(self, o: MemberExpr) -> None:
+        if o.is_def:
+            self.found = True
+        super().visit_member_expr(o)
+
+
+def fingerprint(func: FuncDef) -> str:
+    """Return a hash of the tree of a function, ignoring line numbers."""
+    return sha1(func.accept(FingerprintStrConv()))
+
+
+class FingerprintStrConv(StrConv):
+    """Convert nodes to strings without line numbers."""
+
+    def dump(self, nodes, obj):
+        return dump_tagged(self.convert(nodes), short_type(obj))
+
+    def convert(self, item: Any) -> Any:
+        # Nested nodes would otherwise be converted using str(), which
+        # includes line numbers.
+        if isinstance(item, Node):
+            return (cast(Node, item)).accept(self)
+        elif isinstance(item, list):
+            return [self.convert(x) for x in item]
+        elif isinstance(item, tuple):
+            return (item[0], self.convert(item[1]))
+        return item
+
+    # These node types are converted without using dump().
+
+    def visit_import(self, o):
+        return strip_line(super().visit_import(o))
+
+    def visit_import_from(self, o):
+        return strip_line(super().visit_import_from(o))
+
+    def visit_import_all(self, o):
+        return strip_line(super().visit_import_all(o))
+
+    def visit_annotation(self, o):
+        return strip_line(super().visit_annotation(o))
+
+    def visit_undefined_expr(self, o):
+        return strip_line(super().visit_undefined_expr(o))
+
+    def visit_type_var_expr(self, o):
+        return strip_line(super().visit_type_var_expr(o))
+
+
+def strip_line(s: str) -> str:
+    """Remove the line number from the tag of a converted node."""
+    return re.sub(r'^(\w+):-?[0-9]+', r'\1', s)
+
+
+def references(func: FuncDef) -> Set[str]:
+    """Return the full names of the definitions a function depends on."""
+    collector = ReferenceCollector()
+    func.accept(collector)
+    refs = collector.refs
+    if func.info:
+        refs.add(func.info.fullname())
+    refs.add('builtins')
+    return refs
+
+
+class ReferenceCollector(TraverserVisitor[None]):
+    """Collect the full names of global definitions referred to by nodes,
+    including classes mentioned in types."""
+
+    refs = Undefined(Set[str])
+
+    def __init__(self) -> None:
+        self.refs = Set[str]()
+
+    def visit_func(self, o: FuncItem) -> None:
+        self.add_type(o.type)
+        super().visit_func(o)
+
+    def visit_name_expr(self, o: NameExpr) -> None:
+        self.add_ref(o.kind, o.fullname)
+
+    def visit_member_expr(self, o: MemberExpr) -> None:
+        self.add_ref(o.kind, o.fullname)
+        super().visit_member_expr(o)
+
+    def visit_cast_expr(self, o: CastExpr) -> None:
+        self.add_type(o.type)
+        super().visit_cast_expr(o)
+
+    def visit_var_def(self, o: VarDef) -> None:
+        for var in o.items:
+            self.add_type(var.type)
+        super().visit_var_def(o)
+
+    def visit_type_application(self, o: TypeApplication) -> None:
+        for t in o.types:
+            self.add_type(t)
+        super().visit_type_application(o)
+
+    def add_ref(self, kind: int, fullname: str) -> None:
+        # References to modules are too coarse; references to their members
+        # are recorded instead.
+        if kind == GDEF and fullname:
+            self.refs.add(fullname)
+
+    def add_type(self, t: Type) -> None:
+        if t:
+            for info in mentioned_classes(t):
+                self.refs.add(info.fullname())
+
+
+def mentioned_classes(t: Type) -> List[TypeInfo]:
+    """Return the classes mentioned in a type."""
+    result = List[TypeInfo]()
+    todo = [t]
+    while todo:
+        t = todo.pop()
+        if isinstance(t, Instance):
+            inst = cast(Instance, t)
+            result.append(inst.type)
+            todo.extend(inst.args)
+        elif isinstance(t, Callable):
+            callable = cast(Callable, t)
+            todo.extend(callable.arg_types)
+            todo.append(callable.ret_type)
+        elif isinstance(t, Overloaded):
+            for item in (cast(Overloaded, t)).items():
+                todo.append(item)
+        elif isinstance(t, TupleType):
+            todo.extend((cast(TupleType, t)).items)
+    return result
+
+
+class InterfaceHasher:
+    """Compute interface hashes of definitions.
+
+    The interface hash of a definition combines the description of the
+    definition with the interface hashes of the classes that it mentions.
+    The interface hash of a class covers the descriptions of the class and
+    of all the classes that it mentions (in base classes and member types),
+    transitively.
+
+    Hashes that only depend on modules that have been type checked are
+    remembered, since they do not change anymore during a build. Other
+    modules may still get inferred types; their hashes are remembered until
+    clear_provisional is called. This is safe, since a hash computed before
+    all types are inferred never matches a hash recorded after a build.
+    """
+
+    def __init__(self, modules: Dict[str, MypyFile],
+                 is_final: Function[[str], bool]) -> None:
+        self.modules = modules
+        self.is_final = is_final
+        self.hashes = Dict[str, str]()
+        self.provisional = Dict[str, str]()
+        # Description hashes and mentioned classes of classes
+        self.classes = Dict[str, Tuple[str, List[str]]]()
+        self.provisional_classes = Dict[str, Tuple[str, List[str]]]()
+
+    def clear_provisional(self) -> None:
+        self.provisional = {}
+        self.provisional_classes = {}
+
+    def interface_hash(self, fullname: str) -> str:
+        """Return the interface hash of a definition."""
+        if fullname in self.hashes:
+            return self.hashes[fullname]
+        if fullname in self.provisional:
+            return self.provisional[fullname]
+        module, node = self.lookup(fullname)
+        final = not module or self.is_final(module)
+        if isinstance(node, TypeInfo):
+            items = [self.class_hash(fullname)[0]]
+            mentioned = [fullname]
+        elif isinstance(node, MypyFile):
+            # A module as a whole (used for the builtins module).
+            items = [describe(defn)
+                     for defn in module_definitions(cast(MypyFile, node))]
+            mentioned = [defn.fullname()
+                         for defn in module_definitions(cast(MypyFile, node))
+                         if isinstance(defn, TypeInfo)]
+        else:
+            items = [describe(node)]
+            mentioned = mentions(node)
+        classes = self.transitive_classes(mentioned)
+        for name in sorted(classes):
+            items.append(self.class_hash(name)[0])
+            final = final and self.is_final(classes[name])
+        result = sha1('\n'.join(items))
+        if final:
+            self.hashes[fullname] = result
+        else:
+            self.provisional[fullname] = result
+        return result
+
+    def transitive_classes(self, names: List[str]) -> Dict[str, str]:
+        """Return the classes mentioned by the given classes, transitively.
+
+        Return a map from the full name of a class to its module id.
+        """
+        result = Dict[str, str]()
+        todo = List[str]()
+        for name in names:
+            if name not in result:
+                result[name] = None
+                todo.append(name)
+        while todo:
+            name = todo.pop()
+            result[name] = self.lookup(name)[0]
+            for mentioned in self.class_hash(name)[1]:
+                if mentioned not in result:
+                    result[mentioned] = None
+                    todo.append(mentioned)
+        return result
+
+    def class_hash(self, fullname: str) -> Tuple[str, List[str]]:
+        """Return the hash of the description of a class and the full names
+        of the classes that it mentions."""
+        if fullname in self.classes:
+            return self.classes[fullname]
+        if fullname in self.provisional_classes:
+            return self.provisional_classes[fullname]
+        module, node = self.lookup(fullname)
+        result = sha1('{} {}'.format(fullname, describe(node))), mentions(node)
+        if module and self.is_final(module):
+            self.classes[fullname] = result
+        else:
+            self.provisional_classes[fullname] = result
+        return result
+
+    def lookup(self, fullname: str) -> Tuple[str, SymbolNode]:
+        """Find a definition by full name.
+
+        Return (module id, definition). The definition is None if it could
+        not be found, and the module id is also None if the module could not
+        be found.
+        """
+        if fullname in self.modules:
+            return fullname, self.modules[fullname]
+        parts = fullname.split('.')
+        for i in range(len(parts) - 1, 0, -1):
+            module = '.'.join(parts[:i])
+            if module in self.modules:
+                names = self.modules[module].names
+                node = None # type: SymbolNode
+                for name in parts[i:]:
+                    if names is None or name not in names:
+                        return module, None
+                    node = names[name].node
+                    names = None
+                    if isinstance(node, TypeInfo):
+                        names = (cast(TypeInfo, node)).names
+                return module, node
+        return None, None
+
+
+def module_definitions(tree: MypyFile) -> List[SymbolNode]:
+    """Return the definitions in a module (but not imported names)."""
+    result = List[SymbolNode]()
+    for name in sorted(tree.names):
+        symbol = tree.names[name]
+        if (symbol.kind != MODULE_REF and symbol.node is not None and
+                symbol.node.fullname() == tree.fullname() + '.' + name):
+            result.append(symbol.node)
+    return result
+
+
+def mentions(node: SymbolNode) -> List[str]:
+    """Return the full names of the classes that the interface of a
+    definition refers to."""
+    result = List[str]()
+    if isinstance(node, TypeInfo):
+        info = cast(TypeInfo, node)
+        for base in info.mro[1:]:
+            result.append(base.fullname())
+        for member in info.names.values():
+            if member.kind == MDEF:
+                for t in node_types(member.node):
+                    result.extend(c.fullname() for c in mentioned_classes(t))
+    else:
+        for t in node_types(node):
+            result.extend(c.fullname() for c in mentioned_classes(t))
+    return result
+
+
+def describe(node: SymbolNode) -> str:
+    """Describe the interface of a definition (but not of the classes
+    that it mentions)."""
+    if node is None:
+        return 'missing'
+    elif isinstance(node, MypyFile):
+        return 'module'
+    elif isinstance(node, TypeInfo):
+        info = cast(TypeInfo, node)
+        items = ['class', ','.join(str(base) for base in info.bases)]
+        if info.is_abstract:
+            items.append('abstract')
+        for name in sorted(info.names):
+            member = info.names[name]
+            if member.kind == MDEF:
+                items.append('{}: {}'.format(name, describe(member.node)))
+        return ' '.join(items)
+    elif isinstance(node, Var):
+        var = cast(Var, node)
+        flags = [var.is_staticmethod, var.is_property,
+                 var.is_initialized_in_class]
+        return 'var {} {}'.format(var.type or '?', flags)
+    elif isinstance(node, Decorator):
+        return 'decorated {}'.format(describe((cast(Decorator, node)).var))
+    elif isinstance(node, FuncDef):
+        func = cast(FuncDef, node)
+        flags = [func.is_static, func.is_abstract, func.is_property]
+        if func.type:
+            return 'def {} {}'.format(func.type, flags)
+        return 'def untyped {} {} {}'.format(
+            [arg.name() for arg in func.args], func.arg_kinds, flags)
+    elif isinstance(node, OverloadedFuncDef):
+        return 'overload {}'.format(
+            [describe(item)
+             for item in (cast(OverloadedFuncDef, node)).items])
+    else:
+        return short_type(node)
+
+
+def node_types(node: SymbolNode) -> List[Type]:
+    """Return the types that describe the interface of a definition."""
+    if isinstance(node, Var):
+        return [(cast(Var, node)).type]
+    elif isinstance(node, Decorator):
+        return [(cast(Decorator, node)).var.type]
+    elif isinstance(node, FuncDef):
+        return [(cast(FuncDef, node)).type]
+    elif isinstance(node, OverloadedFuncDef):
+        return [item.func.type
+                for item in (cast(OverloadedFuncDef, node)).items]
+    else:
+        return []
+
+
+class FunctionFilter:
+    """Decide which function bodies in a module need not be checked again,
+    based on the records of the previous build of the module."""
+
+    def __init__(self, tree: MypyFile, records: Dict[str, Any],
+                 hasher: InterfaceHasher) -> None:
+        self.records = records
+        self.hasher = hasher
+        self.names = Dict[int, str]()
+        hasher.clear_provisional()
+        for name, func in function_units(tree):
+            self.names[id(func)] = name
+        self.num_skipped = 0
+
+    def is_unchanged(self, func: FuncDef) -> bool:
+        name = self.names.get(id(func))
+        if name is None:
+            return False
+        record = self.records.get(name)
+        if not record or record['hash'] != fingerprint(func):
+            return False
+        for ref, hash in record['deps'].items():
+            if self.hasher.interface_hash(ref) != hash:
+                return False
+        self.num_skipped += 1
+        return True
+
+
+def function_records(tree: MypyFile,
+                     hasher: InterfaceHasher) -> Dict[str, Any]:
+    """Return the records of the functions in a type checked module.
+
+    The result is stored in the cache and used by FunctionFilter.
+    """
+    records = Dict[str, Any]()
+    for name, func in function_units(tree):
+        deps = Dict[str, str]()
+        for ref in references(func):
+            deps[ref] = hasher.interface_hash(ref)
+        records[name] = {'hash': fingerprint(func), 'deps': deps}
+    return records
+
+
+def sha1(s: str) -> str:
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
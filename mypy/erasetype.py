@@ -3,7 +3,7 @@ import typing
 from mypy.types import (
     Type, TypeVisitor, UnboundType, ErrorType, AnyType, Void, NoneTyp,
     Instance, TypeVar, Callable, TupleType, Overloaded, ErasedType,
-    TypeTranslator, BasicTypes, TypeList
+    TypeTranslator, BasicTypes, TypeList, interned_instance, interned_any
 )
 
 
@@ -50,11 +50,10 @@ class EraseTypeVisitor(TypeVisitor[Type]):
         raise RuntimeError()
     
     def visit_instance(self, t: Instance) -> Type:
-        return Instance(t.type, [AnyType()] * len(t.args), t.line,
-                        t.repr)
+        return interned_instance(t.type, [interned_any()] * len(t.args))
     
     def visit_type_var(self, t: TypeVar) -> Type:
-        return AnyType()
+        return interned_any()
     
     def visit_callable(self, t: Callable) -> Type:
         # We must preserve the type object flag for overload resolution to
@@ -101,5 +100,8 @@ def erase_typevars(t: Type) -> Type:
 class TypeVarEraser(TypeTranslator):
     """Implementation of type erasure"""
     
+    def visit_instance(self, t: Instance) -> Type:
+        return interned_instance(t.type, self.translate_types(t.args))
+    
     def visit_type_var(self, t: TypeVar) -> Type:
-        return AnyType()
+        return interned_any()
@@ -138,13 +138,17 @@ class Errors:
         """
         raise CompileError(self.messages())
     
-    def messages(self) -> List[str]:
+    def messages(self, error_info: List[ErrorInfo] = None) -> List[str]:
         """Return a string list that represents the error messages.
 
-        Use a form suitable for displaying to the user.
+        Use a form suitable for displaying to the user. If error_info is
+        given, only include these errors (a subset of the generated errors,
+        in the same order).
         """
+        if error_info is None:
+            error_info = self.error_info
         a = [] # type: List[str]
-        errors = self.render_messages(self.sort_messages(self.error_info))
+        errors = self.render_messages(self.sort_messages(error_info))
         errors = self.remove_duplicates(errors)
         for file, line, message in errors:
             s = ''
@@ -2,7 +2,8 @@ from typing import Dict, Tuple, List, cast, Undefined
 
 from mypy.types import (
     Type, Instance, Callable, TypeVisitor, UnboundType, ErrorType, AnyType,
-    Void, NoneTyp, TypeVar, Overloaded, TupleType, ErasedType, TypeList
+    Void, NoneTyp, TypeVar, Overloaded, TupleType, ErasedType, TypeList,
+    intern_type, interned_instance, interned_callable
 )
 
 
@@ -64,26 +65,26 @@ class ExpandTypeVisitor(TypeVisitor[Type]):
     
     def visit_instance(self, t: Instance) -> Type:
         args = self.expand_types(t.args)
-        return Instance(t.type, args, t.line, t.repr)
+        return interned_instance(t.type, args)
     
     def visit_type_var(self, t: TypeVar) -> Type:
         repl = self.variables.get(t.id, t)
         if isinstance(repl, Instance):
             inst = cast(Instance, repl)
             # Return copy of instance with type erasure flag on.
-            return Instance(inst.type, inst.args, inst.line, inst.repr, True)
+            return interned_instance(inst.type, inst.args, True)
         else:
             return repl
     
     def visit_callable(self, t: Callable) -> Type:
-        return Callable(self.expand_types(t.arg_types),
-                        t.arg_kinds,
-                        t.arg_names,
-                        t.ret_type.accept(self),
-                        t.is_type_obj(),
-                        t.name,
-                        t.variables,
-                        self.expand_bound_vars(t.bound_vars), t.line, t.repr)
+        return interned_callable(self.expand_types(t.arg_types),
+                                 t.arg_kinds,
+                                 t.arg_names,
+                                 t.ret_type.accept(self),
+                                 t.is_type_obj(),
+                                 t.name,
+                                 t.variables,
+                                 self.expand_bound_vars(t.bound_vars))
     
     def visit_overloaded(self, t: Overloaded) -> Type:
         items = [] # type: List[Callable]
@@ -92,7 +93,7 @@ class ExpandTypeVisitor(TypeVisitor[Type]):
         return Overloaded(items)
     
     def visit_tuple_type(self, t: TupleType) -> Type:
-        return TupleType(self.expand_types(t.items), t.line, t.repr)
+        return intern_type(TupleType(self.expand_types(t.items)))
     
     def expand_types(self, types: List[Type]) -> List[Type]:
         a = [] # type: List[Type]
@@ -111,14 +112,14 @@ class ExpandTypeVisitor(TypeVisitor[Type]):
 def update_callable_implicit_bounds(
         t: Callable, arg_types: List[Tuple[int, Type]]) -> Callable:
     # FIX what if there are existing bounds?
-    return Callable(t.arg_types,
-                    t.arg_kinds,
-                    t.arg_names,
-                    t.ret_type,
-                    t.is_type_obj(),
-                    t.name,
-                    t.variables,
-                    arg_types, t.line, t.repr)
+    return interned_callable(t.arg_types,
+                             t.arg_kinds,
+                             t.arg_names,
+                             t.ret_type,
+                             t.is_type_obj(),
+                             t.name,
+                             t.variables,
+                             arg_types)
 
 
 def expand_caller_var_args(arg_types: List[Type],
@@ -1,14 +1,23 @@
 """Calculation of the least upper bound types (joins)."""
 
-from typing import cast, List
+from typing import cast, List, Set, Any
 
 from mypy.types import (
     Type, AnyType, NoneTyp, Void, TypeVisitor, Instance, UnboundType,
-    ErrorType, TypeVar, Callable, TupleType, ErasedType, BasicTypes, TypeList
+    ErrorType, TypeVar, Callable, TupleType, ErasedType, BasicTypes, TypeList,
+    intern_type, is_interned, new_type_cache
 )
 from mypy.subtypes import is_subtype, is_equivalent, map_instance_to_supertype
 
 
+# Maximum number of entries in join_cache (the cache is emptied when it gets
+# full)
+JOIN_CACHE_SIZE = 20000
+
+# Results of join_types, keyed by interned types (see basic_types_key)
+join_cache = new_type_cache()
+
+
 def join_types(s: Type, t: Type, basic: BasicTypes) -> Type:
     """Return the least upper bound of s and t.
 
@@ -26,8 +35,49 @@ def join_types(s: Type, t: Type, basic: BasicTypes) -> Type:
     if isinstance(s, ErasedType):
         return t
 
-    # Use a visitor to handle non-trivial cases.
-    return t.accept(TypeJoinVisitor(s, basic))
+    key = basic_types_key(s, t, basic)
+    if key is None:
+        # Use a visitor to handle non-trivial cases.
+        return t.accept(TypeJoinVisitor(s, basic))
+    result = cast(Type, join_cache.get(key))
+    if result is None:
+        result = key[1].accept(TypeJoinVisitor(key[0], basic))
+        if len(join_cache) >= JOIN_CACHE_SIZE:
+            join_cache.clear()
+        join_cache[key] = result
+    return result
+
+
+def join_type_list(types: List[Type], basic: BasicTypes) -> Type:
+    """Return the join of a non-empty list of types.
+
+    Structurally equal types are only joined once.
+    """
+    joined = None # type: Type
+    seen = Set[Type]()
+    for t in types:
+        t = intern_type(t)
+        if t not in seen:
+            seen.add(t)
+            if joined is None:
+                joined = t
+            else:
+                joined = join_types(joined, t, basic)
+    return joined
+
+
+def basic_types_key(s: Type, t: Type, basic: BasicTypes) -> Any:
+    """Return the key of the result of a join or meet of s and t.
+
+    The result depends on the basic types object and type. Return None if
+    some of the types cannot be interned; the result is not cached then.
+    """
+    key = (intern_type(s), intern_type(t), intern_type(basic.object),
+           intern_type(basic.type_type))
+    for item in key:
+        if not is_interned(item):
+            return None
+    return key
 
 
 class TypeJoinVisitor(TypeVisitor[Type]):
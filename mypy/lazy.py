@@ -0,0 +1,142 @@
+"""On-demand analysis of the definitions of library stub modules.
+
+Programs usually use only a small part of the definitions in the stubs
+that they import (directly or indirectly). After the first pass of
+semantic analysis has registered the top-level names of a stub module,
+the remaining passes (second and third pass of semantic analysis and type
+checking) can skip the definitions until a name defined by them is looked
+up in the symbol table of the module (see LazySymbolTable in mypy.nodes).
+"""
+
+from typing import List, Dict, Tuple, cast
+
+from mypy.nodes import (
+    MypyFile, Node, FuncDef, OverloadedFuncDef, Decorator, TypeDef, VarDef,
+    AssignmentStmt, NameExpr, LazySymbolTable, THIRD_PASS, CHECK_PASS
+)
+from mypy.semanal import SemanticAnalyzer, ThirdPass
+from mypy.checker import TypeChecker
+from mypy.errors import Errors
+from mypy.stats import BuildStats
+from mypy.types import Type
+
+
+def defer_definitions(tree: MypyFile, loader: 'DefinitionLoader') -> int:
+    """Make the top-level definitions of a module analyzed on demand.
+
+    Replace the symbol table of a module that has been through the first
+    pass of semantic analysis with a lazy one. Only definitions that
+    define names unambiguously are deferred. Return the number of deferred
+    definitions.
+    """
+    names = LazySymbolTable(tree.names, loader.load)
+    defined = List[Tuple[Node, List[str]]]()
+    claims = Dict[str, int]()
+    for defn in tree.defs:
+        defn_names = defined_names(defn)
+        for name in defn_names:
+            claims[name] = claims.get(name, 0) + 1
+        if defn_names:
+            defined.append((defn, defn_names))
+    count = 0
+    for defn, defn_names in defined:
+        for name in defn_names:
+            if (claims[name] > 1 or name not in names or
+                    names[name].node is not defined_node(defn, name)):
+                break
+        else:
+            names.defer(defn, defn_names)
+            count += 1
+    tree.names = names
+    loader.tree = tree
+    return count
+
+
+def defined_names(defn: Node) -> List[str]:
+    """Return the names defined by a top-level definition that can be
+    deferred, or an empty list if it cannot be deferred."""
+    if isinstance(defn, FuncDef):
+        return [(cast(FuncDef, defn)).name()]
+    elif isinstance(defn, OverloadedFuncDef):
+        return [(cast(OverloadedFuncDef, defn)).name()]
+    elif isinstance(defn, Decorator):
+        return [(cast(Decorator, defn)).var.name()]
+    elif isinstance(defn, TypeDef):
+        return [(cast(TypeDef, defn)).name]
+    elif isinstance(defn, VarDef):
+        return [v.name() for v in (cast(VarDef, defn)).items]
+    elif isinstance(defn, AssignmentStmt):
+        s = cast(AssignmentStmt, defn)
+        if len(s.lvalues) == 1 and isinstance(s.lvalues[0], NameExpr):
+            return [(cast(NameExpr, s.lvalues[0])).name]
+    return []
+
+
+def defined_node(defn: Node, name: str) -> Node:
+    """Return the symbol table node that a definition defines for a name."""
+    if isinstance(defn, TypeDef):
+        return (cast(TypeDef, defn)).info
+    elif isinstance(defn, Decorator):
+        return (cast(Decorator, defn)).var
+    elif isinstance(defn, VarDef):
+        for v in (cast(VarDef, defn)).items:
+            if v.name() == name:
+                return v
+        return None
+    elif isinstance(defn, AssignmentStmt):
+        return (cast(NameExpr, (cast(AssignmentStmt, defn)).lvalues[0])).node
+    else:
+        return defn
+
+
+class DefinitionLoader:
+    """Analyze the deferred definitions of a module when they are used.
+
+    The passes are performed using separate analyzer and checker objects,
+    since a definition is usually loaded while the shared ones are in the
+    middle of analyzing another module. Errors are reported in the module
+    of the definition.
+    """
+
+    tree = None # type: MypyFile
+
+    def __init__(self, id: str, path: str,
+                 import_context: List[Tuple[str, int]],
+                 modules: Dict[str, MypyFile], lib_path: List[str],
+                 errors: Errors, pyversion: int,
+                 type_map: Dict[Node, Type],
+                 stats: BuildStats = None) -> None:
+        self.id = id
+        self.path = path
+        self.import_context = import_context
+        self.modules = modules
+        self.lib_path = lib_path
+        self.errors = errors
+        self.pyversion = pyversion
+        self.type_map = type_map
+        self.stats = stats
+
+    def load(self, defn: Node, stage: int) -> None:
+        """Perform the passes up to the given one for a definition."""
+        if self.stats:
+            self.stats.count(self.id, 'loaded definitions')
+        errors = self.errors
+        saved = (errors.file, errors.import_ctx, errors.type_name,
+                 errors.function_or_member)
+        errors.set_file(self.path)
+        errors.set_import_context(self.import_context)
+        errors.type_name = [None]
+        errors.function_or_member = [None]
+        try:
+            analyzer = SemanticAnalyzer(self.lib_path, errors)
+            analyzer.modules = self.modules
+            analyzer.visit_deferred(self.tree, defn)
+            if stage >= THIRD_PASS:
+                ThirdPass(errors).visit_deferred(self.tree, defn)
+            if stage >= CHECK_PASS:
+                checker = TypeChecker(errors, self.modules, self.pyversion)
+                checker.type_map = self.type_map
+                checker.visit_deferred(self.tree, defn)
+        finally:
+            (errors.file, errors.import_ctx, errors.type_name,
+             errors.function_or_member) = saved
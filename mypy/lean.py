@@ -0,0 +1,99 @@
+"""Release the parts of analyzed trees that are only needed for checking.
+
+After a module and all the modules that depend on it have been type
+checked, only the symbol tables of the module are needed anymore (for
+looking up definitions and for the cache). Function bodies, top-level
+statements and the token and node representation objects (noderepr and
+typerepr records with their whitespace and comments) are only needed for
+checking the module itself and for producing formatted output, and can be
+released to reduce the memory used by large builds (see the MEMORY_LEAN
+build flag).
+"""
+
+from typing import List, cast
+
+from mypy.nodes import (
+    MypyFile, FuncDef, Decorator, TypeDef, VarDef, OverloadedFuncDef, Block,
+    Node, LazySymbolTable
+)
+from mypy.traverser import TraverserVisitor
+from mypy.types import Type, Instance, Callable, Overloaded, TupleType
+
+
+def release_tree(tree: MypyFile) -> None:
+    """Drop everything but the definitions from an analyzed module.
+
+    Functions and classes remain reachable through the symbol tables and
+    keep their types, but function bodies become empty and the class
+    bodies and module-level statements are removed.
+    """
+    tree.accept(TreeReleaser())
+
+
+class TreeReleaser(TraverserVisitor[None]):
+    """Release the bodies and representations of the definitions in a tree.
+
+    Definitions are found anywhere outside function bodies, including
+    conditional definitions (for example, within if statements).
+    """
+
+    def visit_mypy_file(self, o: MypyFile) -> None:
+        for d in o.defs:
+            # Definitions that have not been analyzed yet (see mypy.lazy)
+            # still need their bodies.
+            if not (isinstance(o.names, LazySymbolTable) and
+                    d in (cast(LazySymbolTable, o.names)).deferred):
+                d.accept(self)
+        o.defs = List[Node]()
+
+    def visit_func_def(self, o: FuncDef) -> None:
+        o.body = Block([])
+        o.repr = None
+        for arg in o.args:
+            arg.repr = None
+        release_type(o.type)
+
+    def visit_overloaded_func_def(self, o: OverloadedFuncDef) -> None:
+        super().visit_overloaded_func_def(o)
+        o.repr = None
+        release_type(o.type)
+
+    def visit_decorator(self, o: Decorator) -> None:
+        o.func.accept(self)
+        o.decorators = List[Node]()
+        o.repr = None
+        o.var.repr = None
+        release_type(o.var.type)
+
+    def visit_type_def(self, o: TypeDef) -> None:
+        super().visit_type_def(o)
+        o.defs = Block([])
+        o.repr = None
+
+    def visit_var_def(self, o: VarDef) -> None:
+        for var in o.items:
+            var.repr = None
+            release_type(var.type)
+
+
+def release_type(t: Type) -> None:
+    """Drop the representations of a type and its component types."""
+    todo = [t]
+    while todo:
+        t = todo.pop()
+        if t is None:
+            continue
+        t.repr = None
+        if isinstance(t, Instance):
+            todo.extend((cast(Instance, t)).args)
+        elif isinstance(t, Callable):
+            callable = cast(Callable, t)
+            todo.extend(callable.arg_types)
+            todo.append(callable.ret_type)
+            for var in callable.variables:
+                var.repr = None
+        elif isinstance(t, Overloaded):
+            for item in (cast(Overloaded, t)).items():
+                todo.append(item)
+        elif isinstance(t, TupleType):
+            todo.extend((cast(TupleType, t)).items)
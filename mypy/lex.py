@@ -7,9 +7,13 @@ This module can be run as a script (lex.py FILE).
 """
 
 import re
+from array import array
 
 from mypy.util import short_type
-from typing import List, Undefined, Function, Dict, Any, Match, Pattern
+from typing import (
+    List, Undefined, Function, Dict, Any, Match, Pattern, Iterator, Iterable,
+    Sized
+)
 
 
 class Token:
@@ -148,16 +152,235 @@ STR_CONTEXT = 1
 COMMENT_CONTEXT = 2
 
 
-def lex(string: str, first_line: int = 1) -> List[Token]:
-    """Analyze string and return an array of token objects.
+# Token kinds (stored in TokenBuffer; indexes of token_classes)
+BREAK = 0
+INDENT = 1
+DEDENT = 2
+EOF = 3
+KEYWORD = 4
+NAME = 5
+INT_LIT = 6
+STR_LIT = 7
+BYTES_LIT = 8
+UNICODE_LIT = 9
+FLOAT_LIT = 10
+PUNCT = 11
+COLON = 12
+OP = 13
+BOM = 14
+LEX_ERROR = 15
+
+token_classes = [Break, Indent, Dedent, Eof, Keyword, Name, IntLit, StrLit,
+                 BytesLit, UnicodeLit, FloatLit, Punct, Colon, Op, Bom,
+                 LexError] # type: List[Any]
+
+# Map from token class to token kind
+token_kinds = Dict[type, int]()
+for kind, cls in enumerate(token_classes):
+    token_kinds[cls] = kind
+
+
+# Number of tokens lexed at a time by incremental lexing
+LEX_CHUNK_SIZE = 256
+
+# Number of token objects before the last requested token that are kept by
+# incremental lexing (the parser looks back at most one token)
+LOOKBEHIND = 4
+
+
+class TokenBuffer(Sized, Iterable[Token]):
+    """Compact sequence of tokens of a source string.
+
+    Instead of token objects, store the kind, the offsets of the start and
+    the end of the token string and the line number of each token in
+    parallel arrays. The whitespace and comments before a token are the
+    source text between the end of the previous token and the start of the
+    token.
+
+    Token objects are created when the sequence is indexed (and they are
+    reused if the same token is indexed again). Tokens whose string is not
+    the source text at their location, such as lexer errors, are stored as
+    objects.
+
+    If the buffer has a lexer, tokens are lexed in chunks when they are
+    first indexed, and the buffer only refers to the token objects near the
+    last indexed token (see lex_incrementally).
+    """
+
+    source = ''
+    kinds = Undefined(array)   # Token kinds (BREAK, NAME, ...)
+    starts = Undefined(array)  # Offsets of the token strings
+    ends = Undefined(array)    # Offsets after the token strings
+    lines = Undefined(array)   # Line numbers
+
+    # Token objects that have been created (None if not created yet)
+    tokens = Undefined(List[Token])
+
+    lexer = None # type: Lexer
+    released = 0  # Token objects before this index have been released
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.kinds = array('b')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.lines = array('i')
+        self.tokens = []
+
+    def add(self, kind: int, start: int, end: int, line: int) -> None:
+        """Store a token given as a source location.
+
+        The preceding whitespace and comments are the source text after the
+        previous token.
+        """
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.tokens.append(None)
+
+    def add_token(self, tok: Token, end: int) -> None:
+        """Store a token object that ends at the given source offset.
+
+        If the token cannot be represented by its location, store the
+        object.
+        """
+        prev_end = 0
+        if self.ends:
+            prev_end = self.ends[-1]
+        if tok.string == '':
+            # Empty tokens (such as Dedent) follow their pre text.
+            end = prev_end + len(tok.pre)
+        start = end - len(tok.string)
+        self.add(token_kinds[type(tok)], start, end, tok.line)
+        if (isinstance(tok, LexError) or start - len(tok.pre) != prev_end or
+                not self.source.startswith(tok.pre, prev_end) or
+                not self.source.startswith(tok.string, start)):
+            self.tokens[-1] = tok
+
+    def extend_last(self, end: int) -> None:
+        """Extend the string of the last token to a source offset."""
+        tok = self.tokens[-1]
+        if tok:
+            tok.string += self.source[self.ends[-1]:end]
+        self.ends[-1] = end
+
+    def kind(self, index: int) -> int:
+        """Return the kind of a token without creating a token object."""
+        self.lex_until(index)
+        return self.kinds[index]
+
+    def string(self, index: int) -> str:
+        """Return the string of a token without creating a token object."""
+        self.lex_until(index)
+        tok = self.tokens[index]
+        if tok:
+            return tok.string
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def __len__(self) -> int:
+        """Return the number of tokens lexed so far."""
+        return len(self.tokens)
+
+    def __getitem__(self, index: int) -> Token:
+        self.lex_until(index)
+        tok = self.tokens[index]
+        if tok is None:
+            tok = self.create_token(index)
+        return tok
+
+    def lex_until(self, index: int) -> None:
+        """Lex tokens until the token at an index has been lexed."""
+        while index >= len(self.tokens) and self.lex_more():
+            pass
+
+    def lex_more(self) -> bool:
+        """Lex the next chunk of tokens, if the buffer has a lexer.
+
+        Release the objects of tokens before the chunk. Return False if
+        there are no more tokens.
+        """
+        if self.lexer is None or self.lexer.done:
+            return False
+        first = len(self.tokens)
+        tokens = self.tokens
+        for i in range(self.released, first - LOOKBEHIND):
+            tokens[i] = None
+        self.released = max(self.released, first - LOOKBEHIND)
+        self.lexer.lex_more(LEX_CHUNK_SIZE)
+        # The new tokens are likely to be used soon, and creating them
+        # together is faster than one at a time.
+        self.create_tokens(first)
+        return True
+
+    def create_tokens(self, first: int) -> None:
+        """Create the objects of the tokens from an index on."""
+        source = self.source
+        kinds = self.kinds
+        starts = self.starts
+        ends = self.ends
+        lines = self.lines
+        tokens = self.tokens
+        pre_start = 0
+        if first > 0:
+            pre_start = ends[first - 1]
+        for i in range(first, len(tokens)):
+            start = starts[i]
+            end = ends[i]
+            if tokens[i] is None:
+                tok = token_classes[kinds[i]](source[start:end],
+                                              source[pre_start:start])
+                tok.line = lines[i]
+                tokens[i] = tok
+            pre_start = end
+
+    def create_token(self, index: int) -> Token:
+        """Create the object of a token that is stored as a location."""
+        if index < 0:
+            index += len(self.tokens)
+        source = self.source
+        start = self.starts[index]
+        pre_start = 0
+        if index > 0:
+            pre_start = self.ends[index - 1]
+        tok = token_classes[self.kinds[index]](source[start:self.ends[index]],
+                                               source[pre_start:start])
+        tok.line = self.lines[index]
+        self.tokens[index] = tok
+        return tok
+
+    def __iter__(self) -> Iterator[Token]:
+        i = 0
+        while i < len(self.tokens) or self.lex_more():
+            if i < len(self.tokens):
+                yield self[i]
+                i += 1
+
+
+def lex(string: str, first_line: int = 1) -> TokenBuffer:
+    """Analyze string and return a sequence of tokens.
 
     The last token is always Eof.
     """
-    l = Lexer()
+    l = RegexLexer()
     l.lex(string, first_line)
     return l.tok
 
 
+def lex_incrementally(string: str, first_line: int = 1) -> TokenBuffer:
+    """Return a sequence of the tokens of a string that are lexed on demand.
+
+    Tokens are lexed in small chunks when they are indexed, and only a few
+    tokens before the last indexed one are kept, so that the tokens can be
+    used by a single pass over them (such as the parser) without storing
+    all of them.
+    """
+    l = RegexLexer()
+    l.begin(string, first_line)
+    l.tok.lexer = l
+    return l.tok
+
+
 # Reserved words (not including operators)
 keywords = set([
     'as', 'assert', 'break', 'class', 'continue', 'def', 'del', 'elif',
@@ -267,7 +490,8 @@ class Lexer:
     enc = DEFAULT_ENCODING  # Encoding TODO implement properly
 
     # Generated tokens
-    tok = Undefined(List[Token])
+    tok = Undefined(TokenBuffer)
+    done = False  # Has the whole string been analyzed?
     
     # Table from byte character value to lexer method. E.g. entry at ord('0')
     # contains the method lex_number().
@@ -282,7 +506,6 @@ class Lexer:
     
     def __init__(self) -> None:
         self.map = [self.unknown_character] * 256
-        self.tok = []
         self.indents = [0]
         self.open_brackets = []
         # Fill in the map from valid character codes to relevant lexer methods.
@@ -306,9 +529,17 @@ class Lexer:
     
     def lex(self, s: str, first_line: int) -> None:
         """Lexically analyze a string, storing the tokens at the tok list."""
+        self.begin(s, first_line)
+        while not self.done:
+            self.lex_more(LEX_CHUNK_SIZE)
+    
+    def begin(self, s: str, first_line: int) -> None:
+        """Start lexical analysis of a string (see lex_more)."""
         self.s = s
         self.i = 0
         self.line = first_line
+        self.tok = TokenBuffer(s)
+        self.done = False
 
         if s.startswith('\xef\xbb\xbf'):
             self.add_token(Bom(s[0:3]))
@@ -316,34 +547,51 @@ class Lexer:
         # Parse initial indent; otherwise first-line indent would not generate
         # an error.
         self.lex_indent()
-
-        # Make a local copy of map as a simple optimization.
-        map = self.map
-        
-        # Lex the file. Repeatedly call the lexer method for the current char.
-        while self.i < len(s):
-            # Get the character code of the next character to lex.
-            c = ord(s[self.i])
-            # Dispatch to the relevant lexer method. This will consume some
-            # characters in the text, add a token to self.tok and increment
-            # self.i.
-            map[c]()
-        
+    
+    def lex_more(self, count: int) -> None:
+        """Lex at least count more tokens, or the rest of the string."""
+        self.lex_tokens(len(self.tok) + count)
+        if self.i >= len(self.s):
+            self.lex_end()
+    
+    def lex_end(self) -> None:
+        """Add the tokens at the end of the string."""
         # Append a break if there is no statement/block terminator at the end
         # of input.
-        if len(self.tok) > 0 and (not isinstance(self.tok[-1], Break) and
-                                  not isinstance(self.tok[-1], Dedent)):
+        if len(self.tok) > 0 and (self.tok.kind(-1) != BREAK and
+                                  self.tok.kind(-1) != DEDENT):
             self.add_token(Break(''))
 
         # Attack any dangling comments/whitespace to a final Break token.
-        if self.tok and isinstance(self.tok[-1], Break):
-            self.tok[-1].string += self.pre_whitespace
+        if len(self.tok) > 0 and self.tok.kind(-1) == BREAK:
+            self.tok.extend_last(self.i)
             self.pre_whitespace = ''
 
         # Close remaining open blocks with Dedent tokens.
         self.lex_indent()
         
         self.add_token(Eof(''))
+        self.done = True
+    
+    def lex_tokens(self, limit: int) -> None:
+        """Lex until there are limit tokens or the string ends.
+
+        Do not stop after a Break token, since it may still be extended.
+        """
+        s = self.s
+        # Make a local copy of map as a simple optimization.
+        map = self.map
+        tokens = self.tok.tokens
+        
+        # Repeatedly call the lexer method for the current char.
+        while self.i < len(s) and (len(tokens) < limit or
+                                   self.tok.kinds[-1] == BREAK):
+            # Get the character code of the next character to lex.
+            c = ord(s[self.i])
+            # Dispatch to the relevant lexer method. This will consume some
+            # characters in the text, add a token to self.tok and increment
+            # self.i.
+            map[c]()
     
     def lex_number_or_dot(self) -> None:
         """Analyse a token starting with a dot.
@@ -632,9 +880,9 @@ class Lexer:
     def lex_break(self) -> None:
         """Analyse a line break."""
         s = self.match(self.break_exp)
-        if self.tok and isinstance(self.tok[-1], Break):
-            self.tok[-1].string += self.pre_whitespace + s
+        if len(self.tok) > 0 and self.tok.kind(-1) == BREAK:
             self.i += len(s)
+            self.tok.extend_last(self.i)
             self.line += 1
             self.pre_whitespace = ''
         elif self.ignore_break():
@@ -651,7 +899,7 @@ class Lexer:
     def lex_colon(self) -> None:
         self.add_token(Colon(':'))
     
-    open_bracket_exp = re.compile('[[({]')
+    open_bracket_exp = re.compile(r'[\[({]')
     
     def lex_open_bracket(self) -> None:
         s = self.match(self.open_bracket_exp)
@@ -730,8 +978,8 @@ class Lexer:
             raise ValueError('Empty token')
         tok.pre = self.pre_whitespace
         tok.line = self.line
-        self.tok.append(tok)
         self.i += len(tok.string)
+        self.tok.add_token(tok, self.i)
         self.pre_whitespace = ''
     
     def add_special_token(self, tok: Token, line: int, skip: int) -> None:
@@ -743,8 +991,8 @@ class Lexer:
             raise ValueError('Empty token')
         tok.pre = self.pre_whitespace
         tok.line = line
-        self.tok.append(tok)
         self.i += skip
+        self.tok.add_token(tok, self.i)
         self.pre_whitespace = ''
     
     def ignore_break(self) -> bool:
@@ -754,8 +1002,8 @@ class Lexer:
             return True
         else:
             # Ignore break after another break or dedent.
-            t = self.tok[-1]
-            return isinstance(t, Break) or isinstance(t, Dedent)
+            kind = self.tok.kind(-1)
+            return kind == BREAK or kind == DEDENT
     
     def verify_encoding(self, string: str, context: int) -> None:
         """Verify that token is encoded correctly (using the file encoding)."""
@@ -777,6 +1025,158 @@ class Lexer:
                 self.add_token(LexError('', type))
 
 
+
+# Groups of RegexLexer.master_exp (the values of match.lastindex)
+SPACE_GROUP = 1
+NAME_GROUP = 2
+ASSIGN_PUNCT_GROUP = 3
+OP_GROUP = 4
+PUNCT_GROUP = 5
+OPEN_BRACKET_GROUP = 6
+CLOSE_BRACKET_GROUP = 7
+COLON_GROUP = 8
+SEMICOLON_GROUP = 9
+LINE_BREAK_GROUP = 10
+OTHER_GROUP = 11
+
+
+def name_token_kinds() -> Dict[str, int]:
+    """Return a map from name to the token kind for the names that are not
+    identifiers (see RegexLexer)."""
+    kinds = Dict[str, int]()
+    for name in keywords:
+        kinds[name] = KEYWORD
+    for name in alpha_operators:
+        kinds[name] = OP
+    for name in str_prefixes:
+        # Name or a prefix of a string literal
+        kinds[name] = None
+    return kinds
+
+
+class RegexLexer(Lexer):
+    """Lexical analyzer that finds tokens using a single regular expression.
+
+    Produce the same tokens as Lexer. Each iteration of the main loop
+    matches master_exp at the current location, which consumes the
+    whitespace before the next token and classifies the token. The most
+    common tokens (names, operators, punctuators and line breaks) are stored
+    directly as token locations (see TokenBuffer). The rest, such as string
+    and number literals, comments and indents, are analyzed by the Lexer
+    methods.
+    """
+    
+    master_exp = re.compile(
+        r'([ \t\x0c]*)'                               # Whitespace
+        r'(?:([a-zA-Z_][a-zA-Z0-9_]*)'                # Name, keyword or prefix
+        r'|(\*\*=|//=|<<=|>>=|[-+*/%&|^]=)'           # Assignment punctuator
+        r'|(==|!=|<=|>=|\*\*|//|<<|>>|[-+*/<>%&|^~]'  # Operator
+        r'|\.(?![0-9]))'
+        r'|([=,@])'                                   # Other punctuator
+        r'|([\[({])'                                  # Open bracket
+        r'|([])}])'                                   # Close bracket
+        r'|(:)'
+        r'|(;)'
+        r'|(\r\n|\r|\n)'                              # Line break
+        r'|(.)'                                       # Anything else
+        r'|$)', re.DOTALL)
+    
+    # Map from name to the token kind, if the name is not an identifier
+    name_kinds = name_token_kinds()
+    
+    def lex_tokens(self, limit: int) -> None:
+        s = self.s
+        tok = self.tok
+        # Store tokens directly in the arrays of the buffer (see
+        # TokenBuffer.add).
+        kinds = tok.kinds
+        ends = tok.ends
+        add_kind = kinds.append
+        add_start = tok.starts.append
+        add_end = ends.append
+        add_line = tok.lines.append
+        add_object = tok.tokens.append
+        match = self.master_exp.match
+        name_kinds = self.name_kinds
+        map = self.map
+        open_brackets = self.open_brackets
+        open_bracket = self.open_bracket
+        i = self.i
+        while i < len(s) and (len(kinds) < limit or kinds[-1] == BREAK):
+            m = match(s, i)
+            group = m.lastindex
+            if group == NAME_GROUP:
+                string = m.group(group)
+                kind = name_kinds.get(string, NAME)
+                if kind is None:
+                    if s[m.end():m.end() + 1] in ('"', "'"):
+                        # String literal with a prefix, such as r'...'.
+                        self.i = m.start(group)
+                        self.pre_whitespace = s[ends[-1] if ends else 0:
+                                                self.i]
+                        self.lex_prefixed_str(string)
+                        i = self.i
+                        continue
+                    kind = NAME
+            elif group == PUNCT_GROUP or group == ASSIGN_PUNCT_GROUP:
+                kind = PUNCT
+            elif group == OP_GROUP:
+                kind = OP
+            elif group == OPEN_BRACKET_GROUP:
+                open_brackets.append(m.group(group))
+                kind = PUNCT
+            elif group == CLOSE_BRACKET_GROUP:
+                if (open_brackets != [] and
+                        open_bracket[m.group(group)] == open_brackets[-1]):
+                    open_brackets.pop()
+                kind = PUNCT
+            elif group == COLON_GROUP:
+                kind = COLON
+            elif group == SEMICOLON_GROUP:
+                kind = BREAK
+            elif group == LINE_BREAK_GROUP:
+                # This is like lex_break.
+                i = m.end()
+                self.line += 1
+                if kinds and kinds[-1] == BREAK:
+                    tok.extend_last(i)
+                elif not (open_brackets != [] or not kinds or
+                          kinds[-1] == DEDENT):
+                    add_kind(BREAK)
+                    add_start(m.start(group))
+                    add_end(i)
+                    add_line(self.line - 1)
+                    add_object(None)
+                    self.i = i
+                    self.pre_whitespace = ''
+                    self.lex_indent()
+                    i = self.i
+                continue
+            elif group == OTHER_GROUP:
+                # Numeric or string literal, comment, line break etc. Use the
+                # Lexer method for the character.
+                self.i = m.start(group)
+                self.pre_whitespace = s[ends[-1] if ends else 0:self.i]
+                c = ord(m.group(group))
+                if c < 256:
+                    map[c]()
+                else:
+                    self.unknown_character()
+                i = self.i
+                continue
+            else:
+                # Whitespace at the end of the file.
+                i = m.end()
+                continue
+            i = m.end()
+            add_kind(kind)
+            add_start(m.start(group))
+            add_end(i)
+            add_line(self.line)
+            add_object(None)
+        self.i = i
+        self.pre_whitespace = s[ends[-1] if ends else 0:i]
+
 if __name__ == '__main__':
     # Lexically analyze a file and dump the tokens to stdout.
     import sys
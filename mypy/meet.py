@@ -1,9 +1,12 @@
 from typing import cast, List
 
-from mypy.join import is_similar_callables, combine_similar_callables
+from mypy.join import (
+    is_similar_callables, combine_similar_callables, basic_types_key
+)
 from mypy.types import (
     Type, AnyType, TypeVisitor, UnboundType, Void, ErrorType, NoneTyp, TypeVar,
-    Instance, Callable, TupleType, ErasedType, BasicTypes, TypeList
+    Instance, Callable, TupleType, ErasedType, BasicTypes, TypeList,
+    new_type_cache
 )
 from mypy.sametypes import is_same_type
 from mypy.subtypes import is_subtype
@@ -12,11 +15,28 @@ from mypy.subtypes import is_subtype
 # TODO Describe this module.
 
 
+# Maximum number of entries in meet_cache (the cache is emptied when it gets
+# full)
+MEET_CACHE_SIZE = 20000
+
+# Results of meet_types, keyed by interned types (see join.basic_types_key)
+meet_cache = new_type_cache()
+
+
 def meet_types(s: Type, t: Type, basic: BasicTypes) -> Type:
     if isinstance(s, AnyType) or isinstance(s, ErasedType):
         return s
     
-    return t.accept(TypeMeetVisitor(s, basic))
+    key = basic_types_key(s, t, basic)
+    if key is None:
+        return t.accept(TypeMeetVisitor(s, basic))
+    result = cast(Type, meet_cache.get(key))
+    if result is None:
+        result = key[1].accept(TypeMeetVisitor(key[0], basic))
+        if len(meet_cache) >= MEET_CACHE_SIZE:
+            meet_cache.clear()
+        meet_cache[key] = result
+    return result
 
 
 class TypeMeetVisitor(TypeVisitor[Type]):
@@ -4,7 +4,7 @@ import re
 from abc import abstractmethod, ABCMeta
 
 from typing import (
-    Any, overload, typevar, Undefined, List, Tuple, cast, Set, Dict
+    Any, overload, typevar, Undefined, List, Tuple, cast, Set, Dict, Function
 )
 
 from mypy.lex import Token
@@ -53,6 +53,11 @@ node_kinds = {
 implicit_module_attrs = ['__name__', '__doc__', '__file__']
 
 
+# Map from class to the members of the class, including inherited members
+# (see TypeInfo.members). Cleared whenever the members of a class change.
+member_tables = Dict['TypeInfo', Dict[str, 'SymbolTableNode']]()
+
+
 type_aliases = {
     'typing.List': '__builtins__.list',
     'typing.Dict': '__builtins__.dict',
@@ -111,6 +116,7 @@ class MypyFile(SymbolNode):
     path = ''        # Path to the file (None if not known)
     defs = Undefined # type: List[Node]  # Global definitions and statements
     is_bom = False   # Is there a UTF-8 BOM at the start?
+    has_parse_errors = False  # Were parse errors reported for the file?
     names = Undefined('SymbolTable')
     imports = Undefined(List[Node])    # All import nodes within the file
     
@@ -1249,6 +1255,8 @@ class TypeInfo(SymbolNode):
     # Method Resolution Order: the order of looking up attributes. The first
     # value always to refers to self.
     mro = Undefined(List['TypeInfo'])
+    # Full names of the types in mro (computed when needed; see has_base)
+    mro_names = None # type: Set[str]
     subtypes = Undefined(Set['TypeInfo']) # Direct subclasses
     names = Undefined('SymbolTable')      # Names defined directly in this type
     is_abstract = False       # Does the class have any abstract attributes?
@@ -1289,11 +1297,21 @@ class TypeInfo(SymbolNode):
         return self.type_vars is not None and len(self.type_vars) > 0
     
     def get(self, name: str) -> 'SymbolTableNode':
-        for cls in self.mro:
-            n = cls.names.get(name)
-            if n:
-                return n
-        return None
+        return self.members().get(name)
+    
+    def members(self) -> Dict[str, 'SymbolTableNode']:
+        """Return a map from name to the symbol table node of each member.
+
+        The map includes inherited members. It is computed on first use and
+        again after the members of any class or the mro have changed.
+        """
+        table = member_tables.get(self)
+        if table is None:
+            table = Dict[str, SymbolTableNode]()
+            for cls in reversed(self.mro):
+                table.update(cls.names)
+            member_tables[self] = table
+        return table
 
     def __getitem__(self, name: str) -> 'SymbolTableNode':
         n = self.get(name)
@@ -1322,13 +1340,9 @@ class TypeInfo(SymbolNode):
         return self.get_method(name) is not None
     
     def get_var(self, name: str) -> Var:
-        for cls in self.mro:
-            if name in cls.names:
-                node = cls.names[name].node
-                if isinstance(node, Var):
-                    return cast(Var, node)
-                else:
-                    return None
+        n = self.members().get(name)
+        if n and isinstance(n.node, Var):
+            return cast(Var, n.node)
         return None
     
     def get_var_or_getter(self, name: str) -> SymbolNode:
@@ -1340,13 +1354,9 @@ class TypeInfo(SymbolNode):
         return self.get_var(name)
     
     def get_method(self, name: str) -> FuncBase:
-        for cls in self.mro:
-            if name in cls.names:
-                node = cls.names[name].node
-                if isinstance(node, FuncBase):
-                    return cast(FuncBase, node)
-                else:
-                    return None
+        n = self.members().get(name)
+        if n and isinstance(n.node, FuncBase):
+            return cast(FuncBase, n.node)
         return None
 
     def calculate_mro(self) -> None:
@@ -1355,16 +1365,19 @@ class TypeInfo(SymbolNode):
         Raise MroError if cannot determine mro.
         """
         self.mro = linearize_hierarchy(self)
+        self.mro_names = None
+        member_tables.clear()
+        # Cached subtype relationships may depend on the old mro.
+        mypy.types.clear_type_caches()
     
     def has_base(self, fullname: str) -> bool:
         """Return True if type has a base type with the specified name.
 
         This can be either via extension or via implementation.
         """
-        for cls in self.mro:
-            if cls.fullname() == fullname:
-                return True
-        return False
+        if self.mro_names is None:
+            self.mro_names = set(cls.fullname() for cls in self.mro)
+        return fullname in self.mro_names
     
     def all_subtypes(self) -> 'Set[TypeInfo]':
         """Return TypeInfos of all subtypes, including this type, as a set."""
@@ -1469,6 +1482,138 @@ class SymbolTable(Dict[str, SymbolTableNode]):
         a[-1] += ')'
         return '\n'.join(a)
 
+    def start_pass(self, stage: int) -> None:
+        """Called when an analysis pass over the module starts.
+
+        The stage is SEMANAL_PASS, THIRD_PASS or CHECK_PASS.
+        """
+        pass
+
+    def is_deferred(self, defn: Node) -> bool:
+        """Should the current pass over the module skip a top-level
+        statement? (see LazySymbolTable)"""
+        return False
+
+
+class ClassSymbolTable(SymbolTable):
+    """Symbol table of the members defined in a class.
+
+    Changing the table clears the member tables of all classes (see
+    TypeInfo.members), since subclasses inherit the members.
+    """
+
+    def __setitem__(self, name: str, node: SymbolTableNode) -> None:
+        member_tables.clear()
+        super().__setitem__(name, node)
+
+    def __delitem__(self, name: str) -> None:
+        member_tables.clear()
+        super().__delitem__(name)
+
+
+# Analysis passes over a module after the first pass of semantic analysis
+# (see LazySymbolTable)
+SEMANAL_PASS = 2
+THIRD_PASS = 3
+CHECK_PASS = 4
+
+
+class LazySymbolTable(SymbolTable):
+    """Symbol table of a module whose definitions are analyzed on demand.
+
+    Top-level definitions can be deferred: the analysis passes over the
+    module skip them until a name that they define is looked up in the
+    table. The loader then performs the passes that have already reached
+    the definition, and later passes process it normally. The definitions
+    are thus analyzed in the same order relative to the other statements of
+    the module as without deferring (in particular, after the imports that
+    precede them). Iterating over the nodes of the table loads all deferred
+    definitions.
+
+    Attributes:
+      pending:  Map from name to the deferred definition that defines it
+      deferred: Map from deferred definition to the names that it defines
+      loaded:   Map from definition loaded on demand to the last pass that
+                the loader performed for it
+      skipped:  Deferred definitions skipped by the current pass
+      stage:    The last pass started over the module, or 1 after the first
+                pass of semantic analysis
+      loader:   Function that performs the passes up to the given one for
+                a definition
+    """
+
+    def __init__(self, names: SymbolTable,
+                 loader: Function[[Node, int], None]) -> None:
+        super().__init__(names)
+        self.pending = Dict[str, Node]()
+        self.deferred = Dict[Node, List[str]]()
+        self.loaded = Dict[Node, int]()
+        self.skipped = Set[Node]()
+        self.stage = 1
+        self.loader = loader
+
+    def defer(self, defn: Node, names: List[str]) -> None:
+        for name in names:
+            self.pending[name] = defn
+        self.deferred[defn] = names
+
+    def load(self, defn: Node) -> None:
+        """Analyze a deferred definition as far as the module has been
+        analyzed."""
+        for name in self.deferred.pop(defn):
+            del self.pending[name]
+        last = self.stage
+        if defn not in self.skipped:
+            # The current pass has not reached the definition yet.
+            last -= 1
+        if last >= SEMANAL_PASS:
+            self.loaded[defn] = last
+            self.loader(defn, last)
+
+    def load_all(self) -> None:
+        for defn in list(self.deferred.keys()):
+            # Loading a definition may load others.
+            if defn in self.deferred:
+                self.load(defn)
+
+    def start_pass(self, stage: int) -> None:
+        self.stage = stage
+        self.skipped = Set[Node]()
+
+    def is_deferred(self, defn: Node) -> bool:
+        if defn in self.deferred:
+            self.skipped.add(defn)
+            return True
+        return self.loaded.get(defn, 0) >= self.stage
+
+    def __getitem__(self, name: str) -> SymbolTableNode:
+        if name in self.pending:
+            self.load(self.pending[name])
+        return super().__getitem__(name)
+
+    @overload
+    def get(self, name: str) -> SymbolTableNode:
+        return self.get(name, None)
+
+    @overload
+    def get(self, name: str, default: SymbolTableNode) -> SymbolTableNode:
+        if name in self.pending:
+            self.load(self.pending[name])
+        return super().get(name, default)
+
+    def items(self) -> Any:
+        self.load_all()
+        return super().items()
+
+    def values(self) -> Any:
+        self.load_all()
+        return super().values()
+
+    def __reduce__(self) -> Any:
+        # Pickle as an ordinary symbol table.
+        self.load_all()
+        return SymbolTable, (), None, None, iter(super().items())
+
 
 def clean_up(s: str) -> str:
     # TODO remove
@@ -1489,12 +1634,13 @@ def function_type(func: FuncBase) -> 'mypy.types.FunctionLike':
         names = [] # type: List[str]
         for arg in fdef.args:
             names.append(arg.name())
-        return mypy.types.Callable([mypy.types.AnyType()] * len(fdef.args),
-            fdef.arg_kinds,
-            names,
-            mypy.types.AnyType(),
-            False,
-            name)
+        any_type = mypy.types.interned_any()
+        return mypy.types.interned_callable([any_type] * len(fdef.args),
+                                            fdef.arg_kinds,
+                                            names,
+                                            any_type,
+                                            False,
+                                            name)
 
 
 @overload
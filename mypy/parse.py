@@ -11,7 +11,7 @@ from typing import Undefined, List, Tuple, Any, Set, cast
 from mypy import lex
 from mypy.lex import (
     Token, Eof, Bom, Break, Name, Colon, Dedent, IntLit, StrLit, BytesLit,
-    UnicodeLit, FloatLit, Op, Indent, Keyword, Punct, LexError
+    UnicodeLit, FloatLit, Op, Indent, Keyword, Punct, LexError, TokenBuffer
 )
 import mypy.types
 from mypy.nodes import (
@@ -62,23 +62,26 @@ none = Token('') # Empty token
 
 
 def parse(s: str, fnam: str = None, errors: Errors = None,
-          pyversion: int = 3) -> MypyFile:
+          pyversion: int = 3, keep_repr: bool = True) -> MypyFile:
     """Parse a source file, without doing any semantic analysis.
 
     Return the parse tree. If errors is not provided, raise ParseError
     on failure. Otherwise, use the errors object to report parse errors.
 
     The pyversion argument determines the Python syntax variant (2 for 2.x and
-    3 for 3.x).
+    3 for 3.x). If keep_repr is False, the nodes of the tree do not get
+    representations (they are only needed for producing formatted output).
     """
-    parser = Parser(fnam, errors, pyversion)
+    parser = Parser(fnam, errors, pyversion, keep_repr)
     tree = parser.parse(s)
     tree.path = fnam
     return tree
 
 
 class Parser:
-    tok = Undefined(List[Token])
+    tok = Undefined(TokenBuffer)
+    # Token objects of tok (None if not created yet)
+    tokens = Undefined(List[Token])
     ind = 0
     errors = Undefined(Errors)
     raise_on_error = False
@@ -87,10 +90,17 @@ class Parser:
     is_class_body = False
     # All import nodes encountered so far in this parse unit.
     imports = Undefined(List[Node])
-    
-    def __init__(self, fnam: str, errors: Errors, pyversion: int) -> None:
+    # Number of nodes created so far (all nodes get a representation)
+    num_nodes = 0
+    # Are the representations of nodes stored in the nodes? If not, nodes
+    # are only counted.
+    keep_repr = True
+    
+    def __init__(self, fnam: str, errors: Errors, pyversion: int,
+                 keep_repr: bool = True) -> None:
         self.raise_on_error = errors is None
         self.pyversion = pyversion
+        self.keep_repr = keep_repr
         if errors is not None:
             self.errors = errors
         else:
@@ -100,15 +110,39 @@ class Parser:
         else:
             self.errors.set_file('<input>')
     
-    def parse(self, s: str) -> MypyFile:
-        self.tok = lex.lex(s)
+    def parse(self, s: str, tokens: TokenBuffer = None) -> MypyFile:
+        """Parse a source file.
+
+        If tokens is given, it is the result of lexical analysis of s.
+        Otherwise, tokens are lexed as they are needed by the parser.
+        """
+        if tokens is None:
+            tokens = lex.lex_incrementally(s)
+        self.tok = tokens
+        self.tokens = tokens.tokens
         self.ind = 0
         self.imports = []
+        num_errors = self.errors.num_messages()
         file = self.parse_file()
+        file.has_parse_errors = self.errors.num_messages() > num_errors
         if self.raise_on_error and self.errors.is_errors():
             self.errors.raise_error()
         return file
     
+    def parse_part(self, tokens: TokenBuffer, start: int,
+                   end: int) -> List[Node]:
+        """Parse the top-level statements between two token indexes.
+
+        This is used for reparsing a part of a file (see mypy.reparse).
+        The import nodes within the statements are stored in self.imports.
+        Parse errors are only reported (never raised).
+        """
+        self.tok = tokens
+        self.tokens = tokens.tokens
+        self.ind = start
+        self.imports = []
+        return self.parse_defs(end)
+    
     def parse_file(self) -> MypyFile:
         """Parse a mypy source file."""
         is_bom = self.parse_bom()
@@ -223,9 +257,10 @@ class Parser:
     
     # Parsing global definitions
     
-    def parse_defs(self) -> List[Node]:
+    def parse_defs(self, end: int = -1) -> List[Node]:
+        """Parse statements until end of file (or until a token index)."""
         defs = List[Node]()
-        while not self.eof():
+        while not self.eof() and (end < 0 or self.ind < end):
             try:
                 defn = self.parse_statement()
                 if defn is not None:
@@ -1363,10 +1398,13 @@ class Parser:
                 and expr.callee.name == 'super'):
             # super() expression
             node = SuperExpr(name.string)
-            self.set_repr(node,
-                          noderepr.SuperExprRepr(expr.callee.repr.id,
-                                                 expr.repr.lparen,
-                                                 expr.repr.rparen, dot, name))
+            if self.keep_repr:
+                self.set_repr(node, noderepr.SuperExprRepr(expr.callee.repr.id,
+                                                           expr.repr.lparen,
+                                                           expr.repr.rparen,
+                                                           dot, name))
+            else:
+                self.num_nodes += 1
         else:
             node = MemberExpr(expr, name.string)
             self.set_repr(node, noderepr.MemberExprRepr(dot, name))
@@ -1468,13 +1506,15 @@ class Parser:
     # Helper methods
     
     def skip(self) -> Token:
+        tok = self.current()
         self.ind += 1
-        return self.tok[self.ind - 1]
+        return tok
     
     def expect(self, string: str) -> Token:
-        if self.current_str() == string:
+        tok = self.current()
+        if tok.string == string:
             self.ind += 1
-            return self.tok[self.ind - 1]
+            return tok
         else:
             self.parse_error()
     
@@ -1489,9 +1529,10 @@ class Parser:
         self.errors.report(line, msg)
     
     def expect_type(self, typ: type) -> Token:
-        if isinstance(self.current(), typ):
+        tok = self.current()
+        if isinstance(tok, typ):
             self.ind += 1
-            return self.tok[self.ind - 1]
+            return tok
         else:
             self.parse_error()
     
@@ -1505,7 +1546,15 @@ class Parser:
         return self.expect('end'), self.expect_type(Break)
     
     def current(self) -> Token:
-        return self.tok[self.ind]
+        # This is like self.tok[self.ind], but faster.
+        try:
+            tok = self.tokens[self.ind]
+        except IndexError:
+            # The token has not been lexed yet.
+            return self.tok[self.ind]
+        if tok is None:
+            tok = self.tok.create_token(self.ind)
+        return tok
     
     def current_str(self) -> str:
         return self.current().string
@@ -1597,7 +1646,9 @@ class Parser:
     # Representation management
     
     def set_repr(self, node: Node, repr: Any) -> None:
-        node.repr = repr
+        if self.keep_repr:
+            node.repr = repr
+        self.num_nodes += 1
     
     def repr(self, node: Node) -> Any:
         return node.repr
@@ -0,0 +1,250 @@
+"""Persistent cache of parse trees.
+
+The analysis cache (mypy.cache) only avoids parsing modules that are fresh
+together with all their dependencies. This cache lets a build skip lexing
+and parsing of any file whose source has not changed since an earlier build
+that used the same cache directory, for example library modules that import
+a module that was edited.
+
+Trees are stored without node representations (see Parser.keep_repr), one
+file per source in <cache dir>/parse-<pyversion>/<source hash>.tree. A file
+holds zlib-compressed marshal data of the tuple (version, classes, tree):
+
+ * classes is a list of (module name, class name, attribute names) tuples,
+   one for each class and set of instance attributes used in the tree.
+ * Objects are encoded as (class index, attribute values...), lists as
+   lists, tuples as (TUPLE, items...) and other values (None, numbers,
+   strings and bytes) as themselves.
+ * An object that is referred to from several places (for example, import
+   nodes are in both defs and imports of a file) is encoded as
+   (SHARED, memo index, class index, attribute values...) at its first
+   occurrence and as (REF, memo index) after that.
+
+Trees with parse errors are not stored, since the errors need to be reported
+again whenever the file is built.
+"""
+
+import gc
+import marshal
+import os
+import os.path
+import sys
+import tempfile
+import zlib
+
+from typing import Undefined, Dict, List, Tuple, Set, Any, cast
+
+from mypy.nodes import MypyFile
+from mypy.cache import source_hash, with_recursion_limit
+from mypy import lex, nodes, types, typerepr
+
+
+# Increment this when the format of cached trees changes (this includes
+# changes to node and type classes).
+PARSE_CACHE_VERSION = 1
+
+# Modules that define the classes of objects in parse trees
+TREE_MODULES = [nodes.__name__, types.__name__, lex.__name__,
+                typerepr.__name__]
+
+# Markers of encoded values other than plain objects (see the module
+# docstring)
+TUPLE = -1
+REF = -2
+SHARED = -3
+
+
+class ParseCache:
+    """Read and write parse trees cached in a directory.
+
+    Attributes:
+      dir:    Directory that holds the cached trees for a Python version
+    """
+
+    def __init__(self, cache_dir: str, pyversion: int) -> None:
+        self.dir = os.path.join(cache_dir, 'parse-{}'.format(pyversion))
+
+    def contains(self, text: str) -> bool:
+        """Is there a cached tree for a source?"""
+        return os.path.isfile(self.tree_path(text))
+
+    def load(self, text: str) -> MypyFile:
+        """Return the cached tree for a source (None if not available)."""
+        try:
+            f = open(self.tree_path(text), 'rb')
+            try:
+                data = f.read()
+            finally:
+                f.close()
+            return loads(data)
+        except (IOError, ValueError, EOFError, TypeError, LookupError,
+                AttributeError, zlib.error):
+            return None
+
+    def store(self, text: str, tree: MypyFile) -> None:
+        """Store the tree of a source that was parsed without errors.
+
+        Failing to store the tree is not an error, since the cache is only
+        an optimization.
+        """
+        data = dumps(tree)
+        temp_path = None # type: str
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            # Write to a temporary file of our own first, so that concurrent
+            # stores (in parallel builds or other processes) do not
+            # interfere and readers never see a partially written tree.
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.dir)
+            f = os.fdopen(fd, 'wb')
+            try:
+                f.write(data)
+            finally:
+                f.close()
+            os.rename(temp_path, self.tree_path(text))
+        except (IOError, OSError):
+            if temp_path and os.path.isfile(temp_path):
+                os.remove(temp_path)
+
+    def tree_path(self, text: str) -> str:
+        return os.path.join(self.dir, source_hash(text) + '.tree')
+
+
+def dumps(tree: MypyFile) -> bytes:
+    """Encode a parse tree in the cache format."""
+    encoder = TreeEncoder(tree)
+    root = with_recursion_limit(lambda: encoder.encode(tree))
+    return zlib.compress(marshal.dumps((PARSE_CACHE_VERSION, encoder.classes,
+                                        root)))
+
+
+def loads(data: bytes) -> MypyFile:
+    """Decode a parse tree encoded by dumps.
+
+    Raise ValueError if the data was written by a different version of the
+    cache.
+    """
+    # Decoding creates lots of objects but no garbage; collecting garbage
+    # in the middle would only slow it down.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        version, classes, root = marshal.loads(zlib.decompress(data))
+        if version != PARSE_CACHE_VERSION:
+            raise ValueError('Unsupported parse cache version')
+        decoder = TreeDecoder(classes)
+        return cast(MypyFile, with_recursion_limit(lambda:
+                                                   decoder.decode(root)))
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class TreeEncoder:
+    """Encode the values in a parse tree (see the module docstring).
+
+    Attributes:
+      classes:  Encoded classes, indexed by class index
+      shared:   Ids of objects that are referred to more than once
+    """
+
+    classes = Undefined(List[Tuple[str, str, List[str]]])
+    shared = Undefined(Set[int])
+
+    def __init__(self, tree: MypyFile) -> None:
+        self.classes = List[Tuple[str, str, List[str]]]()
+        # Map from (class, attribute names) to class index
+        self.class_indexes = Dict[Tuple[type, Any], int]()
+        self.shared = shared_objects(tree)
+        self.memo = Dict[int, int]()
+
+    def encode(self, o: Any) -> Any:
+        t = type(o)
+        if t is list:
+            return [self.encode(x) for x in o]
+        elif t is tuple:
+            return tuple([TUPLE] + [self.encode(x) for x in o])
+        elif t is str:
+            # Repeated interned strings are only stored once.
+            return sys.intern(o)
+        elif o is None or t in (int, bool, float, complex, bytes):
+            return o
+        elif t.__module__ not in TREE_MODULES:
+            raise TypeError('Cannot encode {} in a parse tree'.format(t))
+        if id(o) in self.memo:
+            return (REF, self.memo[id(o)])
+        attrs = o.__dict__
+        names = list(attrs)
+        key = (t, tuple(names))
+        index = self.class_indexes.get(key)
+        if index is None:
+            index = len(self.classes)
+            self.class_indexes[key] = index
+            self.classes.append((t.__module__, t.__name__, names))
+        if id(o) in self.shared:
+            self.memo[id(o)] = len(self.memo)
+            encoded = List[Any]([SHARED, self.memo[id(o)], index])
+        else:
+            encoded = List[Any]([index])
+        for value in attrs.values():
+            encoded.append(self.encode(value))
+        return tuple(encoded)
+
+
+def shared_objects(tree: MypyFile) -> Set[int]:
+    """Return the ids of the objects referred to more than once in a tree."""
+    seen = Set[int]()
+    shared = Set[int]()
+    todo = List[Any]([tree])
+    while todo:
+        o = todo.pop()
+        if isinstance(o, list) or isinstance(o, tuple):
+            todo.extend(o)
+        elif hasattr(o, '__dict__'):
+            if id(o) in seen:
+                shared.add(id(o))
+            else:
+                seen.add(id(o))
+                todo.extend(o.__dict__.values())
+    return shared
+
+
+class TreeDecoder:
+    """Decode values encoded by TreeEncoder."""
+
+    def __init__(self, classes: List[Tuple[str, str, List[str]]]
+                 ) -> None:
+        self.classes = List[Tuple[type, List[str]]]()
+        for module, name, attrs in classes:
+            if module not in TREE_MODULES:
+                raise ValueError('Invalid class in a cached tree')
+            self.classes.append((getattr(sys.modules[module], name), attrs))
+        self.memo = Dict[int, Any]()
+
+    def decode(self, v: Any) -> Any:
+        t = type(v)
+        if t is list:
+            return [self.decode(x) for x in v]
+        elif t is not tuple:
+            return v
+        index = v[0]
+        if index >= 0:
+            cls, attrs = self.classes[index]
+            o = cls.__new__(cls)
+            start = 1
+        elif index == TUPLE:
+            return tuple([self.decode(x) for x in v[1:]])
+        elif index == REF:
+            return self.memo[v[1]]
+        else:
+            cls, attrs = self.classes[v[2]]
+            o = cls.__new__(cls)
+            self.memo[v[1]] = o
+            start = 3
+        d = o.__dict__
+        for name, x in zip(attrs, v[start:]):
+            tx = type(x)
+            if tx is tuple or tx is list:
+                d[name] = self.decode(x)
+            else:
+                d[name] = x
+        return o
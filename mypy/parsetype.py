@@ -6,7 +6,7 @@ from mypy.types import (
     Type, UnboundType, TupleType, TypeList, AnyType, Callable
 )
 from mypy.typerepr import CommonTypeRepr, ListTypeRepr
-from mypy.lex import Token, Name, StrLit, Break, lex
+from mypy.lex import Token, Name, StrLit, Break, TokenBuffer, lex
 from mypy import nodes
 
 
@@ -20,7 +20,7 @@ class TypeParseError(Exception):
         self.index = index
 
 
-def parse_type(tok: List[Token], index: int) -> Tuple[Type, int]:
+def parse_type(tok: TokenBuffer, index: int) -> Tuple[Type, int]:
     """Parse a type.
 
     Return (type, index after type).
@@ -30,7 +30,7 @@ def parse_type(tok: List[Token], index: int) -> Tuple[Type, int]:
     return p.parse_type(), p.index()
 
 
-def parse_types(tok: List[Token], index: int) -> Tuple[Type, int]:
+def parse_types(tok: TokenBuffer, index: int) -> Tuple[Type, int]:
     """Parse one or more types separated by commas (optional parentheses).
 
     Return (type, index after type).    
@@ -41,7 +41,7 @@ def parse_types(tok: List[Token], index: int) -> Tuple[Type, int]:
 
 
 class TypeParser:
-    def __init__(self, tok: List[Token], ind: int) -> None:
+    def __init__(self, tok: TokenBuffer, ind: int) -> None:
         self.tok = tok
         self.ind = ind
     
@@ -176,7 +176,7 @@ def parse_str_as_type(typestr: str, line: int) -> Type:
     return result
 
 
-def parse_signature(tokens: List[Token]) -> Tuple[Callable, int]:
+def parse_signature(tokens: TokenBuffer) -> Tuple[Callable, int]:
     """Parse signature of form (...) -> ...
 
     Return tuple (signature type, token index).
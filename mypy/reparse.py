@@ -0,0 +1,507 @@
+"""Incremental reparsing of edited source files.
+
+After an edit that replaces some lines of a parsed file (for example, in an
+editor), only the statements that overlap the edit need to be lexed and
+parsed again. Lexing starts at the beginning of the first affected
+statement and continues until the new tokens reach the start of an
+unchanged statement, after which the old tokens are still valid (only their
+offsets and line numbers are shifted). The nodes parsed from the new tokens
+replace the old nodes of the affected statements in the parse tree.
+
+Reparsing happens in units of top-level statements, or of the statements in
+the body of a top-level class (so that an edit within a method of a large
+class only reparses the method). A unit starts at a line at the indentation
+level of the units, except for the continuations of compound statements
+(else, elif, except and finally) and the definitions that follow
+decorators. Units are never split at semicolons.
+"""
+
+from array import array
+
+from typing import Undefined, List, Dict, Set, Tuple, Any, cast
+
+from mypy import lex
+from mypy.lex import (
+    TokenBuffer, RegexLexer, Token, LEX_CHUNK_SIZE, BREAK, INDENT, DEDENT,
+    EOF, BOM, KEYWORD, LEX_ERROR
+)
+from mypy.parse import Parser
+from mypy.nodes import MypyFile, Node, TypeDef, Context
+from mypy.errors import Errors
+from mypy import noderepr
+
+
+# Keywords that continue the compound statement on the previous lines
+continuation_keywords = set(['else', 'elif', 'except', 'finally'])
+
+
+def reparse(tree: MypyFile, tokens: TokenBuffer, first_line: int,
+            last_line: int, text: str, fnam: str = None,
+            errors: Errors = None, pyversion: int = 3) -> TokenBuffer:
+    """Update a parse tree after an edit that replaces lines of its source.
+
+    Replace lines first_line to last_line (inclusive) of the source of
+    tokens with text (if last_line is first_line - 1, insert text before
+    first_line). The text should usually end with a line break. The tree
+    must be the result of parsing the tokens, before semantic analysis.
+
+    Reparse the statements affected by the edit and replace their nodes in
+    the tree (and in tree.imports); the line numbers of the following nodes
+    are updated. Return the tokens of the new source.
+
+    Parse errors are reported as by mypy.parse.parse. Error recovery
+    depends on the surrounding statements, so the whole file is parsed if
+    there are parse errors in the reparsed statements or in the old tree.
+    """
+    reparser = Reparser(tree, tokens, fnam, errors, pyversion)
+    return reparser.reparse(first_line, last_line, text)
+
+
+class UnitScanner:
+    """Find the units at an indentation level of a token buffer.
+
+    The buffer can be scanned again after lexing more tokens.
+    """
+
+    tok = Undefined(TokenBuffer)
+    level = 0                      # Indentation level of the units
+    starts = Undefined(List[int])  # Indexes of the first tokens of units
+    index = 0                      # Index of the next token to scan
+    depth = 0                      # Indentation level at index
+    break_line = 0                 # Line number of the previous Break token
+    after_break = True             # Is the previous token a Break?
+    decorated = False              # Are we within decorators?
+    offsets = None # type: Dict[int, int]  # Map unit offset to index
+
+    def __init__(self, tok: TokenBuffer, level: int = 0, index: int = 0,
+                 depth: int = 0) -> None:
+        self.tok = tok
+        self.level = level
+        self.index = index
+        self.depth = depth
+        self.starts = []
+
+    def scan(self, end: int) -> None:
+        """Find the units before a token index (after the previous scan).
+
+        Stop at the end of the block of the units.
+        """
+        tok = self.tok
+        kinds = tok.kinds
+        lines = tok.lines
+        for i in range(self.index, end):
+            kind = kinds[i]
+            if kind == BREAK:
+                self.after_break = True
+                self.break_line = lines[i]
+            elif kind == INDENT:
+                self.depth += 1
+            elif kind == DEDENT:
+                self.depth -= 1
+                if self.depth < self.level:
+                    end = i
+                    break
+            else:
+                if (self.after_break and self.depth == self.level and
+                        lines[i] > self.break_line and kind != EOF and
+                        kind != BOM and kind != LEX_ERROR and
+                        not (kind == KEYWORD and
+                             tok.string(i) in continuation_keywords)):
+                    if not self.decorated:
+                        self.starts.append(i)
+                    self.decorated = tok.string(i) == '@'
+                self.after_break = False
+        self.index = end
+
+    def offset(self, unit: int) -> int:
+        """Return the source offset of a unit.
+
+        The whitespace and comments before the first token belong to the
+        unit.
+        """
+        index = self.starts[unit]
+        if index == 0:
+            return 0
+        return self.tok.ends[index - 1]
+
+    def find(self, offset: int) -> int:
+        """Return the index of the unit at a source offset (or -1)."""
+        if self.offsets is None:
+            self.offsets = {}
+            for unit in range(len(self.starts)):
+                self.offsets[self.offset(unit)] = unit
+        return self.offsets.get(offset, -1)
+
+    def is_decorated(self, unit: int) -> bool:
+        """Does a unit start with a decorator?"""
+        return self.tok.string(self.starts[unit]) == '@'
+
+
+class NewTokens:
+    """Tokens lexed from the start of the first reparsed unit.
+
+    The tokens extend to the start of an unchanged unit (or to the end of
+    file, if unit is -1).
+    """
+
+    kinds = Undefined(array)
+    starts = Undefined(array)
+    ends = Undefined(array)
+    lines = Undefined(array)
+    tokens = Undefined(List[Token])
+    unit = -1          # Index of the first unchanged unit
+    next_line = 0      # New line number of the first unchanged unit
+    indented = False   # Is the first line indented more than the units?
+
+
+class Reparser:
+    """Reparse the statements of a parse tree that are affected by an edit."""
+
+    tree = Undefined(MypyFile)
+    tokens = Undefined(TokenBuffer)   # Tokens of the old source
+    new_source = ''
+    start = 0          # Offset of the edit
+    changed_end = 0    # Offset after the edit in the new source
+    delta = 0          # Change of the length of the source
+    # Name and indentation of the class whose body is reparsed
+    class_name = None # type: str
+    indent = ''
+    # Import nodes within the reparsed units
+    imports = Undefined(List[Node])
+
+    def __init__(self, tree: MypyFile, tokens: TokenBuffer, fnam: str,
+                 errors: Errors, pyversion: int) -> None:
+        self.tree = tree
+        self.tokens = tokens
+        self.fnam = fnam
+        self.errors = errors
+        self.pyversion = pyversion
+
+    def reparse(self, first_line: int, last_line: int,
+                text: str) -> TokenBuffer:
+        tokens = self.tokens
+        # The parser may have lexed the tokens incrementally.
+        while tokens.lex_more():
+            pass
+        source = tokens.source
+        self.start = line_offset(source, first_line)
+        end = max(self.start, line_offset(source, last_line + 1))
+        self.new_source = source[:self.start] + text + source[end:]
+        self.delta = len(text) - (end - self.start)
+        self.changed_end = self.start + len(text)
+
+        if self.tree.has_parse_errors:
+            # The nodes may not correspond to the statements of the units.
+            return self.parse_all()
+        units = UnitScanner(tokens)
+        units.scan(len(tokens))
+        if not units.starts or self.start < units.offset(0):
+            # The edit is before the first statement (for example, at a byte
+            # order mark).
+            return self.parse_all()
+        lo = self.first_unit(units)
+        if (units.offset(lo) < self.start and
+                tokens.string(units.starts[lo]) == 'class'):
+            result = self.reparse_class_body(units, lo)
+            if result:
+                return result
+        return self.reparse_units(units, lo, self.tree.defs, [])
+
+    def first_unit(self, units: UnitScanner) -> int:
+        """Return the index of the first unit affected by the edit.
+
+        This is the last unit that starts before the edit. If the edit
+        starts at the first line of a unit, the Break token of the previous
+        unit may absorb new blank lines and comments, so the previous unit
+        is affected as well.
+        """
+        lo = len(units.starts) - 1
+        while lo > 0 and units.offset(lo) >= self.start:
+            lo -= 1
+        return lo
+
+    def reparse_class_body(self, units: UnitScanner,
+                           unit: int) -> TokenBuffer:
+        """Reparse statements within the body of a top-level class.
+
+        Return None if the edit is not within the body.
+        """
+        tokens = self.tokens
+        first = units.starts[unit]
+        i, j = node_range(self.tree.defs, tokens.lines[first],
+                          tokens.lines[first] + 1)
+        if j != i + 1 or not isinstance(self.tree.defs[i], TypeDef):
+            return None
+        typedef = cast(TypeDef, self.tree.defs[i])
+        # Find the indented block of the class body.
+        end = len(tokens)
+        if unit + 1 < len(units.starts):
+            end = units.starts[unit + 1]
+        indent = first
+        while indent < end and tokens.kinds[indent] != INDENT:
+            indent += 1
+        if indent == end:
+            return None
+        members = UnitScanner(tokens, 1, indent + 1, 1)
+        members.scan(end)
+        lo = self.first_unit(members)
+        if lo == 0:
+            # The first statement does not start at the beginning of a line.
+            return None
+        self.class_name = typedef.name
+        self.indent = tokens.string(indent)
+        return self.reparse_units(members, lo, typedef.defs.body,
+                                  self.tree.defs[i + 1:])
+
+    def reparse_units(self, units: UnitScanner, lo: int, nodes: List[Node],
+                      following: List[Node]) -> TokenBuffer:
+        """Reparse units from a unit on and update the nodes of the units.
+
+        The following nodes are after the block of the units. Return None if
+        the new tokens leave the block of the units before an unchanged unit.
+        """
+        while True:
+            # Overloaded functions are combined from consecutive decorated
+            # functions, so never start reparsing within them.
+            while lo > 0 and units.is_decorated(lo - 1):
+                lo -= 1
+            if units.level > 0 and lo == 0:
+                return None
+            new = self.lex_units(units, lo)
+            if new is None:
+                return None
+            if new.indented:
+                # The first line became indented, so it continues the
+                # previous unit.
+                lo -= 1
+            else:
+                break
+
+        # Combine the old tokens before and after the units with the new
+        # ones.
+        tokens = self.tokens
+        first = units.starts[lo]
+        region_start = units.offset(lo)
+        new_tokens = TokenBuffer(self.new_source)
+        new_tokens.kinds = tokens.kinds[:first] + new.kinds
+        new_tokens.starts = (tokens.starts[:first] +
+                             shifted(new.starts, region_start))
+        new_tokens.ends = tokens.ends[:first] + shifted(new.ends,
+                                                        region_start)
+        new_tokens.lines = tokens.lines[:first] + new.lines
+        new_tokens.tokens = tokens.tokens[:first] + new.tokens
+        last = len(new_tokens.tokens)
+        line_delta = 0
+        if new.unit >= 0:
+            # Reuse the tokens of the unchanged units.
+            rest = units.starts[new.unit]
+            line_delta = new.next_line - tokens.lines[rest]
+            new_tokens.kinds.extend(tokens.kinds[rest:])
+            new_tokens.starts.extend(shifted(tokens.starts[rest:],
+                                             self.delta))
+            new_tokens.ends.extend(shifted(tokens.ends[rest:], self.delta))
+            new_tokens.lines.extend(shifted(tokens.lines[rest:], line_delta))
+            rest_tokens = tokens.tokens[rest:]
+            if line_delta:
+                for tok in rest_tokens:
+                    if tok:
+                        tok.line += line_delta
+            new_tokens.tokens.extend(rest_tokens)
+            end_line = tokens.lines[rest]
+        else:
+            # The new tokens extend to the end of file.
+            last -= 1
+            end_line = tokens.lines[-1] + 1
+
+        defs = self.parse_units(new_tokens, first, last, units.level)
+        if defs is None:
+            return self.parse_all()
+
+        # Replace the nodes of the reparsed units.
+        first_line = tokens.lines[first]
+        i, j = node_range(self.tree.imports, first_line, end_line)
+        self.tree.imports[i:j] = self.imports
+        i, j = node_range(nodes, first_line, end_line)
+        if line_delta:
+            shift_lines(nodes[j:] + following, line_delta)
+        nodes[i:j] = defs
+        if new.unit < 0:
+            self.tree.repr = noderepr.MypyFileRepr(new_tokens[last])
+        return new_tokens
+
+    def lex_units(self, units: UnitScanner, lo: int) -> NewTokens:
+        """Lex the new source from a unit on until an unchanged unit.
+
+        Return None if the new tokens leave the block of the units before
+        an unchanged unit.
+        """
+        tokens = self.tokens
+        offset = units.offset(lo)
+        line = 1
+        if units.starts[lo] > 0:
+            line = tokens.lines[units.starts[lo]]
+        l = RegexLexer()
+        l.begin(self.new_source[offset:], line)
+        tok = l.tok
+        new_units = UnitScanner(tok, units.level)
+        result = NewTokens()
+        l.lex_more(LEX_CHUNK_SIZE)
+        # The lexer starts at the indentation level 0. The Indent token of
+        # the block of the units is skipped.
+        skip = units.level
+        if skip:
+            if tok.kinds[0] != INDENT or not tok.string(0).startswith(
+                    self.indent):
+                return None
+            if tok.string(0) != self.indent:
+                result.indented = True
+                return result
+        elif tok.kinds[0] == INDENT and lo > 0:
+            result.indented = True
+            return result
+        count = -1
+        n = 0
+        while True:
+            new_units.scan(len(tok))
+            for k in new_units.starts[n:]:
+                unit_offset = offset
+                if k > 0:
+                    unit_offset += tok.ends[k - 1]
+                old_unit = units.find(unit_offset - self.delta)
+                if (unit_offset >= self.changed_end and old_unit >= 0 and
+                        not units.is_decorated(old_unit)):
+                    # The rest of the source is unchanged.
+                    result.unit = old_unit
+                    result.next_line = tok.lines[k]
+                    count = k
+                    break
+            n = len(new_units.starts)
+            if count >= 0 or l.done or new_units.depth < units.level:
+                break
+            l.lex_more(LEX_CHUNK_SIZE)
+        if count < 0:
+            if units.level > 0:
+                return None
+            count = len(tok)
+        result.kinds = tok.kinds[skip:count]
+        result.starts = tok.starts[skip:count]
+        result.ends = tok.ends[skip:count]
+        result.lines = tok.lines[skip:count]
+        result.tokens = tok.tokens[skip:count]
+        return result
+
+    def parse_units(self, tokens: TokenBuffer, first: int,
+                    last: int, level: int) -> List[Node]:
+        """Parse the units between two token indexes.
+
+        Return None if the statements do not end at the last index.
+        """
+        parser = Parser(self.fnam, self.errors, self.pyversion)
+        errors = parser.errors
+        num_errors = errors.num_messages()
+        if level > 0:
+            parser.is_class_body = True
+            errors.push_type(self.class_name)
+        try:
+            defs = parser.parse_part(tokens, first, last)
+        finally:
+            if level > 0:
+                errors.pop_type()
+        if parser.ind != last or errors.num_messages() > num_errors:
+            # Error recovery may depend on the statements around the units,
+            # so parse the whole file (which reports the errors again).
+            del errors.error_info[num_errors:]
+            return None
+        self.imports = parser.imports
+        return defs
+
+    def parse_all(self) -> TokenBuffer:
+        """Parse the whole new source, updating the tree."""
+        parser = Parser(self.fnam, self.errors, self.pyversion)
+        new_tree = parser.parse(self.new_source, lex.lex(self.new_source))
+        self.tree.defs = new_tree.defs
+        self.tree.imports = new_tree.imports
+        self.tree.is_bom = new_tree.is_bom
+        self.tree.has_parse_errors = new_tree.has_parse_errors
+        self.tree.repr = new_tree.repr
+        return parser.tok
+
+
+def line_offset(s: str, line: int) -> int:
+    """Return the offset of the start of a line (len(s) if past the end)."""
+    offset = 0
+    for i in range(line - 1):
+        offset = s.find('\n', offset) + 1
+        if offset == 0:
+            return len(s)
+    return offset
+
+
+def shifted(a: array, delta: int) -> array:
+    """Return an integer array with delta added to the items."""
+    if delta == 0:
+        return a
+    return array('i', [x + delta for x in a])
+
+
+def node_range(nodes: List[Node], first_line: int,
+               end_line: int) -> Tuple[int, int]:
+    """Return the index range of the nodes within a range of lines.
+
+    The nodes must be ordered by line numbers.
+    """
+    i = 0
+    while i < len(nodes) and nodes[i].line < first_line:
+        i += 1
+    j = i
+    while j < len(nodes) and nodes[j].line < end_line:
+        j += 1
+    return i, j
+
+
+# Kinds of values in parse trees (see value_kind)
+OTHER = 0
+SEQUENCE = 1
+CONTEXT = 2
+
+# Cache of value kinds of classes
+value_kinds = {list: SEQUENCE, tuple: SEQUENCE} # type: Dict[type, int]
+
+
+def shift_lines(nodes: List[Node], delta: int) -> None:
+    """Add delta to the line numbers of parse trees and the types in them.
+
+    Representations (and their tokens) are not updated, since they are not
+    used after parsing.
+    """
+    seen = Set[int]()
+    todo = List[Any]([nodes])
+    while todo:
+        o = todo.pop()
+        if value_kinds[type(o)] == SEQUENCE:
+            values = o
+        elif id(o) not in seen:
+            seen.add(id(o))
+            if o.line > 0:
+                o.line += delta
+            values = o.__dict__.values()
+        else:
+            continue
+        for value in values:
+            kind = value_kinds.get(type(value))
+            if kind is None:
+                kind = value_kind(type(value))
+            if kind != OTHER:
+                todo.append(value)
+
+
+def value_kind(cls: type) -> int:
+    """Return the kind of the instances of a class within parse trees."""
+    if issubclass(cls, list) or issubclass(cls, tuple):
+        kind = SEQUENCE
+    elif issubclass(cls, Context):
+        kind = CONTEXT
+    else:
+        kind = OTHER
+    value_kinds[cls] = kind
+    return kind
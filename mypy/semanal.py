@@ -56,7 +56,7 @@ from mypy.nodes import (
     SymbolTableNode, TVAR, UNBOUND_TVAR, ListComprehension, GeneratorExpr,
     FuncExpr, MDEF, FuncBase, Decorator, SetExpr, UndefinedExpr, TypeVarExpr,
     StrExpr, PrintStmt, ConditionalExpr, ARG_POS, ARG_NAMED, MroError,
-    type_aliases
+    type_aliases, SEMANAL_PASS, THIRD_PASS, ClassSymbolTable
 )
 from mypy.visitor import NodeVisitor
 from mypy.traverser import TraverserVisitor
@@ -64,7 +64,7 @@ from mypy.errors import Errors
 from mypy.types import (
     NoneTyp, Callable, Overloaded, Instance, Type, TypeVar, AnyType,
     FunctionLike, UnboundType, TypeList, ErrorType, TypeVarDef,
-    replace_self_type, TupleType
+    replace_self_type, TupleType, interned_instance, interned_type_var
 )
 from mypy.nodes import function_type, implicit_module_attrs
 from mypy.typeanal import TypeAnalyser, TypeAnalyserPass3
@@ -138,9 +138,19 @@ class SemanticAnalyzer(NodeVisitor):
             self.globals['__builtins__'] = SymbolTableNode(
                 MODULE_REF, self.modules['builtins'], self.cur_mod_id)
         
+        self.globals.start_pass(SEMANAL_PASS)
         defs = file_node.defs
         for d in defs:
-            d.accept(self)
+            if not self.globals.is_deferred(d):
+                d.accept(self)
+
+    def visit_deferred(self, file_node: MypyFile, defn: Node) -> None:
+        """Analyze a top-level definition of a module whose analysis was
+        deferred (see mypy.lazy)."""
+        self.globals = file_node.names
+        self.cur_mod_id = file_node.fullname()
+        self.global_decls = [set()]
+        defn.accept(self)
     
     def visit_func_def(self, defn: FuncDef) -> None:
         self.errors.push_function(defn.name())
@@ -430,7 +440,7 @@ class SemanticAnalyzer(NodeVisitor):
     def setup_type_def_analysis(self, defn: TypeDef) -> None:
         """Prepare for the analysis of a class definition."""
         if not defn.info:
-            defn.info = TypeInfo(SymbolTable(), defn)
+            defn.info = TypeInfo(ClassSymbolTable(), defn)
             defn.info._fullname = defn.info.name()
         if self.is_func_scope() or self.type:
             kind = MDEF
@@ -1373,7 +1383,7 @@ class FirstPass(NodeVisitor):
     def visit_type_def(self, d: TypeDef) -> None:
         self.sem.check_no_global(d.name, d)
         d.fullname = self.sem.qualified_name(d.name)
-        info = TypeInfo(SymbolTable(), d)
+        info = TypeInfo(ClassSymbolTable(), d)
         info.set_line(d.line)
         d.info = info
         self.sem.globals[d.name] = SymbolTableNode(GDEF, info,
@@ -1420,7 +1430,15 @@ class ThirdPass(TraverserVisitor[None]):
     
     def visit_file(self, file_node: MypyFile, fnam: str) -> None:
         self.errors.set_file(fnam)
-        file_node.accept(self)
+        file_node.names.start_pass(THIRD_PASS)
+        for d in file_node.defs:
+            if not file_node.names.is_deferred(d):
+                d.accept(self)
+
+    def visit_deferred(self, file_node: MypyFile, defn: Node) -> None:
+        """Analyze a top-level definition of a module whose analysis was
+        deferred (see mypy.lazy)."""
+        defn.accept(self)
         
     def visit_func_def(self, fdef: FuncDef) -> None:
         self.errors.push_function(fdef.name())
@@ -1464,8 +1482,8 @@ def self_type(typ: TypeInfo) -> Instance:
     """
     tv = List[Type]()
     for i in range(len(typ.type_vars)):
-        tv.append(TypeVar(typ.type_vars[i], i + 1))
-    return Instance(typ, tv)
+        tv.append(interned_type_var(typ.type_vars[i], i + 1))
+    return interned_instance(typ, tv)
 
 
 @overload
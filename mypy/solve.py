@@ -4,7 +4,7 @@ from typing import List, Dict
 
 from mypy.types import Type, Void, NoneTyp, AnyType, ErrorType, BasicTypes
 from mypy.constraints import Constraint, SUPERTYPE_OF
-from mypy.join import join_types
+from mypy.join import join_type_list
 from mypy.meet import meet_types
 from mypy.subtypes import is_subtype
 
@@ -29,21 +29,23 @@ def solve_constraints(vars: List[int], constraints: List[Constraint],
     for tvar in vars:
         bottom = None # type: Type
         top = None # type: Type
+        lower_bounds = List[Type]()
         
         # Process each contraint separely, and calculate the lower and upper
         # bounds based on constraints. Note that we assume that the contraint
         # targets do not have contraint references.
         for c in cmap.get(tvar, []):
             if c.op == SUPERTYPE_OF:
-                if bottom is None:
-                    bottom = c.target
-                else:
-                    bottom = join_types(bottom, c.target, basic)
+                lower_bounds.append(c.target)
             else:
                 if top is None:
                     top = c.target
                 else:
                     top = meet_types(top, c.target, basic)
+        if lower_bounds:
+            # Inferring the item type of a large collection literal produces
+            # a lower bound per item; join each distinct bound only once.
+            bottom = join_type_list(lower_bounds, basic)
         
         if top is None:
             if isinstance(bottom, Void):
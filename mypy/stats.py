@@ -0,0 +1,176 @@
+"""Timing and counters of the passes of a build.
+
+A BuildStats object records the wall clock time, the CPU time and the peak
+memory use of the process after each pass over each module, and counters
+such as the number of lines, tokens and nodes of each module. Passes:
+
+  read       find and read the source file
+  parse      lexical analysis and parsing (tokens are lexed while parsing),
+             or loading a cached parse tree (see mypy.parsecache)
+  semanal-1  first pass of semantic analysis (mypy.semanal.FirstPass)
+  semanal-2  main pass of semantic analysis
+  semanal-3  final pass of semantic analysis (mypy.semanal.ThirdPass)
+  typecheck  type checking
+  transform  transformation for runtime type checking
+  icode      icode generation
+  cgen       C code generation (for the whole program)
+
+The peak memory use is that of the whole process (the maximum resident set
+size in kilobytes, or 0 where the resource module is not available), so
+the growth from one pass to the next is the memory used by the pass.
+Passes performed in worker processes (when building with more than one
+job) are not included.
+"""
+
+import json
+import os
+import time
+
+try:
+    import resource
+    has_resource = True
+except ImportError:
+    # Not available on Windows; the peak memory use is reported as 0.
+    has_resource = False
+
+from typing import Dict, List, Tuple, Any
+
+
+PASSES = ['read', 'parse', 'semanal-1', 'semanal-2', 'semanal-3', 'typecheck',
+          'transform', 'icode', 'cgen']
+
+# Module id used for passes over the whole program
+PROGRAM = '<program>'
+
+
+class PassStats:
+    """The cost of a single pass over a module."""
+
+    def __init__(self, wall: float, cpu: float, maxrss: int) -> None:
+        self.wall = wall          # Wall clock time (seconds)
+        self.cpu = cpu            # CPU time (seconds)
+        self.maxrss = maxrss      # Peak memory use after the pass (kB)
+
+
+class BuildStats:
+    """Timing and counters of a build.
+
+    Attributes:
+      passes:    Map from module id to a map from pass name to its cost
+      counters:  Map from module id to a map from counter name to value
+      start_time:
+                 Wall clock time when the build started
+      wall:      Wall clock time of the whole build (after finish)
+    """
+
+    def __init__(self) -> None:
+        self.passes = Dict[str, Dict[str, PassStats]]()
+        self.counters = Dict[str, Dict[str, int]]()
+        self.start_time = time.time()
+        self.wall = 0.0
+
+    def start(self) -> Tuple[float, float]:
+        """Start timing a pass; return the current (wall, cpu) times."""
+        return time.time(), cpu_time()
+
+    def stop(self, module: str, name: str,
+             started: Tuple[float, float]) -> None:
+        """Record the cost of a pass over a module started at the given
+        times (see start)."""
+        wall, cpu = started
+        self.add_pass(module, name, time.time() - wall, cpu_time() - cpu)
+
+    def add_pass(self, module: str, name: str, wall: float,
+                 cpu: float) -> None:
+        passes = self.passes.setdefault(module, {})
+        old = passes.get(name)
+        if old:
+            # The pass was performed in parts.
+            wall += old.wall
+            cpu += old.cpu
+        passes[name] = PassStats(wall, cpu, peak_memory())
+
+    def count(self, module: str, name: str, n: int = 1) -> None:
+        """Add to a counter of a module."""
+        counters = self.counters.setdefault(module, {})
+        counters[name] = counters.get(name, 0) + n
+
+    def finish(self) -> None:
+        """Record the end of the build."""
+        self.wall = time.time() - self.start_time
+
+    def module_time(self, module: str) -> float:
+        """Return the total wall clock time of all passes over a module."""
+        return sum(p.wall for p in self.passes.get(module, {}).values())
+
+    def report(self) -> Dict[str, Any]:
+        """Return the statistics as a JSON-compatible dictionary."""
+        modules = Dict[str, Any]()
+        pass_totals = Dict[str, Dict[str, float]]()
+        counter_totals = Dict[str, int]()
+        for module in sorted(set(self.passes) | set(self.counters)):
+            passes = Dict[str, Any]()
+            for name, p in self.passes.get(module, {}).items():
+                passes[name] = {'wall': p.wall, 'cpu': p.cpu,
+                                'maxrss': p.maxrss}
+                total = pass_totals.setdefault(name, {'wall': 0.0,
+                                                      'cpu': 0.0})
+                total['wall'] += p.wall
+                total['cpu'] += p.cpu
+            counters = self.counters.get(module, {})
+            for name, value in counters.items():
+                counter_totals[name] = counter_totals.get(name, 0) + value
+            modules[module] = {'passes': passes, 'counters': counters}
+        return {'wall': self.wall,
+                'maxrss': peak_memory(),
+                'passes': pass_totals,
+                'counters': counter_totals,
+                'modules': modules}
+
+    def write_json(self, path: str) -> None:
+        f = open(path, 'w')
+        try:
+            json.dump(self.report(), f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+
+    def summary(self, n: int = 10) -> List[str]:
+        """Return a human-readable summary: the totals of all passes and
+        the n slowest modules."""
+        report = self.report()
+        lines = ['Build time {:.3f} s, peak memory {} kB'.format(
+            report['wall'], report['maxrss'])]
+        lines.append('{:<12} {:>10} {:>10}'.format('pass', 'wall (s)',
+                                                   'cpu (s)'))
+        for name in PASSES:
+            if name in report['passes']:
+                total = report['passes'][name]
+                lines.append('{:<12} {:>10.3f} {:>10.3f}'.format(
+                    name, total['wall'], total['cpu']))
+        for name in sorted(report['counters']):
+            lines.append('{}: {}'.format(name, report['counters'][name]))
+        modules = sorted(self.passes, key=lambda m: -self.module_time(m))
+        lines.append('Slowest modules:')
+        lines.append('{:<30} {:>10} {:>8}  {}'.format('module', 'wall (s)',
+                                                     'lines', 'slowest pass'))
+        for module in modules[:n]:
+            passes = self.passes[module]
+            slowest = sorted(passes, key=lambda name: -passes[name].wall)[0]
+            lines.append('{:<30} {:>10.3f} {:>8}  {}'.format(
+                module, self.module_time(module),
+                self.counters.get(module, {}).get('lines', 0), slowest))
+        return lines
+
+
+def cpu_time() -> float:
+    """Return the CPU time (user and system) used by the process."""
+    t = os.times()
+    return t[0] + t[1]
+
+
+def peak_memory() -> int:
+    """Return the maximum resident set size of the process (in kB), or 0 if
+    it is not available."""
+    if not has_resource:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
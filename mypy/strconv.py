@@ -65,10 +65,10 @@ class StrConv(NodeVisitor[str]):
     # Top-level structures
     
     def visit_mypy_file(self, o):
-        # Skip implicit definitions.
+        # Skip implicit definitions (they have no line number).
         defs = o.defs
         while (defs and isinstance(defs[0], mypy.nodes.VarDef) and
-                not defs[0].repr):
+                defs[0].line < 0):
             defs = defs[1:]
         a = [defs]
         if o.is_bom:
@@ -2,19 +2,56 @@ from typing import cast, List, Dict
 
 from mypy.types import (
     Type, AnyType, UnboundType, TypeVisitor, ErrorType, Void, NoneTyp,
-    Instance, TypeVar, Callable, TupleType, Overloaded, ErasedType, TypeList
+    Instance, TypeVar, Callable, TupleType, Overloaded, ErasedType, TypeList,
+    interned_instance, interned_any, interned_type_var, intern_type,
+    is_interned, new_type_cache
 )
 from mypy.nodes import TypeInfo
 from mypy.expandtype import expand_type
 
 
+# Number of is_subtype calls (for build statistics, see mypy.stats)
+num_subtype_checks = 0
+# Number of is_subtype calls answered from subtype_cache
+num_subtype_cache_hits = 0
+
+# Maximum number of entries in subtype_cache (the cache is emptied when it
+# gets full)
+SUBTYPE_CACHE_SIZE = 20000
+
+# Results of is_subtype, keyed by pairs of interned types
+subtype_cache = new_type_cache()
+# Supertypes of classes in terms of the type variables of the classes, keyed
+# by (type info, supertype info) (see supertype_template)
+supertype_templates = new_type_cache()
+
+
 def is_subtype(left: Type, right: Type) -> bool:
     """Is 'left' subtype of 'right'?"""
+    global num_subtype_checks, num_subtype_cache_hits
+    num_subtype_checks += 1
     if (isinstance(right, AnyType) or isinstance(right, UnboundType)
             or isinstance(right, ErasedType)):
         return True
-    else:
+    elif right is None:
+        # The type of a variable whose type has not been inferred.
+        return left.accept(SubtypeVisitor(right))
+    # Structurally equal types are the same interned type, so the result
+    # can be cached by the interned types.
+    left = intern_type(left)
+    right = intern_type(right)
+    if not is_interned(left) or not is_interned(right):
         return left.accept(SubtypeVisitor(right))
+    key = (left, right)
+    result = subtype_cache.get(key)
+    if result is not None:
+        num_subtype_cache_hits += 1
+        return result
+    result = left.accept(SubtypeVisitor(right))
+    if len(subtype_cache) >= SUBTYPE_CACHE_SIZE:
+        subtype_cache.clear()
+    subtype_cache[key] = result
+    return result
 
 
 def is_equivalent(a: Type, b: Type) -> bool:
@@ -171,9 +208,29 @@ def map_instance_to_supertype(instance: Instance,
     
     # Strip type variables away if the supertype has none.
     if not supertype.type_vars:
-        return Instance(supertype, [])
+        return interned_instance(supertype, [])
     
-    return map_instance_to_supertypes(instance, supertype)[0]
+    template = supertype_template(instance.type, supertype)
+    return cast(Instance, expand_type(template, type_var_map(instance.type,
+                                                            instance.args)))
+
+
+def supertype_template(typ: TypeInfo, supertype: TypeInfo) -> Instance:
+    """Map a class to a supertype in terms of the type variables of the class.
+
+    For example, if class C[T] is derived from D[List[T]], the template of C
+    for D is D[List[T`1]]. Mapping an instance of C to D only substitutes the
+    type arguments of the instance in the template.
+    """
+    key = (typ, supertype)
+    template = cast(Instance, supertype_templates.get(key))
+    if template is None:
+        self_type = interned_instance(typ, [interned_type_var(name, i + 1)
+                                            for i, name in
+                                            enumerate(typ.type_vars)])
+        template = map_instance_to_supertypes(self_type, supertype)[0]
+        supertype_templates[key] = template
+    return template
 
 
 def map_instance_to_direct_supertype(instance: Instance,
@@ -188,7 +245,8 @@ def map_instance_to_direct_supertype(instance: Instance,
     # Relationship with the supertype not specified explicitly. Use AnyType
     # type arguments implicitly.
     # TODO Should this be an error instead?
-    return Instance(supertype, [AnyType()] * len(supertype.type_vars))
+    return interned_instance(supertype,
+                             [interned_any()] * len(supertype.type_vars))
 
 
 def type_var_map(typ: TypeInfo, args: List[Type]) -> Dict[int, Type]:
@@ -257,7 +315,8 @@ def map_instance_to_direct_supertypes(instance: Instance,
     else:
         # Relationship with the supertype not specified explicitly. Use dynamic
         # type arguments implicitly.
-        return [Instance(supertype, [AnyType()] * len(supertype.type_vars))]
+        return [interned_instance(supertype,
+                                  [interned_any()] * len(supertype.type_vars))]
 
 
 def is_named_instance(t: Type, fullname: str) -> bool:
@@ -0,0 +1,510 @@
+"""Test cases for build management (mypy.build)."""
+
+import os
+import os.path
+import shutil
+
+import typing
+from typing import List, cast
+
+from mypy import build
+from mypy.build import (
+    strongly_connected_components, find_module, ModuleIndex
+)
+from mypy.errors import CompileError
+from mypy.myunit import Suite, assert_equal, assert_true, run_test
+from mypy.nodes import FuncDef, TypeInfo
+from mypy.stats import BuildStats
+from mypy.test.config import test_temp_dir
+
+
+# Directory for the source files of test programs.
+source_dir = os.path.join(test_temp_dir, 'build-src')
+# Cache directory used by the test cases.
+cache_dir = os.path.join(test_temp_dir, 'build-cache')
+# Directory for library stubs of test programs.
+stub_dir = os.path.join(test_temp_dir, 'stubs')
+
+
+class ImportGraphSuite(Suite):
+    def test_no_dependencies(self):
+        assert_equal(strongly_connected_components({'b': [], 'a': []}),
+                     [['a'], ['b']])
+
+    def test_dependencies_come_first(self):
+        graph = {'a': ['b'], 'b': ['c'], 'c': []}
+        assert_equal(strongly_connected_components(graph),
+                     [['c'], ['b'], ['a']])
+
+    def test_cycle(self):
+        graph = {'a': ['b'], 'b': ['c', 'd'], 'c': ['a'], 'd': []}
+        assert_equal(strongly_connected_components(graph),
+                     [['d'], ['a', 'b', 'c']])
+
+    def test_multiple_cycles(self):
+        graph = {'main': ['a', 'x'],
+                 'a': ['b'], 'b': ['a', 'x'],
+                 'x': ['y'], 'y': ['x', 'z'],
+                 'z': ['z']}
+        assert_equal(strongly_connected_components(graph),
+                     [['z'], ['x', 'y'], ['a', 'b'], ['main']])
+
+    def test_ignore_unknown_dependencies(self):
+        graph = {'a': ['b', 'builtins'], 'b': ['a']}
+        assert_equal(strongly_connected_components(graph), [['a', 'b']])
+
+    def test_order_does_not_depend_on_dependency_order(self):
+        # The search starts from 'a' and would finish its first dependency
+        # first.
+        graph1 = {'a': ['y', 'x'], 'x': [], 'y': []}
+        graph2 = {'a': ['x', 'y'], 'x': [], 'y': []}
+        for graph in graph1, graph2:
+            assert_equal(strongly_connected_components(graph),
+                         [['x'], ['y'], ['a']])
+
+
+class ModuleIndexSuite(Suite):
+    def set_up(self):
+        if os.path.isdir(source_dir):
+            shutil.rmtree(source_dir)
+        self.lib_path = [os.path.join(source_dir, 'a'),
+                         os.path.join(source_dir, 'b'),
+                         os.path.join(source_dir, 'missing')]
+        for path in ['a/m.py', 'a/p/__init__.py', 'a/p/n.py', 'a/p/q/x.py',
+                     'a/r/s.py', 'b/m.py', 'b/q/__init__.py',
+                     'b/r/__init__.py', 'b/r/s.py']:
+            path = os.path.join(source_dir, *path.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+
+    def tear_down(self):
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+    def test_find_module(self):
+        index = ModuleIndex(self.lib_path)
+        for id in ['m', 'p', 'p.n', 'p.q', 'p.q.x', 'q', 'r', 'r.s', 'x',
+                   'p.x', 'm.x']:
+            assert_equal(index.find_module(id),
+                         find_module(id, self.lib_path))
+        assert_equal(index.find_module('p.n'),
+                     os.path.join(source_dir, 'a', 'p', 'n.py'))
+        assert_equal(index.find_module('r.s'),
+                     os.path.join(source_dir, 'b', 'r', 's.py'))
+        assert_equal(index.find_module('p.q.x'), None)
+
+    def test_directories_are_listed_once(self):
+        index = ModuleIndex(self.lib_path)
+        index.find_module('p.n')
+        listings = len(index.listings)
+        os.remove(os.path.join(source_dir, 'a', 'p', 'n.py'))
+        index.find_module('p.n')
+        index.find_module('p')
+        assert_equal(len(index.listings), listings)
+        assert_equal(index.find_module('p.n'),
+                     os.path.join(source_dir, 'a', 'p', 'n.py'))
+
+
+class BuildTestSuite(Suite):
+    """Base class for test cases that build programs from source files.
+
+    The source files are written to a temporary directory that is created
+    for each test case. The cache directory is removed before and after
+    each test case.
+    """
+
+    # Directory for the source files
+    directory = source_dir
+
+    def set_up(self):
+        for dir in self.directory, cache_dir:
+            if os.path.isdir(dir):
+                shutil.rmtree(dir)
+        os.mkdir(self.directory)
+
+    def tear_down(self):
+        for dir in self.directory, cache_dir:
+            shutil.rmtree(dir, ignore_errors=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def write_file(self, name: str, text: str) -> None:
+        f = open(self.path(name), 'w')
+        f.write(text)
+        f.close()
+
+
+class ParallelBuildSuite(BuildTestSuite):
+    def test_type_check_program(self):
+        self.write_file('m.py', 'import n\n'
+                                'def f(x: int) -> n.A: pass\n')
+        self.write_file('n.py', 'import m\n'
+                                'class A:\n'
+                                '    def g(self) -> str: return m.f(1).h()\n'
+                                '    def h(self) -> str: pass\n')
+        program = 'import m\nm.f(1).g() + 1\n'
+        expected = ['main, line 2: Unsupported left operand type for + '
+                    '("str")']
+        assert_equal(self.run_build(program, 1), expected)
+        assert_equal(self.run_build(program, 2), expected)
+
+    def test_parse_error(self):
+        self.write_file('m.py', 'import n\n')
+        self.write_file('n.py', 'x = (\n')
+        expected = ['In module imported in m, line 1,',
+                    '                   in main, line 1:',
+                    'n, line 2: Parse error before end of line']
+        assert_equal(self.run_build('import m\n', 1), expected)
+        assert_equal(self.run_build('import m\n', 2), expected)
+
+    def test_inferred_types_from_workers(self):
+        self.write_file('a.py', 'x = 1\n'
+                                'class A:\n'
+                                '    def __init__(self) -> None:\n'
+                                '        self.y = ""\n')
+        self.write_file('b.py', 'import a\nz = a.x\n')
+        self.write_file('c.py', 'import a\nw = a.A().y\n')
+        program = 'import b, c\nb.z = c.w\n'
+        expected = ['main, line 2: Incompatible types in assignment']
+        assert_equal(self.run_build(program, 1), expected)
+        assert_equal(self.run_build(program, 2), expected)
+
+    def test_inferred_types_from_earlier_waves(self):
+        self.write_file('a.py', 'x = 1\n')
+        self.write_file('b.py', 'y = ""\n')
+        self.write_file('c.py', 'import a, b\nz = a.x\n')
+        self.write_file('d.py', 'import a, b\nw = b.y\n')
+        self.write_file('e.py', 'import c, d\nv = c.z\n')
+        self.write_file('f.py', 'import c, d\nu = d.w\n')
+        program = 'import e, f\ne.v = f.u\n'
+        expected = ['main, line 2: Incompatible types in assignment']
+        assert_equal(self.run_build(program, 1), expected)
+        assert_equal(self.run_build(program, 2), expected)
+
+    def test_errors_in_independent_modules(self):
+        self.write_file('b.py', 'x = 1\nx = ""\n')
+        self.write_file('c.py', 'y = ""\ny = 1\n')
+        assert_equal(self.run_build('import b, c\n', 2),
+                     ['In module imported in main, line 1:',
+                      'b, line 2: Incompatible types in assignment',
+                      'c, line 2: Incompatible types in assignment'])
+
+    def run_build(self, program: str, jobs: int) -> List[str]:
+        """Type check a program using the given number of processes.
+
+        Return the error messages (with paths relative to the source
+        directory).
+        """
+        try:
+            build.build('main',
+                        target=build.TYPE_CHECK,
+                        program_text=program,
+                        flags=[build.TEST_BUILTINS],
+                        alt_lib_path=source_dir,
+                        jobs=jobs)
+        except CompileError as e:
+            return [m.replace(source_dir + os.sep, '').replace('.py', '')
+                    for m in e.messages if 'At top level' not in m and
+                                           'In member' not in m and
+                                           'In function' not in m]
+        return []
+
+
+class AllErrorsSuite(BuildTestSuite):
+    def test_errors_in_several_modules(self):
+        self.write_file('a.py', 'import b\nx = 1\nx = ""\n')
+        self.write_file('b.py', 'y = ""\ny = 1\n')
+        for jobs in 1, 2:
+            assert_equal(self.run_build('import a\nz = 1\nz = ""\n', jobs),
+                         ['In module imported in a, line 1,',
+                          '                   in main, line 1:',
+                          'b, line 2: Incompatible types in assignment',
+                          'In module imported in main, line 1:',
+                          'a, line 3: Incompatible types in assignment',
+                          'main, line 3: Incompatible types in assignment'])
+
+    def test_dependents_of_failed_module_are_skipped(self):
+        self.write_file('a.py', 'import b\nb.undefined\n')
+        self.write_file('b.py', 'x = (\n')
+        self.write_file('c.py', 'y = ""\ny = 1\n')
+        for jobs in 1, 2:
+            assert_equal(self.run_build('import a, c\n', jobs),
+                         ['In module imported in a, line 1,',
+                          '                   in main, line 1:',
+                          'b, line 2: Parse error before end of line',
+                          'In module imported in main, line 1:',
+                          'c, line 2: Incompatible types in assignment'])
+
+    def test_semantic_analysis_error(self):
+        self.write_file('a.py', 'undefined\n')
+        self.write_file('b.py', 'import a\ny = ""\ny = 1\n')
+        self.write_file('c.py', 'y = ""\ny = 1\n')
+        assert_equal(self.run_build('import b, c\n', 1),
+                     ['In module imported in b, line 1,',
+                      '                   in main, line 1:',
+                      "a, line 1: Name 'undefined' is not defined",
+                      'In module imported in main, line 1:',
+                      'c, line 2: Incompatible types in assignment'])
+
+    def test_missing_module(self):
+        self.write_file('a.py', 'import missing\n')
+        self.write_file('c.py', 'y = ""\ny = 1\n')
+        assert_equal(self.run_build('import a, c\n', 1),
+                     ['In module imported in main, line 1:',
+                      "a, line 1: No module named 'missing'",
+                      'c, line 2: Incompatible types in assignment'])
+
+    def run_build(self, program: str, jobs: int) -> List[str]:
+        """Type check a program, reporting all errors.
+
+        Return the error messages (with paths relative to the source
+        directory).
+        """
+        try:
+            build.build('main',
+                        target=build.TYPE_CHECK,
+                        program_text=program,
+                        flags=[build.TEST_BUILTINS, build.ALL_ERRORS],
+                        alt_lib_path=source_dir,
+                        jobs=jobs)
+        except CompileError as e:
+            return [m.replace(source_dir + os.sep, '').replace('.py', '')
+                    for m in e.messages if 'At top level' not in m]
+        return []
+
+
+class MemoryLeanSuite(BuildTestSuite):
+    def test_trees_are_released(self):
+        self.write_file('a.py', 'class A:\n'
+                                '    def f(self, x: int) -> int:\n'
+                                '        return x\n'
+                                'def g() -> A:\n'
+                                '    return A()\n')
+        for jobs in 1, 2:
+            result = self.run_build('import a\na.g().f(1)\n', jobs)
+            tree = result.files['a']
+            assert_equal(tree.defs, [])
+            info = cast(TypeInfo, tree.names['A'].node)
+            method = cast(FuncDef, info.names['f'].node)
+            assert_equal(method.body.body, [])
+            assert_true(method.repr is None)
+            assert_equal(str(method.type),
+                         'def (self: a.A, x: builtins.int) -> builtins.int')
+            assert_equal(result.types, {})
+
+    def test_check_against_released_module(self):
+        self.write_file('a.py', 'import b\n'
+                                'def f(x: int) -> b.B:\n'
+                                '    return b.B()\n')
+        self.write_file('b.py', 'class B:\n'
+                                '    def g(self) -> str:\n'
+                                '        return ""\n')
+        self.write_file('c.py', 'import a\n'
+                                'y = a.f(1).g()\n')
+        try:
+            self.run_build('import a, c\nx = a.f("")\ny = c.y + 1\n', 1)
+        except CompileError as e:
+            assert_equal(e.messages[-2:],
+                         ['main, line 2: Argument 1 to "f" has incompatible '
+                          'type "str"',
+                          'main, line 3: Unsupported left operand type for + '
+                          '("str")'])
+        else:
+            raise AssertionError('no error reported')
+
+    def test_cache(self):
+        self.write_file('a.py', 'def f(x: int) -> int:\n'
+                                '    return x\n')
+        self.run_build('import a\na.f(1)\n', 1, cache_dir)
+        self.write_file('a.py', 'def f(x: str) -> int:\n'
+                                '    return 1\n')
+        try:
+            self.run_build('import a\na.f(1)\n', 1, cache_dir)
+        except CompileError as e:
+            assert_equal(e.messages[-1], 'main, line 2: Argument 1 to "f" '
+                                         'has incompatible type "int"')
+        else:
+            raise AssertionError('no error reported')
+
+    def run_build(self, program: str, jobs: int,
+                  cache_dir: str = None) -> build.BuildResult:
+        return build.build('main',
+                           target=build.TYPE_CHECK,
+                           program_text=program,
+                           flags=[build.TEST_BUILTINS, build.MEMORY_LEAN],
+                           alt_lib_path=source_dir,
+                           jobs=jobs,
+                           cache_dir=cache_dir)
+
+
+class BatchBuildSuite(BuildTestSuite):
+    def set_up(self):
+        super().set_up()
+        self.write_file('a.py', 'import u\n'
+                                'u.f(1)\n')
+        self.write_file('b.py', 'import u\n'
+                                'x = u.f(1) + 1\n')
+        self.write_file('c.py', 'x = 1\n')
+        self.write_file('u.py', 'def f(x: int) -> str:\n'
+                                '    return ""\n')
+
+    def test_programs(self):
+        stats = BuildStats()
+        result = self.run_build(['a.py', 'b.py', 'c.py'], stats=stats)
+        assert_equal([p.module for p in result.programs],
+                     ['__main__#1', '__main__#2', '__main__#3'])
+        assert_equal([p.messages for p in result.programs],
+                     [[], [self.path('b.py') + ', line 2: Unsupported left '
+                           'operand type for + ("str")'], []])
+        # The shared module is parsed once.
+        assert_equal(set(result.files),
+                     set(['__main__#1', '__main__#2', '__main__#3', 'u',
+                          'builtins']))
+        assert_equal(stats.counters['u']['lines'], 2)
+
+    def test_errors_in_shared_module(self):
+        self.write_file('u.py', 'def f(x: int) -> str:\n'
+                                '    return 1\n')
+        result = self.run_build(['a.py', 'b.py', 'c.py'])
+        error = self.path('u.py') + ', line 2: Incompatible return value type'
+        assert_equal(result.programs[0].messages[-1], error)
+        assert_true(error in result.programs[1].messages)
+        assert_equal(result.programs[2].messages, [])
+
+    def test_parse_error_in_program(self):
+        self.write_file('a.py', 'import u\n'
+                                'u.f(\n')
+        result = self.run_build(['a.py', 'c.py'])
+        assert_equal(len(result.programs[0].messages), 1)
+        assert_equal(result.programs[1].messages, [])
+
+    def test_modules(self):
+        result = self.run_build(['a.py'], ['u', 'c'])
+        assert_equal([p.module for p in result.programs],
+                     ['__main__#1', 'u', 'c'])
+        assert_equal([p.path for p in result.programs],
+                     [self.path('a.py'), self.path('u.py'),
+                      self.path('c.py')])
+
+    def test_errors_are_not_cached(self):
+        self.write_file('dep.py', 'x = 1\n')
+        self.write_file('lib.py', 'import dep\n'
+                                  'def f() -> int:\n'
+                                  '    return "x"\n')
+        self.write_file('main.py', 'import lib\nlib.f()\n')
+        error = (self.path('lib.py') +
+                 ', line 3: Incompatible return value type')
+        result = self.run_build(['main.py'], cache_dir=cache_dir)
+        assert_true(error in result.programs[0].messages)
+        self.write_file('dep.py', 'x = 2\n')
+        result = self.run_build(['main.py'], cache_dir=cache_dir)
+        assert_true(error in result.programs[0].messages)
+        try:
+            build.build(self.path('main.py'),
+                        target=build.TYPE_CHECK,
+                        flags=[build.TEST_BUILTINS],
+                        alt_lib_path=source_dir,
+                        cache_dir=cache_dir)
+        except CompileError as e:
+            assert_true(error in e.messages)
+        else:
+            raise AssertionError('no error reported')
+
+    def run_build(self, programs: List[str], modules: List[str] = None,
+                  stats: BuildStats = None,
+                  cache_dir: str = None) -> build.BatchResult:
+        return build.build_batch([self.path(p) for p in programs],
+                                 target=build.TYPE_CHECK,
+                                 modules=modules,
+                                 flags=[build.TEST_BUILTINS],
+                                 alt_lib_path=source_dir,
+                                 cache_dir=cache_dir,
+                                 stats=stats)
+
+
+class LazyStubSuite(BuildTestSuite):
+    """Test on-demand analysis of the definitions of library stubs."""
+
+    directory = stub_dir
+
+    def set_up(self):
+        super().set_up()
+        self.write_file('s.py', 'import t\n'
+                                'x = 1\n'
+                                'def f(x: int) -> t.A: pass\n'
+                                'def g(x: Missing) -> None: pass\n'
+                                'class B(t.A):\n'
+                                '    def h(self) -> int: pass\n')
+        self.write_file('t.py', 'class A:\n'
+                                '    def m(self) -> str: pass\n'
+                                'class C: pass\n')
+
+    def test_unused_definitions_are_not_analyzed(self):
+        stats = BuildStats()
+        self.run_build('import s\ns.f(1).m()\n', stats)
+        # The definitions include the implicit module attributes.
+        for id, deferred, loaded in ('s', 7, 1), ('t', 5, 1):
+            assert_equal(stats.counters[id]['deferred definitions'],
+                         deferred)
+            assert_equal(stats.counters[id]['loaded definitions'], loaded)
+
+    def test_parallel_build(self):
+        self.write_file('u.py', 'y = 1\n')
+        stats = BuildStats()
+        self.run_build('import s, u\ns.f(1).m()\n', stats, jobs=2)
+        for id, deferred, loaded in ('s', 7, 1), ('t', 5, 1):
+            assert_equal(stats.counters[id]['deferred definitions'],
+                         deferred)
+            assert_equal(stats.counters[id]['loaded definitions'], loaded)
+
+    def test_use_definitions(self):
+        self.assert_error('import s\ns.f(1).m() + 1\n',
+                          'main, line 2: Unsupported left operand type for '
+                          '+ ("str")')
+        self.assert_error('import s\ns.x + ""\n',
+                          'main, line 2: Unsupported left operand type for '
+                          '+ ("int")')
+        self.assert_error('from s import B\nx = B().m() # type: int\n',
+                          'main, line 2: Incompatible types in assignment')
+
+    def test_errors_in_used_definitions(self):
+        self.assert_error('import s\ns.g(1)\n',
+                          'tmp/stubs/s.py, line 4: Name \'Missing\' is not '
+                          'defined')
+
+    def test_all_errors(self):
+        self.assert_error('import s\n',
+                          'tmp/stubs/s.py, line 4: Name \'Missing\' is not '
+                          'defined', [build.ALL_ERRORS])
+
+    def run_build(self, program: str, stats: BuildStats = None,
+                  flags: List[str] = None,
+                  jobs: int = 1) -> build.BuildResult:
+        return build.build('main',
+                           target=build.TYPE_CHECK,
+                           program_text=program,
+                           flags=[build.TEST_BUILTINS] + (flags or []),
+                           alt_lib_path=stub_dir,
+                           stats=stats,
+                           jobs=jobs)
+
+    def assert_error(self, program: str, message: str,
+                     flags: List[str] = None) -> None:
+        try:
+            self.run_build(program, flags=flags)
+        except CompileError as e:
+            assert_equal(e.messages[-1], message)
+        else:
+            raise AssertionError('no error reported')
+
+
+if __name__ == '__main__':
+    import sys
+    run_test(ImportGraphSuite(), sys.argv[1:])
+    run_test(ModuleIndexSuite(), sys.argv[1:])
+    run_test(ParallelBuildSuite(), sys.argv[1:])
+    run_test(AllErrorsSuite(), sys.argv[1:])
+    run_test(MemoryLeanSuite(), sys.argv[1:])
+    run_test(BatchBuildSuite(), sys.argv[1:])
+    run_test(LazyStubSuite(), sys.argv[1:])
@@ -0,0 +1,501 @@
+"""Test cases for the persistent cache of analyzed modules."""
+
+import multiprocessing
+import os
+import os.path
+import shutil
+
+import typing
+from typing import List, Tuple, cast
+
+from mypy import build
+from mypy.cache import BuildCache, MemoryCache
+from mypy.parsecache import ParseCache, dumps, loads
+from mypy.parse import parse
+from mypy.depends import function_units
+from mypy.myunit import Suite, assert_equal, assert_true, run_test
+from mypy.test.config import test_temp_dir
+from mypy.errors import CompileError
+from mypy.nodes import ReturnStmt, TypeDef, LazySymbolTable
+from mypy.stats import BuildStats
+
+
+# Directory for the source files of test programs.
+source_dir = os.path.join(test_temp_dir, 'cache-src')
+# Cache directory used by the test cases.
+cache_dir = os.path.join(test_temp_dir, 'cache-data')
+# Mypy data directory with library stubs, for building snapshots.
+data_dir = os.path.join(test_temp_dir, 'snapshot-data')
+stub_dir = os.path.join(data_dir, 'stubs', '3.2')
+
+
+class BuildCacheSuite(Suite):
+    def set_up(self):
+        for dir in source_dir, cache_dir:
+            if os.path.isdir(dir):
+                shutil.rmtree(dir)
+        os.mkdir(source_dir)
+
+    def tear_down(self):
+        for dir in source_dir, cache_dir:
+            shutil.rmtree(dir, ignore_errors=True)
+
+    def test_unchanged_modules_are_fresh(self):
+        self.write_file('m.py', 'import n\nclass A: pass\n')
+        self.write_file('n.py', 'x = 1\n')
+        self.build('import m\nm.A()\n')
+        cache = self.new_cache()
+        assert_true(cache.is_fresh('m', *self.read_source('m')))
+        assert_true(cache.is_fresh('n', *self.read_source('n')))
+
+    def test_change_invalidates_importers(self):
+        self.write_file('m.py', 'import n\nclass A: pass\n')
+        self.write_file('n.py', 'x = 1\n')
+        self.write_file('o.py', 'y = 1\n')
+        self.build('import m, o\nm.A()\n')
+        self.write_file('n.py', 'x = 2\n')
+        cache = self.new_cache()
+        assert_true(not cache.is_fresh('m', *self.read_source('m')))
+        assert_true(not cache.is_fresh('n', *self.read_source('n')))
+        assert_true(cache.is_fresh('o', *self.read_source('o')))
+
+    def test_check_against_cached_module(self):
+        self.write_file('m.py', 'class A:\n'
+                                '    def f(self, x: int) -> None: pass\n')
+        self.build('import m\nm.A().f(1)\n')
+        assert_equal(self.build('import m\nm.A().f("x")\n'),
+                     ['main, line 2: Argument 1 to "f" of "A" has '
+                      'incompatible type "str"'])
+
+    def test_check_against_changed_module(self):
+        self.write_file('m.py', 'class A:\n'
+                                '    def f(self, x: int) -> None: pass\n')
+        self.write_file('n.py', 'import m\nclass B(m.A): pass\n')
+        self.build('import n\nn.B().f(1)\n')
+        self.write_file('m.py', 'class A:\n'
+                                '    def f(self, x: str) -> None: pass\n')
+        assert_equal(self.build('import n\nn.B().f(1)\n'),
+                     ['main, line 2: Argument 1 to "f" of "A" has '
+                      'incompatible type "int"'])
+
+    def test_import_cycle(self):
+        self.write_file('a.py', 'import b\n'
+                                'class A:\n'
+                                '    def f(self) -> "b.B": pass\n')
+        self.write_file('b.py', 'import a\n'
+                                'class B:\n'
+                                '    def g(self) -> a.A: pass\n')
+        self.build('import a\na.A().f().g()\n')
+        assert_equal(self.build('import b\nb.B().g().f().h()\n'),
+                     ['main, line 2: "B" has no attribute "h"'])
+
+    def test_package(self):
+        os.mkdir(os.path.join(source_dir, 'p'))
+        self.write_file(os.path.join('p', '__init__.py'), 'x = 1\n')
+        self.write_file(os.path.join('p', 'm.py'), 'y = ""\n')
+        self.build('import p.m\np.x = 2\n')
+        assert_equal(self.build('import p.m\np.m.y = p.x\n'),
+                     ['main, line 2: Incompatible types in assignment'])
+
+    def build(self, program: str) -> List[str]:
+        """Type check a program using the cache.
+
+        Return the error messages (with paths relative to the source
+        directory).
+        """
+        try:
+            build.build('main',
+                        target=build.TYPE_CHECK,
+                        program_text=program,
+                        flags=[build.TEST_BUILTINS],
+                        alt_lib_path=source_dir,
+                        cache_dir=cache_dir)
+        except CompileError as e:
+            return [m.replace(source_dir + os.sep, '')
+                    for m in e.messages if 'At top level' not in m]
+        return []
+
+    def new_cache(self) -> BuildCache:
+        return BuildCache(cache_dir, 3, build.TYPE_CHECK, self.read_source)
+
+    def read_source(self, id: str) -> Tuple[str, str]:
+        lib_path = [source_dir, os.path.join('mypy', 'test', 'data',
+                                             'lib-stub')]
+        return build.read_source_file(build.find_module(id, lib_path))
+
+    def write_file(self, name: str, text: str) -> None:
+        write_file(name, text)
+
+
+class FunctionDependencySuite(Suite):
+    """Test skipping unchanged function bodies (see mypy.depends).
+
+    A function body was type checked if the expressions in it have types in
+    the type map of the build.
+    """
+
+    def set_up(self):
+        for dir in source_dir, cache_dir:
+            if os.path.isdir(dir):
+                shutil.rmtree(dir)
+        os.mkdir(source_dir)
+
+    def tear_down(self):
+        for dir in source_dir, cache_dir:
+            shutil.rmtree(dir, ignore_errors=True)
+
+    def test_body_change_in_dependency(self):
+        write_file('m.py', 'import n\n'
+                           'def f() -> int:\n'
+                           '    return n.g()\n'
+                           'def h() -> str:\n'
+                           '    return n.k()\n')
+        write_file('n.py', 'def g() -> int:\n'
+                           '    return 1\n'
+                           'def k() -> str:\n'
+                           '    return ""\n')
+        self.run_build()
+        write_file('n.py', 'def g() -> int:\n'
+                           '    return 2\n'
+                           'def k() -> str:\n'
+                           '    return ""\n')
+        result = self.run_build()
+        assert_equal(self.checked_functions(result, 'm'), [])
+        assert_equal(self.checked_functions(result, 'n'), ['g'])
+
+    def test_signature_change_in_dependency(self):
+        write_file('m.py', 'import n\n'
+                           'def f() -> object:\n'
+                           '    return n.g()\n'
+                           'def h() -> str:\n'
+                           '    return n.k()\n')
+        write_file('n.py', 'def g() -> int:\n'
+                           '    return 1\n'
+                           'def k() -> str:\n'
+                           '    return ""\n')
+        self.run_build()
+        write_file('n.py', 'def g() -> str:\n'
+                           '    return ""\n'
+                           'def k() -> str:\n'
+                           '    return ""\n')
+        result = self.run_build()
+        assert_equal(self.checked_functions(result, 'm'), ['f'])
+
+    def test_moved_function(self):
+        write_file('m.py', 'def f() -> int:\n'
+                           '    return 1\n'
+                           'class A:\n'
+                           '    def g(self) -> int:\n'
+                           '        return 1\n')
+        self.run_build()
+        write_file('m.py', '\n\n'
+                           'def h() -> int:\n'
+                           '    return 1\n'
+                           'def f() -> int:\n'
+                           '    return 1\n'
+                           'class A:\n'
+                           '    def g(self) -> int:\n'
+                           '        return 2\n')
+        result = self.run_build()
+        assert_equal(self.checked_functions(result, 'm'), ['h', 'A.g'])
+
+    def test_indirect_interface_change(self):
+        write_file('m.py', 'import n\n'
+                           'def f() -> int:\n'
+                           '    return n.get().x\n')
+        write_file('n.py', 'import o\n'
+                           'def get() -> o.A:\n'
+                           '    return o.A()\n')
+        write_file('o.py', 'class A:\n'
+                           '    x = 1\n')
+        self.run_build()
+        write_file('o.py', 'class A:\n'
+                           '    x = ""\n')
+        try:
+            self.run_build()
+        except CompileError as e:
+            assert_equal(e.messages[-1],
+                         os.path.join(source_dir, 'm.py') +
+                         ', line 3: Incompatible return value type')
+        else:
+            raise AssertionError('no error reported')
+
+    def checked_functions(self, result: build.BuildResult,
+                          id: str) -> List[str]:
+        """Return the names of the functions of a module whose bodies were
+        type checked."""
+        checked = List[str]()
+        for name, func in function_units(result.files[id]):
+            ret = cast(ReturnStmt, func.body.body[0])
+            if ret.expr in result.types:
+                checked.append(name)
+        return checked
+
+    def run_build(self) -> build.BuildResult:
+        return build.build('main',
+                           target=build.TYPE_CHECK,
+                           program_text='import m\n',
+                           flags=[build.TEST_BUILTINS],
+                           alt_lib_path=source_dir,
+                           cache_dir=cache_dir)
+
+
+class MemoryCacheSuite(Suite):
+    def set_up(self):
+        if os.path.isdir(source_dir):
+            shutil.rmtree(source_dir)
+        os.mkdir(source_dir)
+        self.cache = MemoryCache()
+
+    def tear_down(self):
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+    def test_reuse_unchanged_modules(self):
+        write_file('m.py', 'import n\nclass A: pass\n')
+        write_file('n.py', 'x = 1\n')
+        first = self.run_build('import m\nm.A()\n')
+        write_file('n.py', 'x = 2\n')
+        second = self.run_build('import m\nm.A()\n')
+        third = self.run_build('import m\nm.A()\n')
+        assert_true(second.files['builtins'] is first.files['builtins'])
+        assert_true(second.files['m'] is not first.files['m'])
+        assert_true(second.files['n'] is not first.files['n'])
+        assert_true(third.files['m'] is second.files['m'])
+        assert_true(third.files['n'] is second.files['n'])
+
+    def test_check_against_changed_module(self):
+        write_file('m.py', 'class A:\n'
+                           '    def f(self, x: int) -> None: pass\n')
+        self.run_build('import m\nm.A().f(1)\n')
+        write_file('m.py', 'class A:\n'
+                           '    def f(self, x: str) -> None: pass\n')
+        try:
+            self.run_build('import m\nm.A().f(1)\n')
+        except CompileError as e:
+            assert_equal(e.messages[-1], 'main, line 2: Argument 1 to "f" '
+                                         'of "A" has incompatible type "int"')
+        else:
+            raise AssertionError('no error reported')
+        self.run_build('import m\nm.A().f("x")\n')
+
+    def test_deferred_definitions_are_loaded(self):
+        os.mkdir(os.path.join(source_dir, 'stubs'))
+        write_file(os.path.join('stubs', '__init__.py'), '')
+        write_file(os.path.join('stubs', 's.py'), 'def f() -> int: pass\n'
+                                                  'def g() -> str: pass\n')
+        result = self.run_build('import stubs.s\nstubs.s.f()\n')
+        # The cached tree must not depend on the loader of the first build.
+        names = cast(LazySymbolTable, result.files['stubs.s'].names)
+        assert_equal(names.pending, {})
+        try:
+            self.run_build('import stubs.s\nstubs.s.g() + 1\n')
+        except CompileError as e:
+            assert_equal(e.messages[-1], 'main, line 2: Unsupported left '
+                                         'operand type for + ("str")')
+        else:
+            raise AssertionError('no error reported')
+
+    def test_not_used_with_later_targets(self):
+        shutil.copy(os.path.join('mypy', 'test', 'data', 'fixtures',
+                                 'transform.py'),
+                    os.path.join(source_dir, 'builtins.py'))
+        write_file('m.py', 'x = 1\n')
+        build.build('main',
+                    target=build.TRANSFORM,
+                    program_text='import m\n',
+                    flags=[build.TEST_BUILTINS],
+                    alt_lib_path=source_dir,
+                    cache=self.cache)
+        assert_equal(self.cache.trees, {})
+
+    def run_build(self, program: str) -> build.BuildResult:
+        return build.build('main',
+                           target=build.TYPE_CHECK,
+                           program_text=program,
+                           flags=[build.TEST_BUILTINS],
+                           alt_lib_path=source_dir,
+                           cache=self.cache)
+
+
+class SnapshotSuite(Suite):
+    """Test snapshots of analyzed library modules.
+
+    The test builds use the stubs of the test builtins as the library stubs.
+    """
+
+    def set_up(self):
+        for dir in data_dir, cache_dir:
+            if os.path.isdir(dir):
+                shutil.rmtree(dir)
+        shutil.copytree(os.path.join('mypy', 'test', 'data', 'lib-stub'),
+                        stub_dir)
+        write_stub('m.py', 'import n\n'
+                           'def f(x: int) -> n.A: pass\n')
+        write_stub('n.py', 'class A: pass\n')
+        build.build_snapshot(os.path.join(data_dir, 'scripts'))
+
+    def tear_down(self):
+        for dir in data_dir, cache_dir:
+            shutil.rmtree(dir, ignore_errors=True)
+
+    def test_load_library_modules(self):
+        assert_equal(self.build('import m\nm.f(1)\n'),
+                     ['builtins', 'm', 'n'])
+        try:
+            self.build('import m\nm.f("x")\n')
+        except CompileError as e:
+            assert_equal(e.messages[-1], 'main, line 2: Argument 1 to "f" '
+                                         'has incompatible type "str"')
+        else:
+            raise AssertionError('no error reported')
+
+    def test_changed_library_module(self):
+        write_stub('n.py', 'class A:\n'
+                           '    x = 1\n')
+        assert_equal(self.build('import m\nm.f(1).x\n'), ['builtins'])
+
+    def test_snapshot_with_cache_directory(self):
+        self.build('import m\nm.f(1)\n', cache_dir)
+        assert_equal(self.build('import m\nm.f(1)\n', cache_dir),
+                     ['__main__', 'builtins', 'm', 'n'])
+
+    def build(self, program: str, cache_dir: str = None) -> List[str]:
+        """Type check a program using the snapshot.
+
+        Return the ids of the modules loaded from the snapshot or the cache.
+        """
+        stats = BuildStats()
+        build.build('main',
+                    target=build.TYPE_CHECK,
+                    program_text=program,
+                    bin_dir=os.path.join(data_dir, 'scripts'),
+                    cache_dir=cache_dir,
+                    stats=stats,
+                    use_snapshot=True)
+        return sorted(id for id, counters in stats.counters.items()
+                      if 'cached' in counters)
+
+
+class ParseCacheSuite(Suite):
+    def set_up(self):
+        for dir in source_dir, cache_dir:
+            if os.path.isdir(dir):
+                shutil.rmtree(dir)
+        os.mkdir(source_dir)
+
+    def tear_down(self):
+        for dir in source_dir, cache_dir:
+            shutil.rmtree(dir, ignore_errors=True)
+
+    def test_encode_and_decode_tree(self):
+        source = ('import os\n'
+                  'from sys import path as p\n'
+                  'class A(B[int]):\n'
+                  '    def f(self, x: int = 2, *y: "str") -> None:\n'
+                  '        return x.y[1:], (1, 2.5, b"x", None)\n')
+        tree = parse(source, keep_repr=False)
+        loaded = loads(dumps(tree))
+        assert_equal(str(loaded), str(tree))
+        # Import nodes are shared between the definitions and the imports.
+        assert_true(loaded.imports[0] is loaded.defs[0])
+        assert_true(loaded.imports[1] is loaded.defs[1])
+        # Types keep their representations.
+        typedef = cast(TypeDef, loaded.defs[2])
+        assert_equal(typedef.base_types[0].repr.components[0].string, 'B')
+
+    def test_unchanged_importer_uses_cached_tree(self):
+        write_file('m.py', 'import n\nclass A(n.B): pass\n')
+        write_file('n.py', 'class B: pass\n')
+        self.build('import m\nm.A()\n')
+        write_file('n.py', 'class B:\n    x = 1\n')
+        stats = self.build('import m\nm.A().x\n')
+        assert_equal(stats.counters['m'].get('cached trees'), 1)
+        assert_true('cached trees' not in stats.counters['n'])
+
+    def test_tree_with_parse_errors_is_not_cached(self):
+        write_file('m.py', 'x = (\n')
+        try:
+            self.build('import m\n')
+        except CompileError as e:
+            assert_equal(e.messages[-1], 'm.py, line 2: Parse error before '
+                                         'end of line')
+        else:
+            raise AssertionError('no error reported')
+        cache = ParseCache(cache_dir, 3)
+        assert_true(not cache.contains('x = (\n'))
+
+    def test_invalid_cached_tree_is_ignored(self):
+        cache = ParseCache(cache_dir, 3)
+        cache.store('x = 1\n', parse('x = 1\n', keep_repr=False))
+        f = open(cache.tree_path('x = 1\n'), 'wb')
+        f.write(b'invalid')
+        f.close()
+        assert_true(cache.contains('x = 1\n'))
+        assert_equal(cache.load('x = 1\n'), None)
+
+    def test_concurrent_stores(self):
+        pool = multiprocessing.Pool(4)
+        try:
+            pool.map(store_empty_tree, range(8))
+        finally:
+            pool.terminate()
+            pool.join()
+        cache = ParseCache(cache_dir, 3)
+        assert_equal(str(cache.load('')), str(parse('', keep_repr=False)))
+        assert_equal(os.listdir(cache.dir), [os.path.basename(
+            cache.tree_path(''))])
+
+    def test_failed_store_is_ignored(self):
+        # The cache directory cannot be created.
+        f = open(cache_dir, 'w')
+        f.close()
+        try:
+            cache = ParseCache(cache_dir, 3)
+            cache.store('x = 1\n', parse('x = 1\n', keep_repr=False))
+            assert_true(not cache.contains('x = 1\n'))
+        finally:
+            os.remove(cache_dir)
+
+    def build(self, program: str) -> BuildStats:
+        stats = BuildStats()
+        try:
+            build.build('main',
+                        target=build.TYPE_CHECK,
+                        program_text=program,
+                        flags=[build.TEST_BUILTINS],
+                        alt_lib_path=source_dir,
+                        cache_dir=cache_dir,
+                        stats=stats)
+        except CompileError as e:
+            e.messages = [m.replace(source_dir + os.sep, '')
+                          for m in e.messages]
+            raise e
+        return stats
+
+
+def store_empty_tree(n: int) -> None:
+    """Store the tree of an empty file repeatedly in the parse cache."""
+    cache = ParseCache(cache_dir, 3)
+    for i in range(20):
+        cache.store('', parse('', keep_repr=False))
+
+
+def write_stub(name: str, text: str) -> None:
+    f = open(os.path.join(stub_dir, name), 'w')
+    f.write(text)
+    f.close()
+
+
+def write_file(name: str, text: str) -> None:
+    f = open(os.path.join(source_dir, name), 'w')
+    f.write(text)
+    f.close()
+
+
+if __name__ == '__main__':
+    import sys
+    run_test(BuildCacheSuite(), sys.argv[1:])
+    run_test(FunctionDependencySuite(), sys.argv[1:])
+    run_test(MemoryCacheSuite(), sys.argv[1:])
+    run_test(SnapshotSuite(), sys.argv[1:])
+    run_test(ParseCacheSuite(), sys.argv[1:])
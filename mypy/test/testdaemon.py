@@ -0,0 +1,97 @@
+"""Test cases for the mypy daemon."""
+
+import os
+import os.path
+import shutil
+import threading
+import time
+
+import typing
+
+from mypy import build
+from mypy import daemon
+from mypy.myunit import Suite, assert_equal, assert_true, run_test
+from mypy.test.config import test_temp_dir
+
+
+# Directory for the source files of test programs.
+source_dir = os.path.join(test_temp_dir, 'daemon-src')
+socket_path = os.path.join(test_temp_dir, 'daemon.sock')
+
+
+class DaemonSuite(Suite):
+    def set_up(self):
+        if os.path.isdir(source_dir):
+            shutil.rmtree(source_dir)
+        os.mkdir(source_dir)
+        self.daemon = daemon.Daemon(socket_path,
+                                    flags=[build.TEST_BUILTINS],
+                                    alt_lib_path=source_dir)
+        self.thread = threading.Thread(target=self.daemon.serve)
+        self.thread.start()
+        # Wait until the daemon accepts connections.
+        for i in range(100):
+            if self.daemon.running:
+                break
+            time.sleep(0.01)
+
+    def tear_down(self):
+        daemon.request(socket_path, {'command': 'stop'})
+        self.thread.join()
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+    def test_check_files(self):
+        self.write_file('m.py', 'x = 1\n')
+        self.write_file('main.py', 'import m\nm.x = 2\n')
+        self.write_file('bad.py', 'import m\nm.x = ""\n')
+        assert_equal(self.check(['main.py']), (0, []))
+        assert_equal(self.check(['main.py', 'bad.py']),
+                     (1, ['bad.py, line 2: Incompatible types in '
+                          'assignment']))
+
+    def test_check_after_change(self):
+        self.write_file('m.py', 'x = 1\n')
+        self.write_file('main.py', 'import m\nm.x = 2\n')
+        assert_equal(self.check(['main.py']), (0, []))
+        self.write_file('m.py', 'x = ""\n')
+        assert_equal(self.check(['main.py']),
+                     (1, ['main.py, line 2: Incompatible types in '
+                          'assignment']))
+
+    def test_unknown_command(self):
+        assert_equal(daemon.request(socket_path, {'command': 'x'}),
+                     {'status': 2, 'messages': ['unknown command: x']})
+
+    def test_invalid_request(self):
+        assert_equal(daemon.request(socket_path, []),
+                     {'status': 2,
+                      'messages': ['invalid request: not a JSON object']})
+
+    def test_internal_error(self):
+        cache = self.daemon.cache
+        response = daemon.request(socket_path, {'command': 'check',
+                                                'files': 1})
+        assert_equal(response['status'], 2)
+        assert_true(self.daemon.cache is not cache)
+        # The daemon keeps serving requests.
+        self.write_file('main.py', 'x = 1\n')
+        assert_equal(self.check(['main.py']), (0, []))
+
+    def check(self, files):
+        response = daemon.request(
+            socket_path, {'command': 'check',
+                          'files': [os.path.join(source_dir, f)
+                                    for f in files]})
+        return (response['status'],
+                [m.replace(source_dir + os.sep, '')
+                 for m in response['messages']])
+
+    def write_file(self, name: str, text: str) -> None:
+        f = open(os.path.join(source_dir, name), 'w')
+        f.write(text)
+        f.close()
+
+
+if __name__ == '__main__':
+    import sys
+    run_test(DaemonSuite(), sys.argv[1:])
@@ -1,9 +1,15 @@
 """Lexical analyzer test cases"""
 
+import os.path
+
 import typing
 
 from mypy.myunit import Suite, assert_equal
-from mypy.lex import lex
+from mypy.lex import (
+    lex, lex_incrementally, Lexer, RegexLexer, Name, LexError, KEYWORD, NAME,
+    COLON, PUNCT, BREAK, INDENT, DEDENT, LEX_ERROR, EOF
+)
+from mypy.test.config import PREFIX
 
 
 class LexerSuite(Suite):
@@ -376,6 +382,55 @@ class LexerSuite(Suite):
         self.assert_lex('0x', 'LexError(  ) ...')
         self.assert_lex('0xax', 'LexError(    ) ...')
     
+    def test_regex_lexer_on_source_files(self):
+        for path in [os.path.join('mypy', 'lex.py'),
+                     os.path.join('mypy', 'parse.py'),
+                     os.path.join('stubs', '3.2', 'builtins.py')]:
+            f = open(os.path.join(PREFIX, path))
+            src = f.read()
+            f.close()
+            expected = Lexer()
+            expected.lex(src, 1)
+            actual = RegexLexer()
+            actual.lex(src, 1)
+            assert_equal([(t.line, t.pre, t.string) for t in actual.tok],
+                         [(t.line, t.pre, t.string) for t in expected.tok])
+            assert_equal([type(t) for t in actual.tok],
+                         [type(t) for t in expected.tok])
+    
+    def test_token_buffer_creates_tokens_lazily(self):
+        tok = lex('x = y  # c\n')
+        assert_equal(tok.kind(0), NAME)
+        assert_equal(tok.kind(1), PUNCT)
+        assert_equal(tok.string(2), 'y')
+        assert_equal(tok.tokens, [None, None, None, None, None])
+        t = tok[2]
+        assert_equal(type(t), Name)
+        assert_equal((t.pre, t.string, t.line), (' ', 'y', 1))
+        assert tok[2] is t
+        assert_equal(tok.string(3), '\n')
+        assert_equal(tok[3].pre, '  # c')
+        assert_equal(tok.kind(-1), EOF)
+    
+    def test_token_buffer_stores_error_tokens(self):
+        tok = lex('if x:\n    y\n  z\n')
+        assert_equal(list(tok.kinds),
+                     [KEYWORD, NAME, COLON, BREAK, INDENT, NAME, BREAK,
+                      DEDENT, LEX_ERROR, NAME, BREAK, EOF])
+        assert_equal(type(tok.tokens[8]), LexError)
+        assert_equal(tok.tokens[7], None)
+    
+    def test_lex_incrementally(self):
+        src = ''.join('def f{}(x):\n    return x  # c\n\n'.format(i)
+                      for i in range(300))
+        tok = lex_incrementally(src)
+        assert_equal(tok.string(0), 'def')
+        # Only the first chunk of the source has been lexed.
+        assert len(tok) < len(lex(src))
+        assert_equal([str(t) for t in tok], [str(t) for t in lex(src)])
+        # Objects far behind the last requested token have been released.
+        assert_equal(tok.tokens[0], None)
+    
     # TODO
     #   invalid escape sequences in string literals etc.
     
@@ -386,26 +441,30 @@ class LexerSuite(Suite):
         if lexed.endswith(' ...'):
             lexed = lexed[:-3] + 'Break() Eof()'
         
-        l = lex(src)
-        r = []
-        for t in l:
-            r.append(str(t))
-        act = ' '.join(r)
-        if act != lexed:
-            print('Actual:  ', act)
-            print('Expected:', lexed)
-        assert_equal(act, lexed)
+        # Both lexer implementations must produce the same tokens.
+        for lexer in Lexer(), RegexLexer():
+            lexer.lex(src, 1)
+            r = []
+            for t in lexer.tok:
+                r.append(str(t))
+            act = ' '.join(r)
+            if act != lexed:
+                print('Actual:  ', act)
+                print('Expected:', lexed)
+            assert_equal(act, lexed)
     
     def assert_line(self, s, a):
         s = s.replace('\\n', '\n')
         s = s.replace('\\r', '\r')
         
-        tt = lex(s)
-        r = []
-        for t in tt:
-            r.append(t.line)
-        if len(r) == len(a) + 2:
-            a = a[:]
-            a.append(a[-1])
-            a.append(a[-1])
-        assert_equal(r, a)
+        for lexer in Lexer(), RegexLexer():
+            lexer.lex(s, 1)
+            r = []
+            for t in lexer.tok:
+                r.append(t.line)
+            expected = a
+            if len(r) == len(a) + 2:
+                expected = a[:]
+                expected.append(a[-1])
+                expected.append(a[-1])
+            assert_equal(r, expected)
@@ -6,12 +6,14 @@ import os.path
 
 import typing
 
-from mypy.myunit import Suite, AssertionFailure, run_test
+from mypy.myunit import Suite, AssertionFailure, run_test, assert_equal
 from mypy.test.helpers import assert_string_arrays_equal
 from mypy.test.data import parse_test_cases
 from mypy.test import config
-from mypy.parse import parse
-from mypy.errors import CompileError
+from mypy import lex
+from mypy.parse import parse, Parser
+from mypy.reparse import reparse
+from mypy.errors import Errors, CompileError
 
 
 class ParserSuite(Suite):
@@ -74,10 +76,145 @@ def test_parse_error(testcase):
                                                            testcase.line))
 
 
+REPARSE_SOURCE = """import os
+
+def f(x: int) -> int:
+    y = x + 1  # comment
+    return y
+
+@overload
+def g(x: int) -> int: pass
+@overload
+def g(x: str) -> str: pass
+
+class C:
+    x = 1
+    def m(self) -> None:
+        from sys import path
+        pass
+    def n(self):  # type: () -> None
+        if x:
+            pass
+        else:
+            pass
+    y = 2
+
+a = 1; b = 2
+t = (1,
+     2)
+"""
+
+
+class ReparseSuite(Suite):
+    def test_reparse_function_body(self):
+        tree, tok = self.reparse(4, 4, '    y = x - 1\n')
+        assert_equal(tree.defs[1].body.body[0].rvalue.op, '-')
+    
+    def test_reparse_reuses_unchanged_nodes(self):
+        tree, tok = self.parse(REPARSE_SOURCE)
+        old = tree.defs[:]
+        tok = reparse(tree, tok, 4, 3, '    z = 1\n')
+        # The overloaded function g is reparsed as well, since reparsing
+        # never stops before a decorator.
+        assert_equal([d is o for d, o in zip(tree.defs, old)],
+                     [True, False, False, True, True, True, True])
+        assert_equal(tree.defs[-1].line, 26)
+        assert_equal(tok.lines[-1], 28)
+    
+    def test_reparse_method(self):
+        tree, tok = self.parse(REPARSE_SOURCE)
+        old = tree.defs[3].defs.body[:]
+        tok = reparse(tree, tok, 19, 19, '            return\n')
+        assert_equal([d is o for d, o in zip(tree.defs[3].defs.body, old)],
+                     [True, True, False, True])
+        self.assert_same_as_full_parse(tree, tok.source)
+    
+    def test_reparse_indented_line_continues_previous_unit(self):
+        self.reparse(6, 6, '    z = 1\n')
+        self.reparse(17, 16, '        z = 1\n')
+    
+    def test_reparse_dedented_line_ends_class(self):
+        self.reparse(15, 15, 'x = 2\n')
+    
+    def test_reparse_comments_and_blank_lines(self):
+        self.reparse(3, 2, '# comment\n\n')
+        self.reparse(13, 12, '    # comment\n')
+        self.reparse(1, 1, '')
+    
+    def test_reparse_overloads(self):
+        self.reparse(9, 8, 'def h(): pass\n')
+        self.reparse(11, 10, '@overload\ndef g(x: bytes) -> bytes: pass\n')
+    
+    def test_reparse_open_brackets_and_strings(self):
+        self.reparse(4, 4, '    y = (x +\n')
+        self.reparse(4, 4, '    y = """\n')
+    
+    def test_reparse_end_of_file(self):
+        self.reparse(26, 27, 't = 3')
+        self.reparse(28, 27, 'import re\n')
+    
+    def test_reparse_parse_error(self):
+        # Parse errors cause a full parse, and the errors are reported as by
+        # a full parse.
+        tree, tok = self.parse(REPARSE_SOURCE)
+        errors = Errors()
+        tok = reparse(tree, tok, 4, 4, '    y = x +\n', errors=errors)
+        assert_equal(errors.messages(),
+                     ['<input>: In function "f":',
+                      '<input>, line 4: Parse error before end of line'])
+        self.assert_same_as_full_parse(tree, tok.source)
+        tok = reparse(tree, tok, 4, 4, '    y = x + 1\n', errors=Errors())
+        self.assert_same_as_full_parse(tree, tok.source)
+    
+    def parse(self, source):
+        tok = lex.lex(source)
+        return Parser(None, None, 3).parse(source, tok), tok
+    
+    def reparse(self, first, last, text):
+        tree, tok = self.parse(REPARSE_SOURCE)
+        tok = reparse(tree, tok, first, last, text, errors=Errors())
+        self.assert_same_as_full_parse(tree, tok.source)
+        expected = lex.lex(tok.source)
+        assert_equal([(str(t), t.line) for t in tok],
+                     [(str(t), t.line) for t in expected])
+        return tree, tok
+    
+    def assert_same_as_full_parse(self, tree, source):
+        expected = Parser(None, Errors(), 3).parse(source)
+        assert_string_arrays_equal(str(expected).split('\n'),
+                                   str(tree).split('\n'),
+                                   'Invalid reparsed tree')
+        assert_equal([str(n) for n in tree.imports],
+                     [str(n) for n in expected.imports])
+
+
+class ParseWithoutReprSuite(Suite):
+    def test_same_tree_without_representations(self):
+        tree = parse(REPARSE_SOURCE)
+        lean_tree = parse(REPARSE_SOURCE, keep_repr=False)
+        assert_string_arrays_equal(str(tree).split('\n'),
+                                   str(lean_tree).split('\n'),
+                                   'Invalid parse tree')
+    
+    def test_no_representations(self):
+        tree = parse(REPARSE_SOURCE, keep_repr=False)
+        nodes = [tree] + tree.defs + tree.defs[3].defs.body
+        assert_equal([n.repr for n in nodes], [None] * len(nodes))
+    
+    def test_nodes_counted_without_representations(self):
+        parser = Parser(None, None, 3)
+        parser.parse(REPARSE_SOURCE)
+        lean_parser = Parser(None, None, 3, keep_repr=False)
+        lean_parser.parse(REPARSE_SOURCE)
+        assert_equal(lean_parser.num_nodes, parser.num_nodes)
+
+
 class CombinedParserSuite(Suite):
     def __init__(self):
         self.test_parse = ParserSuite()
         self.test_parse_errors = ParseErrorSuite()
+        self.test_reparse = ReparseSuite()
+        self.test_parse_without_repr = ParseWithoutReprSuite()
         super().__init__()
 
 
@@ -0,0 +1,101 @@
+"""Test cases for build statistics (mypy.stats)."""
+
+import json
+import os
+import os.path
+import shutil
+
+import typing
+
+from mypy import build
+from mypy.errors import CompileError
+from mypy.myunit import Suite, assert_equal, assert_true, run_test
+from mypy.stats import BuildStats
+import mypy.stats
+from mypy.test.config import test_temp_dir
+
+
+# Directory for the source files of test programs.
+source_dir = os.path.join(test_temp_dir, 'stats-src')
+
+
+class BuildStatsSuite(Suite):
+    def set_up(self):
+        if os.path.isdir(source_dir):
+            shutil.rmtree(source_dir)
+        os.mkdir(source_dir)
+        self.write_file('m.py', 'class A:\n'
+                                '    def f(self, x: int) -> int:\n'
+                                '        return x\n')
+
+    def tear_down(self):
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+    def test_passes_and_counters(self):
+        stats = self.build('import m\nm.A().f(1)\n')
+        assert_equal(sorted(stats.passes['m']),
+                     ['parse', 'read', 'semanal-1', 'semanal-2', 'semanal-3',
+                      'typecheck'])
+        counters = stats.counters['m']
+        assert_equal(counters['lines'], 3)
+        assert_equal(counters['tokens'], 26)
+        assert_true(counters['nodes'] > 0)
+        assert_true(stats.counters['__main__']['is_subtype calls'] > 0)
+        assert_true('is_subtype cache hits' in stats.counters['__main__'])
+        assert_true(stats.wall > 0)
+
+    def test_report(self):
+        stats = self.build('import m\n')
+        report = json.loads(json.dumps(stats.report()))
+        module = report['modules']['m']
+        if mypy.stats.has_resource:
+            assert_true(module['passes']['parse']['maxrss'] > 0)
+        assert_equal(sorted(module['passes']['parse']),
+                     ['cpu', 'maxrss', 'wall'])
+        assert_equal(report['counters']['lines'],
+                     sum(m['counters'].get('lines', 0)
+                         for m in report['modules'].values()))
+        summary = stats.summary(2)
+        assert_true(summary[0].startswith('Build time'))
+        assert_equal(summary[-4], 'Slowest modules:')
+
+    def test_without_resource_module(self):
+        has_resource = mypy.stats.has_resource
+        mypy.stats.has_resource = False
+        try:
+            report = self.build('import m\n').report()
+        finally:
+            mypy.stats.has_resource = has_resource
+        assert_equal(report['modules']['m']['passes']['parse']['maxrss'], 0)
+        assert_equal(report['maxrss'], 0)
+
+    def test_failed_build(self):
+        stats = BuildStats()
+        try:
+            self.build('import m\nm.A().f("x")\n', stats)
+        except CompileError:
+            pass
+        else:
+            raise AssertionError('no error reported')
+        assert_true('typecheck' in stats.passes['m'])
+        assert_true(stats.wall > 0)
+
+    def build(self, program: str, stats: BuildStats = None) -> BuildStats:
+        stats = stats or BuildStats()
+        build.build('main',
+                    target=build.TYPE_CHECK,
+                    program_text=program,
+                    flags=[build.TEST_BUILTINS],
+                    alt_lib_path=source_dir,
+                    stats=stats)
+        return stats
+
+    def write_file(self, name: str, text: str) -> None:
+        f = open(os.path.join(source_dir, name), 'w')
+        f.write(text)
+        f.close()
+
+
+if __name__ == '__main__':
+    import sys
+    run_test(BuildStatsSuite(), sys.argv[1:])
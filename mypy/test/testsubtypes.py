@@ -1,8 +1,11 @@
 import typing
 
 from mypy.myunit import Suite, assert_true, run_test
-from mypy.subtypes import is_subtype
-from mypy.typefixture import TypeFixture, InterfaceTypeFixture
+from mypy import subtypes
+from mypy.sametypes import is_same_type
+from mypy.subtypes import is_subtype, map_instance_to_supertype
+from mypy.types import Instance, reset_interned_types
+from mypy.typefixture import TypeFixture, InterfaceTypeFixture, make_type_info
 
 
 class SubtypingSuite(Suite):
@@ -119,6 +122,44 @@ class SubtypingSuite(Suite):
         self.assert_proper_subtype(self.fx.callable_type(self.fx.a, self.fx.b),
                                    self.fx.callable(self.fx.a, self.fx.b))
     
+    def test_cached_result(self):
+        reset_interned_types()
+        hits = subtypes.num_subtype_cache_hits
+        self.assert_subtype(self.fx.gsab, self.fx.gb)
+        self.assert_not_subtype(self.fx.ga, self.fx.gb)
+        assert_true(subtypes.num_subtype_cache_hits == hits)
+        # Structurally equal types share the cached result.
+        self.assert_subtype(Instance(self.fx.gsi, [self.fx.a, self.fx.b], 5),
+                            self.fx.gb)
+        self.assert_not_subtype(self.fx.ga, Instance(self.fx.gi,
+                                                     [self.fx.b]))
+        assert_true(subtypes.num_subtype_cache_hits == hits + 2)
+    
+    def test_cache_cleared_when_mro_changes(self):
+        x = make_type_info('X', mro=[self.fx.oi])
+        self.assert_not_subtype(Instance(x, []), self.fx.a)
+        x.bases = [self.fx.a]
+        x.mro = []
+        x.calculate_mro()
+        self.assert_subtype(Instance(x, []), self.fx.a)
+    
+    def test_map_instance_to_supertype(self):
+        fx = self.fx
+        # X[T] <: GS[A, T] <: G[T]
+        x = make_type_info('X', mro=[fx.gsi, fx.gi, fx.oi], typevars=['T'],
+                           bases=[Instance(fx.gsi, [fx.a, fx.t])])
+        for i in range(2):
+            self.assert_mapped(Instance(x, [fx.b]), fx.gsi, fx.gsab)
+            self.assert_mapped(Instance(x, [fx.b]), fx.gi, fx.gb)
+            self.assert_mapped(Instance(x, [fx.ga]), fx.gi,
+                               Instance(fx.gi, [fx.ga]))
+            self.assert_mapped(Instance(x, [fx.b]), fx.oi, fx.o)
+    
+    def assert_mapped(self, instance, supertype, result):
+        mapped = map_instance_to_supertype(instance, supertype)
+        assert_true(is_same_type(mapped, result),
+                    '{} mapped to {}'.format(instance, mapped))
+    
     # IDEA: Maybe add these test cases (they are tested pretty well in type
     #       checker tests already):
     #  * more interface subtyping test cases
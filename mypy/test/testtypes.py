@@ -5,13 +5,16 @@ from typing import List
 from mypy.myunit import Suite, assert_equal, assert_true, run_test
 from mypy.erasetype import erase_type
 from mypy.expandtype import expand_type
-from mypy.join import join_types
+from mypy.join import join_types, join_type_list
 from mypy.meet import meet_types
 from mypy.types import (
     UnboundType, AnyType, Void, Callable, TupleType, TypeVarDef, Type,
-    Instance, NoneTyp, ErrorType
+    Instance, NoneTyp, ErrorType, intern_type, interned_instance,
+    interned_callable, reset_interned_types
+)
+from mypy.nodes import (
+    ARG_POS, ARG_OPT, ARG_STAR, MDEF, SymbolTableNode, Var, FuncDef, Block
 )
-from mypy.nodes import ARG_POS, ARG_OPT, ARG_STAR
 from mypy.replacetvars import replace_type_vars
 from mypy.subtypes import is_subtype
 from mypy.typefixture import TypeFixture, InterfaceTypeFixture
@@ -381,6 +384,21 @@ class JoinSuite(Suite):
         self.assert_join(self.fx.type_type, self.fx.type_type,
                          self.fx.type_type)
     
+    def test_join_type_list(self):
+        fx = self.fx
+        for types, join in [([fx.a], fx.a),
+                            ([fx.b, fx.c], fx.a),
+                            ([fx.b, fx.b, fx.c, fx.b, fx.c], fx.a),
+                            ([fx.gb, Instance(fx.gi, [fx.b]), fx.gb], fx.gb),
+                            ([fx.a, fx.anyt, fx.a], fx.anyt),
+                            ([fx.void, fx.a], fx.err)]:
+            assert_equal(str(join_type_list(types, fx.basic)), str(join))
+    
+    def test_cached_join(self):
+        j = join_types(self.fx.b, self.fx.c, self.fx.basic)
+        assert_true(join_types(Instance(self.fx.bi, [], 5), self.fx.c,
+                               self.fx.basic) is j)
+    
     # There are additional test cases in check-inference.test.
     
     # FIX interfaces with different paths
@@ -623,12 +641,97 @@ class MeetSuite(Suite):
                         a[-1], False)
 
 
+class InternSuite(Suite):
+    def set_up(self):
+        reset_interned_types()
+        self.fx = TypeFixture()
+    
+    def test_equal_types_are_identical(self):
+        fx = self.fx
+        for t in (fx.a, fx.ga, fx.hab, fx.anyt, fx.void, fx.nonet, fx.t,
+                  TupleType([fx.a, fx.gt]),
+                  self.callable(fx.ga, fx.t, fx.void)):
+            assert_true(intern_type(t) is intern_type(t))
+            assert_equal(str(intern_type(t)), str(t))
+        assert_true(interned_instance(fx.gi, [fx.a]) is intern_type(fx.ga))
+        assert_true(intern_type(fx.ga) is not intern_type(fx.gb))
+        assert_true(intern_type(fx.t) is not intern_type(fx.s1))
+    
+    def test_interned_callable(self):
+        fx = self.fx
+        c = interned_callable([fx.a], [ARG_POS], [None], fx.void, False)
+        assert_true(c is intern_type(self.callable(fx.a, fx.void)))
+        assert_true(c is not interned_callable([fx.a], [ARG_POS], ['x'],
+                                               fx.void, False))
+        assert_true(c is not interned_callable([fx.a], [ARG_OPT], [None],
+                                               fx.void, False))
+    
+    def test_line_and_repr_are_ignored(self):
+        a = Instance(self.fx.ai, [], 5)
+        a.repr = object()
+        b = intern_type(a)
+        assert_true(b is intern_type(self.fx.a))
+        assert_equal(b.line, -1)
+        assert_equal(b.repr, None)
+    
+    def test_unbound_type_is_not_interned(self):
+        t = UnboundType('X')
+        assert_true(intern_type(t) is t)
+    
+    def test_reset(self):
+        a = intern_type(self.fx.a)
+        reset_interned_types()
+        b = intern_type(a)
+        assert_true(b is not a)
+        assert_true(intern_type(self.fx.a) is b)
+    
+    def callable(self, *a):
+        n = len(a) - 1
+        return Callable(a[:-1], [ARG_POS] * n, [None] * n, a[-1], False)
+
+
+class MemberLookupSuite(Suite):
+    def set_up(self):
+        self.fx = TypeFixture()
+        self.f = FuncDef('f', [], [], [], Block([]))
+        self.v = Var('v')
+        self.fx.ai.names['f'] = SymbolTableNode(MDEF, self.f)
+        self.fx.ai.names['v'] = SymbolTableNode(MDEF, self.v)
+    
+    def test_inherited_members(self):
+        b = self.fx.bi
+        assert_true(b.get_method('f') is self.f)
+        assert_true(b.get_var('v') is self.v)
+        assert_true(b.get_method('v') is None)
+        assert_true(b.get_var('f') is None)
+        assert_true(b.get('x') is None)
+        assert_true(not b.has_method('x'))
+    
+    def test_override(self):
+        b = self.fx.bi
+        assert_true(b.get_var('v') is self.v)
+        v = Var('v')
+        b.names['v'] = SymbolTableNode(MDEF, v)
+        assert_true(b.get_var('v') is v)
+        assert_true(self.fx.ai.get_var('v') is self.v)
+        del b.names['v']
+        assert_true(b.get_var('v') is self.v)
+    
+    def test_member_added_to_base_class(self):
+        b = self.fx.bi
+        assert_true(b.get('g') is None)
+        self.fx.ai.names['g'] = SymbolTableNode(MDEF, self.f)
+        assert_true(b.get_method('g') is self.f)
+
+
 class CombinedTypesSuite(Suite):
     def __init__(self):
         self.test_types = TypesSuite()
         self.test_type_ops = TypeOpsSuite()
         self.test_join = JoinSuite()
         self.test_meet = MeetSuite()
+        self.test_intern = InternSuite()
+        self.test_member_lookup = MemberLookupSuite()
         super().__init__()
 
 
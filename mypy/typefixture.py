@@ -10,7 +10,7 @@ from mypy.types import (
     BasicTypes
 )
 from mypy.nodes import (
-    TypeInfo, TypeDef, Block, ARG_POS, ARG_OPT, ARG_STAR, SymbolTable
+    TypeInfo, TypeDef, Block, ARG_POS, ARG_OPT, ARG_STAR, ClassSymbolTable
 )
 
 
@@ -217,7 +217,7 @@ def make_type_info(name: str,
             id += 1
         type_def.type_vars = v
     
-    info = TypeInfo(SymbolTable(), type_def)
+    info = TypeInfo(ClassSymbolTable(), type_def)
     if mro is None:
         mro = []
     info.mro = [info] + mro
@@ -1,7 +1,7 @@
 """Classes for representing mypy types."""
 
 from abc import abstractmethod
-from typing import Undefined, Any, typevar, List, Tuple, cast, Generic
+from typing import Undefined, Any, typevar, List, Tuple, Dict, cast, Generic
 
 import mypy.nodes
 
@@ -14,6 +14,9 @@ class Type(mypy.nodes.Context):
     
     line = 0
     repr = Undefined(Any)
+    # Token of the intern table that the type is interned in (None if the
+    # type is not interned; see intern_token)
+    interned = None # type: object
     
     def __init__(self, line: int = -1, repr=None) -> None:
         self.line = line
@@ -767,3 +770,212 @@ def replace_self_type(t: Callable, self_type: Type) -> Callable:
                     t.variables,
                     t.bound_vars,
                     t.line, None)
+
+
+#
+# Interning
+#
+# Interned types are shared and immutable, and structurally equal interned
+# types are the same object. Thus interned types can be compared by identity
+# and used as dictionary keys (for example, for caching the results of type
+# operations). Interned types have no line numbers or representations.
+#
+# The table of interned types is keyed by type structure, where component
+# types are interned types and thus identified by identity. The table is
+# reset at the start of each build (see reset_interned_types); types
+# interned in earlier builds are no longer considered interned.
+#
+# Caches of the results of type operations on interned types are created
+# with new_type_cache. They are cleared when the table is reset and when the
+# class hierarchy changes (see clear_type_caches).
+
+
+# Interned types by structure (see TypeInterner for the keys)
+interned_types = Dict[Any, Type]()
+# Token that identifies the current contents of the table. Interned types
+# refer to the token, so that copies of them (for example, types unpickled
+# from the cache or sent by a worker process) and types interned before a
+# reset are not taken for interned types.
+intern_token = object()
+# Caches of the results of type operations (see new_type_cache)
+type_caches = List[Dict[Any, Any]]()
+
+
+def intern_type(t: Type) -> Type:
+    """Return the interned type that is structurally equal to a type.
+
+    Unbound types, type lists and runtime type variables cannot be interned;
+    they are returned unchanged.
+    """
+    if t.interned is intern_token:
+        return t
+    return t.accept(TypeInterner())
+
+
+def intern_types(types: List[Type]) -> List[Type]:
+    return [intern_type(t) for t in types]
+
+
+def is_interned(t: Type) -> bool:
+    return t.interned is intern_token
+
+
+def reset_interned_types() -> None:
+    """Forget all interned types.
+
+    This releases the type infos referred to by interned types.
+    """
+    global intern_token
+    interned_types.clear()
+    intern_token = object()
+    clear_type_caches()
+
+
+def new_type_cache() -> Dict[Any, Any]:
+    """Return a new cache of the results of a type operation.
+
+    The cache is a dictionary keyed by interned types (or tuples of them).
+    """
+    cache = Dict[Any, Any]()
+    type_caches.append(cache)
+    return cache
+
+
+def clear_type_caches() -> None:
+    """Clear the caches of the results of type operations.
+
+    Call this when the base classes of a type info change.
+    """
+    for cache in type_caches:
+        cache.clear()
+
+
+def interned(key: Any, t: Type) -> Type:
+    """Intern a new type with the given key and return it.
+
+    The key must not be in the table.
+    """
+    t.interned = intern_token
+    interned_types[key] = t
+    return t
+
+
+def interned_any() -> AnyType:
+    """Return the interned Any type."""
+    t = interned_types.get(AnyType)
+    if t is None:
+        t = interned(AnyType, AnyType())
+    return cast(AnyType, t)
+
+
+def interned_none() -> NoneTyp:
+    """Return the interned None type."""
+    t = interned_types.get(NoneTyp)
+    if t is None:
+        t = interned(NoneTyp, NoneTyp())
+    return cast(NoneTyp, t)
+
+
+def interned_type_var(name: str, id: int,
+                      is_wrapper_var: Any = False) -> TypeVar:
+    """Return an interned type variable type."""
+    key = (TypeVar, name, id, is_wrapper_var)
+    t = interned_types.get(key)
+    if t is None:
+        t = interned(key, TypeVar(name, id, is_wrapper_var))
+    return cast(TypeVar, t)
+
+
+def interned_instance(typ: mypy.nodes.TypeInfo, args: List[Type],
+                      erased: bool = False) -> Instance:
+    """Return an interned instance type.
+
+    The type arguments do not need to be interned.
+    """
+    args = intern_types(args)
+    key = (Instance, typ, tuple(args), bool(erased))
+    t = interned_types.get(key)
+    if t is None:
+        t = interned(key, Instance(typ, args, -1, None, bool(erased)))
+    return cast(Instance, t)
+
+
+def interned_callable(arg_types: List[Type],
+                      arg_kinds: List[int],
+                      arg_names: List[str],
+                      ret_type: Type,
+                      is_type_obj: bool,
+                      name: str = None, variables: List[TypeVarDef] = None,
+                      bound_vars: List[Tuple[int, Type]] = None) -> Callable:
+    """Return an interned callable type.
+
+    The component types do not need to be interned.
+    """
+    arg_types = intern_types(arg_types)
+    ret_type = intern_type(ret_type)
+    var_keys = tuple((v.name, v.id, tuple(intern_types(v.values or [])))
+                     for v in variables or [])
+    bound_vars = [(id, intern_type(t)) for id, t in bound_vars or []]
+    key = (Callable, tuple(arg_types), tuple(arg_kinds), tuple(arg_names),
+           ret_type, bool(is_type_obj), name, var_keys, tuple(bound_vars))
+    t = interned_types.get(key)
+    if t is None:
+        variables = [TypeVarDef(var_name, var_id, list(values))
+                     for var_name, var_id, values in var_keys]
+        t = interned(key, Callable(arg_types, list(arg_kinds),
+                                   list(arg_names), ret_type, is_type_obj,
+                                   name, variables, bound_vars))
+    return cast(Callable, t)
+
+
+class TypeInterner(TypeVisitor[Type]):
+    """Find the interned type structurally equal to a type (see intern_type).
+    """
+    
+    def visit_unbound_type(self, t: UnboundType) -> Type:
+        return t
+
+    def visit_type_list(self, t: TypeList) -> Type:
+        return t
+    
+    def visit_error_type(self, t: ErrorType) -> Type:
+        return interned_types.get(ErrorType) or interned(ErrorType,
+                                                         ErrorType())
+    
+    def visit_any(self, t: AnyType) -> Type:
+        return interned_any()
+    
+    def visit_void(self, t: Void) -> Type:
+        key = (Void, t.source)
+        return interned_types.get(key) or interned(key, Void(t.source))
+    
+    def visit_none_type(self, t: NoneTyp) -> Type:
+        return interned_none()
+    
+    def visit_erased_type(self, t: ErasedType) -> Type:
+        return interned_types.get(ErasedType) or interned(ErasedType,
+                                                          ErasedType())
+    
+    def visit_type_var(self, t: TypeVar) -> Type:
+        return interned_type_var(t.name, t.id, t.is_wrapper_var)
+    
+    def visit_instance(self, t: Instance) -> Type:
+        return interned_instance(t.type, t.args, t.erased)
+    
+    def visit_callable(self, t: Callable) -> Type:
+        return interned_callable(t.arg_types, t.arg_kinds, t.arg_names,
+                                 t.ret_type, t.is_type_obj(), t.name,
+                                 t.variables, t.bound_vars)
+    
+    def visit_overloaded(self, t: Overloaded) -> Type:
+        items = [cast(Callable, intern_type(item)) for item in t.items()]
+        key = (Overloaded, tuple(items))
+        return interned_types.get(key) or interned(key, Overloaded(items))
+    
+    def visit_tuple_type(self, t: TupleType) -> Type:
+        items = intern_types(t.items)
+        key = (TupleType, tuple(items))
+        return interned_types.get(key) or interned(key, TupleType(items))
+    
+    def visit_runtime_type_var(self, t: RuntimeTypeVar) -> Type:
+        return t
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Measure how build time scales with the number of modules in a program.
+
+Generate synthetic programs with an increasing number of small modules and
+type check each of them. Every module imports a few other modules (some of
+the imports form cycles) and uses definitions from them.
+
+Usage: benchmark_build.py [sizes...]   (default sizes: 250 500 1000 2000)
+
+Run this from the mypy source directory.
+"""
+
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import time
+
+from typing import List
+
+from mypy import build
+
+
+# Number of other modules imported by each generated module.
+IMPORTS_PER_MODULE = 3
+
+
+def module_source(i: int, n: int) -> str:
+    """Return the source of synthetic module i of n."""
+    lines = List[str]()
+    deps = List[int]()
+    for k in range(1, IMPORTS_PER_MODULE + 1):
+        # Mostly import earlier modules, but every tenth module also
+        # imports a later module to create import cycles.
+        dep = i - k * 7
+        if i % 10 == 0 and k == 1:
+            dep = i + 3
+        if 0 <= dep < n and dep != i and dep not in deps:
+            deps.append(dep)
+    for dep in deps:
+        lines.append('import m{}'.format(dep))
+    lines.append('')
+    lines.append('class C{}:'.format(i))
+    lines.append('    def f(self, x: int) -> int:')
+    lines.append('        return x + {}'.format(i))
+    lines.append('')
+    lines.append('def g{}(c: C{}) -> int:'.format(i, i))
+    lines.append('    return c.f({})'.format(i))
+    for dep in deps:
+        if dep < i:
+            lines.append('')
+            lines.append('def h{}_{}() -> int:'.format(i, dep))
+            lines.append('    return m{}.g{}(m{}.C{}())'.format(dep, dep, dep,
+                                                              dep))
+    return '\n'.join(lines) + '\n'
+
+
+def generate_program(dir: str, n: int) -> str:
+    """Generate a program with n modules in dir and return the main path."""
+    for i in range(n):
+        f = open(os.path.join(dir, 'm{}.py'.format(i)), 'w')
+        f.write(module_source(i, n))
+        f.close()
+    main = os.path.join(dir, 'main.py')
+    f = open(main, 'w')
+    for i in range(n):
+        f.write('import m{}\n'.format(i))
+    f.close()
+    return main
+
+
+def measure(n: int) -> float:
+    dir = tempfile.mkdtemp()
+    try:
+        main = generate_program(dir, n)
+        t0 = time.time()
+        build.build(main, target=build.TYPE_CHECK)
+        return time.time() - t0
+    finally:
+        shutil.rmtree(dir)
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000]
+    print('{:>8} {:>10} {:>14}'.format('modules', 'time (s)', 'ms / module'))
+    for n in sizes:
+        t = measure(n)
+        print('{:>8} {:>10.2f} {:>14.2f}'.format(n, t, t * 1000.0 / n))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Measure the throughput of the lexer implementations.
+
+Lex every Python file in the given directories (by default lib-python and
+stubs) using both Lexer and RegexLexer, verify that they produce identical
+tokens and report the time used by each of them.
+
+Usage: benchmark_lex.py [dirs...]
+
+Run this from the mypy source directory.
+"""
+
+import os
+import os.path
+import sys
+import time
+
+from typing import List, Tuple
+
+from mypy.lex import Lexer, RegexLexer
+
+
+# Number of times the files are lexed by each implementation (the fastest
+# round is reported).
+ROUNDS = 3
+
+
+def find_sources(dirs: List[str]) -> List[str]:
+    """Return the contents of all .py files under the directories."""
+    sources = List[str]()
+    for dir in dirs:
+        for root, dirnames, filenames in os.walk(dir):
+            for name in sorted(filenames):
+                if name.endswith('.py'):
+                    f = open(os.path.join(root, name))
+                    sources.append(f.read())
+                    f.close()
+    return sources
+
+
+def new_lexer(use_regex: bool) -> Lexer:
+    if use_regex:
+        return RegexLexer()
+    else:
+        return Lexer()
+
+
+def token_summary(lexer: Lexer) -> List[Tuple[type, str, str, int]]:
+    return [(type(t), t.pre, t.string, t.line) for t in lexer.tok]
+
+
+def main() -> None:
+    dirs = sys.argv[1:] or ['lib-python', 'stubs']
+    sources = find_sources(dirs)
+    size = sum(len(src) for src in sources)
+    print('{} files, {} KB'.format(len(sources), size // 1024))
+
+    mismatches = 0
+    tokens = 0
+    for src in sources:
+        a = Lexer()
+        a.lex(src, 1)
+        b = RegexLexer()
+        b.lex(src, 1)
+        tokens += len(a.tok)
+        if token_summary(a) != token_summary(b):
+            mismatches += 1
+    if mismatches:
+        print('{} files lexed differently'.format(mismatches))
+        sys.exit(1)
+
+    # Alternate between the implementations to even out system noise.
+    best = [0.0, 0.0]
+    for i in range(ROUNDS):
+        for use_regex in False, True:
+            t0 = time.time()
+            for src in sources:
+                new_lexer(use_regex).lex(src, 1)
+            elapsed = time.time() - t0
+            if i == 0 or elapsed < best[use_regex]:
+                best[use_regex] = elapsed
+    for use_regex in False, True:
+        name = type(new_lexer(use_regex)).__name__
+        t = best[use_regex]
+        print('{:12} {:7.3f} s {:8.0f} KB/s {:10.0f} tokens/s'.format(
+            name, t, size / 1024 / t, tokens / t))
+
+
+if __name__ == '__main__':
+    main()
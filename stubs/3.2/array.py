@@ -2,11 +2,13 @@
 
 # Based on http://docs.python.org/3.2/library/array.html
 
-from typing import Any, Iterable, Tuple, List, Iterator, IO, overload
+from typing import (
+    Any, Iterable, Tuple, List, Iterator, IO, Sized, overload
+)
 
 typecodes = ''
 
-class array:
+class array(Sized, Iterable[Any]):
     def __init__(self, typecode: str,
                  initializer: Iterable[Any] = None) -> None:
         typecode = ''
@@ -0,0 +1,12 @@
+# Stubs for marshal
+
+# NOTE: These are incomplete!
+
+from typing import Any, IO
+
+version = 0
+
+def dump(value: Any, file: IO, version: int = 2) -> None: pass
+def load(file: IO) -> Any: pass
+def dumps(value: Any, version: int = 2) -> bytes: pass
+def loads(string: bytes) -> Any: pass
@@ -0,0 +1,26 @@
+# Stubs for mmap
+
+# NOTE: These are incomplete!
+
+from typing import overload
+
+ACCESS_READ = 0
+ACCESS_WRITE = 0
+ACCESS_COPY = 0
+
+PAGESIZE = 0
+
+class mmap:
+    def __init__(self, fileno: int, length: int, flags: int = 0,
+                 prot: int = 0, access: int = 0, offset: int = 0) -> None: pass
+    def close(self) -> None: pass
+    def find(self, sub: bytes, start: int = 0, end: int = -1) -> int: pass
+    def read(self, n: int = -1) -> bytes: pass
+    def seek(self, pos: int, whence: int = 0) -> None: pass
+    def size(self) -> int: pass
+    def tell(self) -> int: pass
+    def __len__(self) -> int: pass
+    @overload
+    def __getitem__(self, i: int) -> int: pass
+    @overload
+    def __getitem__(self, s: slice) -> bytes: pass
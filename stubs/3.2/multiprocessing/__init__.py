@@ -0,0 +1,15 @@
+# Stubs for multiprocessing
+
+# NOTE: These are incomplete!
+
+from typing import List
+
+import multiprocessing.pool
+from multiprocessing.pool import Pool
+
+class BaseContext:
+    def Pool(self, processes: int = None) -> multiprocessing.pool.Pool: pass
+
+def cpu_count() -> int: pass
+def get_context(method: str = None) -> BaseContext: pass
+def get_all_start_methods() -> List[str]: pass
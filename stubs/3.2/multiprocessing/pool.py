@@ -0,0 +1,25 @@
+# Stubs for multiprocessing.pool
+
+# NOTE: These are incomplete!
+
+from typing import Any, Iterable, List
+
+class AsyncResult:
+    def get(self, timeout: float = None) -> Any: pass
+    def wait(self, timeout: float = None) -> None: pass
+    def ready(self) -> bool: pass
+    def successful(self) -> bool: pass
+
+class Pool:
+    def __init__(self, processes: int = None, initializer: Any = None,
+                 initargs: Any = (),
+                 maxtasksperchild: int = None) -> None: pass
+    def apply(self, func: Any,
+              args: Any = ()) -> Any: pass
+    def apply_async(self, func: Any,
+                    args: Any = ()) -> AsyncResult: pass
+    def map(self, func: Any,
+            iterable: Iterable[Any]) -> List[Any]: pass
+    def close(self) -> None: pass
+    def terminate(self) -> None: pass
+    def join(self) -> None: pass
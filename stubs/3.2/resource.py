@@ -8,3 +8,14 @@ RLIMIT_CORE = 0
 
 def getrlimit(resource: int) -> Tuple[int, int]: pass
 def setrlimit(resource: int, limits: Tuple[int, int]) -> None: pass
+
+# NOTE: struct_rusage should be a structseq (a tuple with named fields).
+class struct_rusage:
+    ru_utime = 0.0
+    ru_stime = 0.0
+    ru_maxrss = 0
+
+RUSAGE_SELF = 0
+RUSAGE_CHILDREN = 0
+
+def getrusage(who: int) -> struct_rusage: pass
@@ -2,4 +2,14 @@
 
 # Based on http://docs.python.org/3.2/library/zlib.html
 
-# TODO this stub file is an empty placeholder
+# NOTE: These are incomplete!
+
+import typing
+
+class error(Exception): pass
+
+def adler32(data: bytes, value: int = 1) -> int: pass
+def compress(data: bytes, level: int = 6) -> bytes: pass
+def crc32(data: bytes, value: int = 0) -> int: pass
+def decompress(data: bytes, wbits: int = 15,
+               bufsize: int = 16384) -> bytes: pass
@@ -16,6 +16,10 @@ from mypy.test import testtypegen
 from mypy.test import testoutput
 from mypy.test import testdyncheck
 from mypy.test import testicodegen
+from mypy.test import testcache
+from mypy.test import testbuild
+from mypy.test import testdaemon
+from mypy.test import teststats
 
 
 class AllSuite(Suite):
@@ -24,12 +28,16 @@ class AllSuite(Suite):
         self.test_typeops = testtypes.TypeOpsSuite()
         self.test_join = testtypes.JoinSuite()
         self.test_meet = testtypes.MeetSuite()
+        self.test_intern = testtypes.InternSuite()
+        self.test_member_lookup = testtypes.MemberLookupSuite()
         self.test_subtypes = testsubtypes.SubtypingSuite()
         self.test_solve = testsolve.SolveSuite()
         self.test_infer = testinfer.MapActualsToFormalsSuite()
         self.test_lex = testlex.LexerSuite()
         self.test_parse = testparse.ParserSuite()
         self.test_parse_errors = testparse.ParseErrorSuite()
+        self.test_reparse = testparse.ReparseSuite()
+        self.test_parse_without_repr = testparse.ParseWithoutReprSuite()
         self.test_semanal = testsemanal.SemAnalSuite()
         self.test_semanal_errors = testsemanal.SemAnalErrorSuite()
         self.test_semanal_symtable = testsemanal.SemAnalSymtableSuite()
@@ -40,6 +48,20 @@ class AllSuite(Suite):
         self.test_output = testoutput.OutputSuite()
         self.test_dyncheck = testdyncheck.DyncheckTransformSuite()
         self.test_icodegen = testicodegen.IcodeGenerationSuite()
+        self.test_cache = testcache.BuildCacheSuite()
+        self.test_function_dependencies = testcache.FunctionDependencySuite()
+        self.test_memory_cache = testcache.MemoryCacheSuite()
+        self.test_snapshot = testcache.SnapshotSuite()
+        self.test_parse_cache = testcache.ParseCacheSuite()
+        self.test_build = testbuild.ImportGraphSuite()
+        self.test_module_index = testbuild.ModuleIndexSuite()
+        self.test_parallel_build = testbuild.ParallelBuildSuite()
+        self.test_all_errors = testbuild.AllErrorsSuite()
+        self.test_memory_lean = testbuild.MemoryLeanSuite()
+        self.test_batch_build = testbuild.BatchBuildSuite()
+        self.test_lazy_stubs = testbuild.LazyStubSuite()
+        self.test_daemon = testdaemon.DaemonSuite()
+        self.test_stats = teststats.BuildStatsSuite()
         super().__init__()
 
 